@@ -0,0 +1,29 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from 携程模拟服务器 import MockCtripServer  # noqa: E402
+from 携程爬虫加载 import REVIEW_CRAWLER, load_crawler  # noqa: E402
+
+
+@pytest.fixture
+def server():
+    """本地替身服务器，无延迟"""
+    with MockCtripServer(latency=0.0) as srv:
+        yield srv
+
+
+@pytest.fixture
+def crawler(server, tmp_path, monkeypatch):
+    """评论爬虫模块：请求替身服务器，输出写入临时目录，不限速、不等待"""
+    monkeypatch.chdir(tmp_path)
+    module = load_crawler(REVIEW_CRAWLER, 'review_crawler_under_test')
+    module.API_URL = server.comment_url
+    module.RANDOM_DELAY = (0, 0)
+    module.RATE_LIMIT = 1000
+    module.RATE_BURST = 20
+    module.METRICS_FILE = None
+    return module
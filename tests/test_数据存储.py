@@ -0,0 +1,12 @@
+import pytest
+
+pytest.importorskip('pyarrow')
+
+from 携程数据存储 import to_arrow_table  # noqa: E402
+
+
+def test_large_ids_keep_precision():
+    rows = [('9007199254740993', '10400001'), ('3.0', ''), ('abc', '12')]
+    table = to_arrow_table(rows, ['评论ID', '景点ID'])
+    assert table.column('评论ID').to_pylist() == [9007199254740993, 3, None]
+    assert table.column('景点ID').to_pylist() == [10400001, None, 12]
@@ -0,0 +1,74 @@
+import csv
+
+import pytest
+
+from 评论爬取状态 import CrawlState
+
+POI = 10400001
+
+
+def review_ids(crawler):
+    with open(crawler.single_csv_path(POI), encoding='utf-8-sig', newline='') as f:
+        return [row['评论ID'] for row in csv.DictReader(f)]
+
+
+def fail_pages(crawler, monkeypatch, pages):
+    """让指定页在本次运行中失败（不发请求）"""
+    fetch_page, fetch_page_async = crawler.fetch_page, crawler.fetch_page_async
+
+    def failing(page_index, poi_id=POI, controller=None):
+        if page_index in pages:
+            return None, '模拟失败', None
+        return fetch_page(page_index, poi_id, controller)
+
+    async def failing_async(http, limiter, poi_id, page_index, controller=None):
+        if page_index in pages:
+            return None, '模拟失败', None
+        return await fetch_page_async(http, limiter, poi_id, page_index, controller)
+
+    monkeypatch.setattr(crawler, 'fetch_page', failing)
+    monkeypatch.setattr(crawler, 'fetch_page_async', failing_async)
+
+
+@pytest.mark.parametrize('use_async', [True, False])
+def test_resume_crawls_only_pages_missing_from_journal(crawler, server, monkeypatch, use_async):
+    server.comments_per_poi = 95  # 10页
+    crawler.USE_ASYNC = use_async
+    crawler.RETRY_FAILED = False
+
+    with monkeypatch.context() as m:
+        fail_pages(crawler, m, {4, 7})
+        successful, _ = crawler.crawl_full([(POI, 20)])
+    assert successful[POI] == 8
+
+    state = CrawlState(crawler.STATE_DB)
+    try:
+        assert state.completed_pages(POI) == set(range(1, 11)) - {4, 7}
+        assert {page for _, page, _, _ in state.dead_letters()} == {4, 7}
+    finally:
+        state.close()
+
+    server.reset_stats()
+    successful, skipped = crawler.crawl_full([(POI, 20)])
+    assert successful[POI] == 2
+    assert skipped == 18  # 断点日志中已完成的8页和末页之后的10页
+    assert server.pages_seen == {('comment', POI, 4), ('comment', POI, 7)}
+
+    ids = review_ids(crawler)
+    assert len(ids) == 95
+    assert len(set(ids)) == 95
+
+    # 全部完成后清空断点日志，下次运行重新开始
+    state = CrawlState(crawler.STATE_DB)
+    try:
+        assert state.completed_pages(POI) == set()
+    finally:
+        state.close()
+
+
+def test_fresh_run_truncates_output_when_journal_is_empty(crawler, server):
+    server.comments_per_poi = 25
+    crawler.USE_ASYNC = False
+    crawler.crawl_full([(POI, 5)])
+    crawler.crawl_full([(POI, 5)])
+    assert len(review_ids(crawler)) == 25
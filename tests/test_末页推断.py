@@ -0,0 +1,49 @@
+import pytest
+
+from 评论爬取状态 import CrawlState
+
+POI = 10400001
+
+
+@pytest.mark.parametrize('page, comments, total, expected', [
+    (1, ['评论'] * 10, 95, 10),     # 按评论总数算出页数
+    (1, ['评论'] * 10, 100, 10),    # 整除时不多算一页
+    (3, [], None, 2),               # 无数据页的前一页为末页
+    (12, [], 95, 10),               # 两者都可用时取较小的
+    (1, ['评论'] * 10, None, None),  # 无法判断
+    (1, None, None, None),          # 失败页
+    (1, [], 0, 0),                  # 没有评论的景点
+])
+def test_detect_last_page(crawler, page, comments, total, expected):
+    assert crawler.detect_last_page(page, comments, total) == expected
+
+
+def test_tracker_only_moves_last_page_earlier_and_persists_it(crawler, tmp_path):
+    state = CrawlState(str(tmp_path / '状态.db'))
+    try:
+        tracker = crawler.LastPageTracker(state)
+        assert tracker.get(POI) is None
+        assert tracker.update(POI, 1, ['评论'] * 10, 95)
+        assert not tracker.update(POI, 2, ['评论'] * 10, 120)  # 末页不会变大
+        assert tracker.past_end(POI, 11) and not tracker.past_end(POI, 10)
+        assert tracker.update(POI, 9, [], None)  # 第9页无数据，末页提前到第8页
+        assert state.get_last_page(POI) == 8
+        assert crawler.LastPageTracker(state).get(POI) == 8
+    finally:
+        state.close()
+
+
+@pytest.mark.parametrize('count, expected', [(None, 500), (0, 0), (1, 1), (95, 10), (100, 10), (10 ** 6, 500)])
+def test_plan_pages(crawler, count, expected):
+    assert crawler.plan_pages(count, max_pages=500) == expected
+
+
+@pytest.mark.parametrize('use_async', [True, False])
+def test_pages_past_total_count_are_not_requested(crawler, server, use_async):
+    server.comments_per_poi = 123  # 13页
+    crawler.USE_ASYNC = use_async
+    successful, skipped = crawler.crawl_full([(POI, 100)])
+    assert successful[POI] == 13
+    assert skipped == 87
+    requested = {page for _, _, page in server.pages_seen}
+    assert requested == set(range(1, 14))
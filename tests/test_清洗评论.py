@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from 清洗评论源代码 import REVIEW_COLUMNS, dedupe_external, dedupe_stream
+
+
+@pytest.fixture
+def reviews():
+    """有重复和空内容的评论，重复内容跨越多个块"""
+    rng = np.random.default_rng(0)
+    n = 5000
+    df = pd.DataFrame({column: [f'{column}{i}' for i in range(n)] for column in REVIEW_COLUMNS})
+    contents = np.array([f'评论{x}' for x in rng.integers(0, 1500, n)], dtype=object)
+    contents[rng.random(n) < 0.02] = None
+    df['评论内容'] = contents
+    return df
+
+
+def read_output(path):
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path)
+    return pd.read_csv(path, dtype=str, encoding='utf-8-sig')
+
+
+def expected_rows(df):
+    return df.drop_duplicates(subset=['评论内容'], keep='first')
+
+
+@pytest.mark.parametrize('output', ['out.csv', 'out.parquet'])
+@pytest.mark.parametrize('mode', ['stream', 'external'])
+def test_dedupe_matches_pandas_drop_duplicates(reviews, tmp_path, mode, output):
+    source = str(tmp_path / '全部评论.csv')
+    reviews.to_csv(source, index=False, encoding='utf-8-sig')
+    output_path = str(tmp_path / output)
+
+    if mode == 'stream':
+        total, kept = dedupe_stream(source, output_path, chunk_rows=700)
+    else:
+        total, kept = dedupe_external(source, output_path, chunk_rows=700, buckets=7, tmp_dir=str(tmp_path))
+
+    expected = expected_rows(pd.read_csv(source, dtype=str, encoding='utf-8-sig'))
+    got = read_output(output_path)
+    assert (total, kept) == (len(reviews), len(expected))
+    assert got['评论ID'].tolist() == expected['评论ID'].tolist()
+    assert got['评论内容'].isna().sum() == 1  # 空内容彼此相同，只保留第一条
+
+
+@pytest.mark.parametrize('mode', ['stream', 'external'])
+def test_dedupe_across_review_files_matches_pandas(reviews, tmp_path, mode):
+    directory = tmp_path / '评论目录'
+    directory.mkdir()
+    parts = [reviews.iloc[i:i + 1250] for i in range(0, len(reviews), 1250)]
+    for i, part in enumerate(parts):
+        part.to_csv(directory / f'1040000{i}_评论.csv', index=False, encoding='utf-8-sig')
+    output_path = str(tmp_path / 'out.csv')
+
+    if mode == 'stream':
+        dedupe_stream(str(directory), output_path, chunk_rows=700, workers=2)
+    else:
+        dedupe_external(str(directory), output_path, chunk_rows=700, buckets=7, tmp_dir=str(tmp_path), workers=2)
+
+    expected = expected_rows(pd.concat(parts))
+    assert read_output(output_path)['评论ID'].tolist() == expected['评论ID'].tolist()
@@ -0,0 +1,114 @@
+import csv
+
+import pytest
+
+import 评论任务队列
+from 评论任务队列 import WorkQueue
+
+POI = 10400001
+
+
+class Clock:
+    """可手动推进的时钟，代替队列模块中的time"""
+
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(评论任务队列, 'time', clock)
+    return clock
+
+
+@pytest.fixture
+def queue(tmp_path, clock):
+    queue = WorkQueue(str(tmp_path / '队列.db'), max_attempts=3, retry_delay=10)
+    queue.enqueue([(POI, 4)])
+    yield queue
+    queue.close()
+
+
+def test_expired_lease_is_released_to_another_worker(queue, clock):
+    assert queue.lease('a', 2, lease_seconds=30) == [(POI, 1), (POI, 2)]
+    assert queue.lease('b', 10, lease_seconds=30) == [(POI, 3), (POI, 4)]
+    assert queue.lease('c', 10, lease_seconds=30) == []  # 租约期内领不到
+
+    clock.now += 31
+    assert queue.lease('c', 10, lease_seconds=30) == [(POI, 1), (POI, 2), (POI, 3), (POI, 4)]
+
+    # 原持有者的确认不再生效，任务仍由新持有者确认
+    assert not queue.ack('a', POI, 1)
+    assert queue.counts() == {'leased': 4}
+    assert queue.ack('c', POI, 1)
+    assert queue.counts() == {'leased': 3, 'done': 1}
+
+
+def test_renewed_lease_does_not_expire(queue, clock):
+    queue.lease('a', 4, lease_seconds=30)
+    clock.now += 20
+    assert queue.renew('a', lease_seconds=30) == 4
+    clock.now += 20
+    assert queue.lease('b', 4, lease_seconds=30) == []
+    assert queue.unfinished(exclude_worker='a') == 0
+    assert queue.unfinished() == 4
+
+
+def test_lease_expiring_too_often_marks_task_failed(queue, clock):
+    for _ in range(3):
+        assert (POI, 1) in queue.lease('a', 4, lease_seconds=30)
+        clock.now += 31
+    assert queue.lease('b', 4, lease_seconds=30) == []
+    assert queue.counts() == {'failed': 4}
+    assert [(poi_id, page) for poi_id, page, _, _ in queue.failed()] == [(POI, p) for p in range(1, 5)]
+
+
+def test_nack_requeues_after_retry_delay(queue, clock):
+    queue.lease('a', 1, lease_seconds=30)
+    queue.nack('a', POI, 1, '网络错误')
+    assert queue.lease('b', 1, lease_seconds=30) == [(POI, 2)]
+    clock.now += 11
+    assert queue.lease('b', 1, lease_seconds=30) == [(POI, 1)]
+
+
+def test_ack_does_not_complete_skipped_task(queue, clock):
+    queue.lease('a', 4, lease_seconds=30)
+    queue.set_last_page(POI, 2)
+    assert not queue.ack('a', POI, 3)
+    assert queue.ack('a', POI, 2)
+    assert queue.counts() == {'leased': 1, 'done': 1, 'skipped': 2}
+    assert queue.lease('b', 4, lease_seconds=30) == []
+
+
+
+def test_lease_follows_plan_order(tmp_path, clock):
+    # 计划按评论数量从多到少排列，景点ID的大小与热度无关
+    queue = WorkQueue(str(tmp_path / '计划顺序.db'))
+    queue.enqueue([(30, 2), (10, 2), (20, 2)])
+    assert queue.lease('a', 4, lease_seconds=30) == [(30, 1), (10, 1), (20, 1), (30, 2)]
+
+    # 重新规划后，尚未领取的任务按新计划的顺序领取
+    queue.enqueue([(20, 2), (10, 2), (30, 2)])
+    assert queue.lease('a', 4, lease_seconds=30) == [(20, 2), (10, 2)]
+    queue.close()
+
+@pytest.mark.parametrize('use_async', [True, False])
+def test_crawl_from_queue_skips_reviews_already_in_output(crawler, server, tmp_path, use_async):
+    server.comments_per_poi = 45
+    crawler.USE_ASYNC = use_async
+    crawler.crawl_full([(POI, 10)])  # 已有输出，如收回租约前原持有者已写入的页
+
+    crawler.QUEUE_DB = str(tmp_path / '队列.db')
+    crawler.QUEUE_POLL_INTERVAL = 0.1
+    successful, skipped = crawler.crawl_full([(POI, 10)])
+    assert successful[POI] == 5
+    assert skipped == 5
+
+    with open(crawler.single_csv_path(POI), encoding='utf-8-sig', newline='') as f:
+        ids = [row['评论ID'] for row in csv.DictReader(f)]
+    assert len(ids) == 45
+    assert len(set(ids)) == 45
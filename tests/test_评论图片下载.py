@@ -0,0 +1,100 @@
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import 评论图片下载
+from 评论图片下载 import ImageStore, download_images
+
+IMAGES = {
+    '/a.jpg': b'\xff\xd8image-a',
+    '/b.jpg': b'\xff\xd8image-a',  # 与a.jpg内容相同
+    '/c.png': b'\x89PNGimage-c',
+}
+
+
+class ImageServer:
+    """本地图片服务器：/missing.jpg 返回404，/busy.png 首次返回429，/down.jpg 总是返回503"""
+
+    def __init__(self):
+        self.requests = Counter()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests[self.path] += 1
+                if self.path == '/down.jpg':
+                    self.send_error(503)
+                    return
+                if self.path == '/busy.png' and server.requests[self.path] == 1:
+                    self.send_response(429)
+                    self.send_header('Retry-After', '0')
+                    self.end_headers()
+                    return
+                body = IMAGES.get(self.path, b'\x89PNGimage-busy' if self.path == '/busy.png' else None)
+                if body is None:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.base = f'http://127.0.0.1:{self.httpd.server_port}'
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def image_server():
+    server = ImageServer()
+    yield server
+    server.stop()
+
+
+def test_download_dedupes_and_resumes(image_server, tmp_path):
+    urls = [image_server.base + path for path in ('/a.jpg', '/b.jpg', '/c.png', '/busy.png', '/missing.jpg')]
+    urls.append(urls[0])  # 图片表中重复出现的链接
+    store = ImageStore(str(tmp_path / '图片库'))
+    try:
+        result = download_images(urls, store, workers=1, rate=None, retries=3)
+        assert result == Counter(new=3, duplicate=1, failed=1, skipped=0)
+        # 429按Retry-After重试后成功，404不重试，重复链接只请求一次
+        assert image_server.requests == Counter({'/a.jpg': 1, '/b.jpg': 1, '/c.png': 1,
+                                                 '/busy.png': 2, '/missing.jpg': 1})
+        assert store.path_for(urls[0]) == store.path_for(urls[1])
+        assert len(list((tmp_path / '图片库' / 'objects').rglob('*.*'))) == 3
+
+        # 再次运行：已下载的链接全部跳过，只重试失败的链接
+        image_server.requests.clear()
+        result = download_images(urls, store, workers=1, rate=None, retries=3)
+        assert result == Counter(skipped=4, failed=1)
+        assert image_server.requests == Counter({'/missing.jpg': 1})
+
+        image_server.requests.clear()
+        result = download_images([url for url in urls if not url.endswith('/missing.jpg')], store)
+        assert result == Counter(skipped=4)
+        assert not image_server.requests
+    finally:
+        store.close()
+
+
+def test_no_backoff_after_last_attempt(image_server, tmp_path, monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(评论图片下载.time, 'sleep', sleeps.append)
+    store = ImageStore(str(tmp_path / '图片库'))
+    try:
+        result = download_images([image_server.base + '/down.jpg'], store, workers=1, rate=None, retries=3)
+    finally:
+        store.close()
+    assert result == Counter(failed=1)
+    assert image_server.requests == Counter({'/down.jpg': 3})
+    assert sleeps == [1, 2]  # 第三次失败后直接放弃，不再等待
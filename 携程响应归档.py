@@ -0,0 +1,385 @@
+"""
+接口原始响应归档与离线重新解析
+
+- ResponseArchive：爬取时把每个成功响应的原始JSON压缩归档（zstd，未安装zstandard时用gzip），
+  每行一条记录 {"endpoint", "key", "page", "fetched_at", "response"}，
+  按接口和景点ID/地区ID分文件：{root}/{接口}/{景点ID或地区ID}.jsonl.zst|.gz。
+  由单独的写入线程攒批压缩，每批作为一个独立的压缩帧追加到文件末尾，抓取端不做磁盘I/O
+- reextract：不发请求，按归档重新解析出评论/景点数据，写入CSV、SQLite或Parquet；
+  每个归档文件交给进程池中的一个进程解析，同一页归档过多次时以最后一次为准，
+  评论与爬虫一样按评论ID去重；先清空要重建的CSV/Parquet输出，重复运行不会产生重复行
+
+用法：python 携程响应归档.py --archive 响应归档 --endpoint comment --storage parquet --out 重新解析输出
+"""
+import argparse
+import datetime
+import gzip
+import io
+import json
+import logging
+import os
+import queue
+import shutil
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Optional
+
+try:
+    import zstandard
+except ImportError:  # 未安装zstandard时用gzip压缩
+    zstandard = None
+
+try:
+    import orjson
+except ImportError:  # 未安装orjson时用标准库解析归档
+    orjson = None
+
+from 携程爬虫加载 import ATTRACTION_CRAWLER, REVIEW_CRAWLER, load_crawler
+from 携程爬虫监控 import setup_logging
+
+logger = logging.getLogger('携程爬虫.归档')
+
+decode_json = orjson.loads if orjson is not None else json.loads
+
+# 读到被截断的压缩帧（如爬虫被强制结束）时抛出的异常
+TRUNCATED_ERRORS = (EOFError, OSError) + ((zstandard.ZstdError,) if zstandard is not None else ())
+
+ENDPOINTS = ('comment', 'attraction')  # 评论接口（按景点ID归档）、景点列表接口（按地区ID归档）
+EXTENSIONS = {'zstd': '.jsonl.zst', 'gzip': '.jsonl.gz'}
+
+_STOP = object()
+
+
+def default_compression() -> str:
+    return 'zstd' if zstandard is not None else 'gzip'
+
+
+def archive_path(root: str, endpoint: str, key, compression: str) -> str:
+    """单个景点（评论接口）或地区（景点接口）的归档文件"""
+    return os.path.join(root, endpoint, f'{key}{EXTENSIONS[compression]}')
+
+
+def compress(data: bytes, compression: str) -> bytes:
+    if compression == 'zstd':
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    return gzip.compress(data, compresslevel=6)
+
+
+def encode_record(endpoint: str, key, page: int, body: bytes, fetched_at: str) -> bytes:
+    """
+    一条归档记录（一行JSON）
+
+    响应体本身就是JSON，直接拼进记录而不重新序列化；响应体中含换行时才重新序列化为单行
+    """
+    if b'\n' in body or b'\r' in body:
+        body = json.dumps(decode_json(body), ensure_ascii=False).encode('utf-8')
+    head = json.dumps({'endpoint': endpoint, 'key': key, 'page': page, 'fetched_at': fetched_at},
+                      ensure_ascii=False).encode('utf-8')
+    return head[:-1] + b', "response": ' + body + b'}\n'
+
+
+class ResponseArchive:
+    """
+    原始响应归档
+
+    add() 只把响应放进队列；写入线程按文件攒批，攒够batch_size条或距上次写入超过
+    flush_interval秒时，把每个文件的一批记录压缩成一帧追加写入。
+    gzip和zstd都支持多帧拼接，读取时按顺序解压即可，重复运行也只是追加。
+    """
+
+    def __init__(self, root: str, compression: Optional[str] = None, batch_size: int = 200,
+                 flush_interval: float = 5.0):
+        compression = compression or default_compression()
+        if compression not in EXTENSIONS:
+            raise ValueError(f"未知的压缩方式: {compression}")
+        if compression == 'zstd' and zstandard is None:
+            raise ImportError("请先安装依赖：pip install zstandard（或使用gzip压缩）")
+        self.root = root
+        self.compression = compression
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.records = 0
+        self.error = None
+        for endpoint in ENDPOINTS:
+            os.makedirs(os.path.join(root, endpoint), exist_ok=True)
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='response-archive', daemon=True)
+        self._thread.start()
+
+    def add(self, endpoint: str, key, page: int, body: bytes):
+        """
+        归档一个响应
+
+        Args:
+            endpoint: 'comment' 或 'attraction'
+            key: 评论接口为景点ID，景点接口为地区ID
+            page: 页码
+            body: 响应体原始字节
+        """
+        if self.error is not None:
+            return  # 归档失败不影响爬取，出错原因已在写入线程中打印
+        fetched_at = datetime.datetime.now().isoformat(timespec='seconds')
+        self._queue.put((endpoint, key, page, body, fetched_at))
+
+    def close(self):
+        """写完队列中剩余的记录"""
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _run(self):
+        pending = {}  # 文件路径 -> [记录]
+        buffered = 0
+        last_flush = time.monotonic()
+        stopping = False
+        while not stopping:
+            timeout = None
+            if pending:
+                timeout = max(0.0, self.flush_interval - (time.monotonic() - last_flush))
+            try:
+                item = self._queue.get(timeout=timeout)
+                if item is _STOP:
+                    stopping = True
+                else:
+                    endpoint, key, page, body, fetched_at = item
+                    try:
+                        line = encode_record(endpoint, key, page, body, fetched_at)
+                    except ValueError as e:
+                        logger.warning(f"响应无法归档（{endpoint} {key} 第{page}页）: {e}")
+                        continue
+                    path = archive_path(self.root, endpoint, key, self.compression)
+                    pending.setdefault(path, []).append(line)
+                    buffered += 1
+            except queue.Empty:
+                pass
+
+            if pending and (stopping or buffered >= self.batch_size
+                            or time.monotonic() - last_flush >= self.flush_interval):
+                try:
+                    self._flush(pending)
+                except OSError as e:
+                    self.error = e
+                    logger.error(f"写入响应归档失败，停止归档: {e}")
+                    return
+                pending = {}
+                buffered = 0
+                last_flush = time.monotonic()
+
+    def _flush(self, pending):
+        for path, lines in pending.items():
+            with open(path, 'ab') as f:
+                f.write(compress(b''.join(lines), self.compression))
+            self.records += len(lines)
+
+
+# ---------------------- 读取 ----------------------
+def archive_files(root: str, endpoint: str, keys: Optional[List] = None) -> List[str]:
+    """接口下的归档文件，keys为None时返回全部"""
+    directory = os.path.join(root, endpoint)
+    if not os.path.isdir(directory):
+        return []
+    wanted = {str(key) for key in keys} if keys else None
+    files = []
+    for name in sorted(os.listdir(directory)):
+        for extension in EXTENSIONS.values():
+            if name.endswith(extension) and (wanted is None or name[:-len(extension)] in wanted):
+                files.append(os.path.join(directory, name))
+    return files
+
+
+def archive_key(path: str) -> str:
+    """归档文件对应的景点ID（评论接口）或地区ID（景点接口）"""
+    name = os.path.basename(path)
+    for extension in EXTENSIONS.values():
+        if name.endswith(extension):
+            return name[:-len(extension)]
+    return name
+
+
+def open_archive(path: str):
+    """按扩展名打开归档文件，返回按行读取的二进制流（自动跨帧解压）"""
+    if path.endswith(EXTENSIONS['zstd']):
+        if zstandard is None:
+            raise ImportError("请先安装依赖：pip install zstandard")
+        raw = open(path, 'rb')
+        reader = zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True,
+                                                             closefd=True)
+        return io.BufferedReader(reader)
+    return gzip.open(path, 'rb')
+
+
+def read_records(path: str) -> Iterator[Dict]:
+    """逐条读取归档记录；进程中断时最后一帧可能不完整，读到的完整记录照常返回"""
+    with open_archive(path) as f:
+        try:
+            for line in f:
+                if line.strip():
+                    yield decode_json(line)
+        except TRUNCATED_ERRORS as e:
+            logger.warning(f"归档文件 {path} 末尾不完整，已读取之前的记录: {e}")
+
+
+def latest_pages(path: str) -> Dict[int, Dict]:
+    """每页最后一次归档的记录 {页码: 记录}"""
+    latest = {}
+    for record in read_records(path):
+        latest[record['page']] = record
+    return latest
+
+
+# ---------------------- 重新解析 ----------------------
+_crawlers = {}
+
+
+def crawler_module(endpoint: str):
+    """解析用的爬虫模块，每个进程只加载一次"""
+    if endpoint not in _crawlers:
+        if endpoint == 'comment':
+            _crawlers[endpoint] = load_crawler(REVIEW_CRAWLER, 'archive_review_crawler')
+        else:
+            _crawlers[endpoint] = load_crawler(ATTRACTION_CRAWLER, 'archive_attraction_crawler')
+    return _crawlers[endpoint]
+
+
+def extract_file(endpoint: str, path: str):
+    """
+    解析一个归档文件（在进程池中运行）
+
+    Returns:
+        (文件路径, 页数, 行列表)；评论行为按CSV_HEADERS排列的元组（按评论ID去重，保留先出现的一条），
+        景点行为字典
+    """
+    for name in ('携程爬虫.评论', '携程爬虫.景点'):
+        logging.getLogger(name).setLevel(logging.ERROR)  # 爬虫的逐页日志在重新解析时没有意义
+    crawler = crawler_module(endpoint)
+    latest = latest_pages(path)
+    rows = []
+    # 每个评论归档文件只含一个景点；翻页期间有新评论时同一条评论会出现在相邻两页，与爬虫一样丢弃重复
+    seen = crawler.SeenComments() if endpoint == 'comment' else None
+    for page in sorted(latest):
+        record = latest[page]
+        if endpoint == 'comment':
+            comments, _ = crawler.parse_comments(record['response'], record['key'], page)
+            comments = seen.drop_seen(record['key'], comments or [])
+            rows.extend(tuple(comment) for comment in comments)
+        else:
+            page_data, _ = crawler.parse_attraction_page(page, record['response'], record['key'])
+            rows.extend(page_data or ())
+    return path, len(latest), rows
+
+
+def open_output(endpoint: str, storage: str, db_path: str, parquet_dir: str):
+    """重新解析的存储后端，字段与爬虫一致"""
+    from 携程数据存储 import CsvBackend, ParquetBackend, SqliteBackend
+
+    fieldnames = crawler_module(endpoint).CSV_HEADERS if endpoint == 'comment' \
+        else crawler_module(endpoint).FIELDNAMES
+    review_fields, attraction_fields = (fieldnames, None) if endpoint == 'comment' else (None, fieldnames)
+    images = endpoint == 'comment'  # 评论同时重建图片表
+    if storage == 'sqlite':
+        return SqliteBackend(db_path, review_fields, attraction_fields, images=images)
+    if storage == 'parquet':
+        return ParquetBackend(parquet_dir, review_fields, attraction_fields, images=images)
+    if endpoint == 'comment':
+        return CsvBackend(fieldnames, '全部评论.csv', fsync_policy='none', image_path='评论图片.csv')
+    return CsvBackend([], attraction_fieldnames=fieldnames, fsync_policy='none')
+
+
+def clear_output(endpoint: str, storage: str, keys: List[str], parquet_dir: str):
+    """
+    清空要重建的输出：CSV和Parquet只会追加，不清空时重复运行会产生重复行；
+    sqlite按评论ID/景点ID upsert，无需清空
+    """
+    from 携程数据存储 import CsvBackend, ParquetBackend
+
+    if storage == 'parquet':
+        if endpoint == 'comment':
+            for key in keys:
+                ParquetBackend.drop_reviews(parquet_dir, key)
+        else:
+            shutil.rmtree(os.path.join(parquet_dir, 'attractions'), ignore_errors=True)
+    elif storage == 'csv':
+        if endpoint == 'comment':
+            paths = [CsvBackend.review_path(key) for key in keys] + ['全部评论.csv', '评论图片.csv']
+        else:
+            paths = ['携程景点数据.csv']
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def reextract(archive_root: str, endpoint: str = 'comment', storage: str = 'csv',
+              keys: Optional[List] = None, workers: Optional[int] = None,
+              db_path: str = '携程数据.db', parquet_dir: str = '携程数据_parquet'):
+    """
+    从归档重新生成输出，写入当前目录（文件名与爬虫的输出相同）；
+    已有的同名CSV文件和对应的Parquet分区会先被删除
+
+    Args:
+        archive_root: 归档目录
+        endpoint: 'comment' 重建评论，'attraction' 重建景点
+        storage: 'csv'、'sqlite' 或 'parquet'
+        keys: 只处理这些景点ID/地区ID，None为全部
+        workers: 解析进程数，默认为CPU核数
+
+    Returns:
+        (页数, 行数)
+    """
+    if endpoint not in ENDPOINTS:
+        raise ValueError(f"未知的接口: {endpoint}")
+    files = archive_files(archive_root, endpoint, keys)
+    if not files:
+        logger.warning(f"{archive_root} 中没有{endpoint}接口的归档")
+        return 0, 0
+
+    clear_output(endpoint, storage, [archive_key(path) for path in files], parquet_dir)
+    backend = open_output(endpoint, storage, db_path, parquet_dir)
+    total_pages = total_rows = 0
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(extract_file, endpoint, path) for path in files]
+            # 主进程是唯一的写入方，各文件解析完即写入
+            for future in as_completed(futures):
+                path, pages, rows = future.result()
+                if rows:
+                    if endpoint == 'comment':
+                        backend.write_reviews(rows)
+                    else:
+                        backend.write_attractions(rows)
+                    backend.flush()
+                total_pages += pages
+                total_rows += len(rows)
+                logger.info(f"{os.path.basename(path)}：{pages}页，{len(rows)}行", extra={'pages': pages, 'rows': len(rows)})
+    finally:
+        backend.close()
+    return total_pages, total_rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='从原始响应归档重新生成评论/景点数据')
+    parser.add_argument('--archive', default='响应归档', help='归档目录')
+    parser.add_argument('--endpoint', choices=ENDPOINTS, default='comment',
+                        help='comment重建评论，attraction重建景点')
+    parser.add_argument('--storage', choices=['csv', 'sqlite', 'parquet'], default='csv')
+    parser.add_argument('--out', default='重新解析输出', help='输出目录，文件名与爬虫的输出相同')
+    parser.add_argument('--keys', type=int, nargs='*', help='只处理这些景点ID（评论）或地区ID（景点）')
+    parser.add_argument('--workers', type=int, default=None, help='解析进程数，默认为CPU核数')
+    args = parser.parse_args()
+
+    setup_logging('INFO')
+    archive_root = os.path.abspath(args.archive)
+    os.makedirs(args.out, exist_ok=True)
+    os.chdir(args.out)
+    start = time.perf_counter()
+    pages, rows = reextract(archive_root, args.endpoint, args.storage, args.keys, args.workers)
+    print(f"重新解析完成！{pages}页，{rows}行，耗时{time.perf_counter() - start:.2f}秒，输出目录：{os.getcwd()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,561 @@
+import csv
+import datetime
+import logging
+import os
+import queue
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Sequence, Union
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # 未安装pyarrow时不能使用Parquet存储
+    pa = None
+    pq = None
+
+logger = logging.getLogger('携程爬虫.存储')
+
+_STOP = object()
+
+# SQLite列类型，未列出的列按TEXT存储
+COLUMN_TYPES = {
+    '评论ID': 'INTEGER', '用户ID': 'TEXT', '景点ID': 'INTEGER',
+    '总评分': 'REAL', '景色评分': 'REAL', '趣味评分': 'REAL', '性价比评分': 'REAL',
+    '点赞数': 'INTEGER', '回复数': 'INTEGER', '图片数量': 'INTEGER', '是否精选': 'INTEGER',
+    '热度分': 'REAL', '评论数量': 'INTEGER', '评分': 'REAL', '门票价格': 'REAL', '地区ID': 'INTEGER',
+    '序号': 'INTEGER',
+}
+
+# 图片表：每张评论图片/用户头像一行，头像序号为0，评论图片序号从1开始
+IMAGE_FIELDNAMES = ['评论ID', '景点ID', '类型', '序号', '链接']
+
+
+Row = Union[Dict, Sequence]
+
+
+def comment_id_key(value):
+    """评论ID统一为整数（CSV中读出的是字符串），无法转换时原样返回"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return value
+
+
+def as_tuples(rows: List[Row], fieldnames: List[str]) -> List[tuple]:
+    """
+    把行统一为按fieldnames排列的元组
+
+    字典按字段名取值（缺失为空字符串）；元组（如评论爬虫的CommentRecord）视为已按fieldnames排列，原样返回
+    """
+    return [
+        row if isinstance(row, tuple) else tuple(row.get(name, '') for name in fieldnames)
+        for row in rows
+    ]
+
+
+def image_rows(rows: List[Row], fieldnames: List[str]) -> List[tuple]:
+    """把评论的图片链接（'|'分隔）和用户头像展开为图片表的行，按IMAGE_FIELDNAMES排列"""
+    id_index = fieldnames.index('评论ID')
+    poi_index = fieldnames.index('景点ID')
+    links_index = fieldnames.index('图片链接')
+    avatar_index = fieldnames.index('用户头像') if '用户头像' in fieldnames else None
+    images = []
+    for row in as_tuples(rows, fieldnames):
+        comment_id, poi_id = row[id_index], row[poi_index]
+        if avatar_index is not None and row[avatar_index]:
+            images.append((comment_id, poi_id, '用户头像', 0, row[avatar_index]))
+        if row[links_index]:
+            for ordinal, url in enumerate(row[links_index].split('|'), 1):
+                if url:
+                    images.append((comment_id, poi_id, '评论图片', ordinal, url))
+    return images
+
+
+class StorageBackend:
+    """
+    存储后端接口
+
+    write_reviews / write_attractions 写入一批行，flush 把已写入的批次持久化。
+    行可以是字典，也可以是按字段顺序排列的元组。
+    评论由BufferedSink的写入线程调用，景点由景点爬虫直接调用。
+    """
+
+    def write_reviews(self, rows: List[Row]):
+        raise NotImplementedError
+
+    def write_attractions(self, rows: List[Row]):
+        raise NotImplementedError
+
+    def review_ids(self, poi_id) -> set:
+        """单个景点已写入的评论ID（断点续爬时用来预置去重集合）"""
+        return set()
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class CsvBackend(StorageBackend):
+    """
+    CSV存储：评论按景点ID写入 {景点ID}_评论.csv，同时追加到汇总文件；
+    传入image_path时图片表追加到该文件
+
+    文件句柄常开（最多max_open_files个，超出时关闭最久未用的）。
+    fsync_policy:
+        'none'  只flush到操作系统，不fsync
+        'flush' 每次flush后fsync（最安全，最慢）
+        'close' 关闭文件时fsync
+    """
+
+    def __init__(self, review_fieldnames: List[str], total_path: Optional[str] = None,
+                 attraction_fieldnames: Optional[List[str]] = None,
+                 attraction_path: str = '携程景点数据.csv',
+                 fsync_policy: str = 'close', max_open_files: int = 64,
+                 image_path: Optional[str] = None):
+        if fsync_policy not in ('none', 'flush', 'close'):
+            raise ValueError(f"未知的fsync策略: {fsync_policy}")
+        self.review_fieldnames = review_fieldnames
+        self.total_path = total_path
+        self.image_path = image_path
+        self.attraction_fieldnames = attraction_fieldnames
+        self.attraction_path = attraction_path
+        self.fsync_policy = fsync_policy
+        self.max_open_files = max_open_files
+        self._files = OrderedDict()  # 路径 -> (文件, csv.writer)，按最近使用排序
+        self._dirty = set()
+
+    @staticmethod
+    def review_path(poi_id) -> str:
+        """单个景点的评论文件名"""
+        return f'{poi_id}_评论.csv'
+
+    def write_reviews(self, rows: List[Row]):
+        rows = as_tuples(rows, self.review_fieldnames)
+        poi_index = self.review_fieldnames.index('景点ID')
+        by_poi = OrderedDict()
+        for row in rows:
+            by_poi.setdefault(row[poi_index], []).append(row)
+        for poi_id, poi_rows in by_poi.items():
+            self._write(self.review_path(poi_id), self.review_fieldnames, poi_rows)
+        if self.total_path is not None:
+            self._write(self.total_path, self.review_fieldnames, rows)
+        if self.image_path is not None:
+            self._write(self.image_path, IMAGE_FIELDNAMES, image_rows(rows, self.review_fieldnames))
+
+    def write_attractions(self, rows: List[Row]):
+        self._write(self.attraction_path, self.attraction_fieldnames,
+                    as_tuples(rows, self.attraction_fieldnames))
+
+    def review_ids(self, poi_id) -> set:
+        path = self.review_path(poi_id)
+        if not os.path.exists(path):
+            return set()
+        index = self.review_fieldnames.index('评论ID')
+        with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+            reader = csv.reader(f)
+            next(reader, None)  # 表头
+            return {comment_id_key(row[index]) for row in reader if len(row) > index and row[index]}
+
+    def flush(self):
+        for path in self._dirty:
+            if path in self._files:
+                f = self._files[path][0]
+                f.flush()
+                if self.fsync_policy == 'flush':
+                    os.fsync(f.fileno())
+        self._dirty.clear()
+
+    def close(self):
+        while self._files:
+            _, (f, _) = self._files.popitem(last=False)
+            try:
+                self._close_file(f)
+            except Exception as e:
+                logger.error(f"关闭文件失败: {e}")
+
+    def _write(self, path, fieldnames, rows):
+        if path in self._files:
+            self._files.move_to_end(path)
+            writer = self._files[path][1]
+        else:
+            if len(self._files) >= self.max_open_files:
+                _, (old, _) = self._files.popitem(last=False)
+                self._close_file(old)
+            f = open(path, 'a', encoding='utf-8-sig', newline='')
+            writer = csv.writer(f)
+            if f.tell() == 0:
+                writer.writerow(fieldnames)
+            self._files[path] = (f, writer)
+        writer.writerows(rows)
+        self._dirty.add(path)
+
+    def _close_file(self, f):
+        f.flush()
+        if self.fsync_policy != 'none':
+            os.fsync(f.fileno())
+        f.close()
+
+
+class SqliteBackend(StorageBackend):
+    """
+    SQLite存储：评论按评论ID、景点按景点ID upsert，写入时即去重
+
+    评论表在景点ID和发布时间上建索引，便于按景点/时间段查询子集。
+    images为True时同时写入图片表review_images（按评论ID、类型、序号upsert）。
+    每批写入在一个事务中完成，flush时提交。
+    """
+
+    def __init__(self, db_path: str, review_fieldnames: Optional[List[str]] = None,
+                 attraction_fieldnames: Optional[List[str]] = None, images: bool = False):
+        self.db_path = db_path
+        self.review_fieldnames = review_fieldnames
+        self.attraction_fieldnames = attraction_fieldnames
+        self.images = images
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        if review_fieldnames:
+            self._create_table('reviews', review_fieldnames, '评论ID')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS idx_reviews_poi ON reviews ("景点ID")')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS idx_reviews_time ON reviews ("发布时间")')
+        if attraction_fieldnames:
+            self._create_table('attractions', attraction_fieldnames, '景点ID')
+        if images:
+            columns = ', '.join(f'"{name}" {COLUMN_TYPES.get(name, "TEXT")}' for name in IMAGE_FIELDNAMES)
+            self.conn.execute(f'CREATE TABLE IF NOT EXISTS review_images ({columns}, '
+                              'PRIMARY KEY ("评论ID", "类型", "序号"))')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS idx_review_images_poi ON review_images ("景点ID")')
+        self.conn.commit()
+
+    def _create_table(self, table, fieldnames, key):
+        columns = ', '.join(
+            f'"{name}" {COLUMN_TYPES.get(name, "TEXT")}' + (' PRIMARY KEY' if name == key else '')
+            for name in fieldnames
+        )
+        self.conn.execute(f'CREATE TABLE IF NOT EXISTS {table} ({columns})')
+        # 旧版本建的表缺少后来新增的列（如景点的地区ID）时补上
+        existing = {row[1] for row in self.conn.execute(f'PRAGMA table_info({table})')}
+        for name in fieldnames:
+            if name not in existing:
+                self.conn.execute(f'ALTER TABLE {table} ADD COLUMN "{name}" {COLUMN_TYPES.get(name, "TEXT")}')
+
+    @staticmethod
+    def _upsert_sql(table, fieldnames, key):
+        columns = ', '.join(f'"{name}"' for name in fieldnames)
+        placeholders = ', '.join('?' for _ in fieldnames)
+        updates = ', '.join(f'"{name}" = excluded."{name}"' for name in fieldnames if name != key)
+        return (f'INSERT INTO {table} ({columns}) VALUES ({placeholders}) '
+                f'ON CONFLICT("{key}") DO UPDATE SET {updates}')
+
+    def _upsert(self, table, fieldnames, key, rows):
+        if not fieldnames:
+            raise ValueError(f"未配置{table}表的字段，无法写入")
+        sql = self._upsert_sql(table, fieldnames, key)
+        key_index = fieldnames.index(key)
+        values = [row for row in as_tuples(rows, fieldnames) if row[key_index] not in (None, '')]
+        self.conn.executemany(sql, values)
+
+    def write_reviews(self, rows: List[Row]):
+        self._upsert('reviews', self.review_fieldnames, '评论ID', rows)
+        if self.images:
+            placeholders = ', '.join('?' for _ in IMAGE_FIELDNAMES)
+            self.conn.executemany(f'INSERT OR REPLACE INTO review_images VALUES ({placeholders})',
+                                  image_rows(rows, self.review_fieldnames))
+
+    def write_attractions(self, rows: List[Row]):
+        self._upsert('attractions', self.attraction_fieldnames, '景点ID', rows)
+        self.conn.commit()
+
+    def review_ids(self, poi_id) -> set:
+        if not self.review_fieldnames:
+            return set()
+        rows = self.conn.execute('SELECT "评论ID" FROM reviews WHERE "景点ID" = ?', (int(poi_id),))
+        return {comment_id for (comment_id,) in rows}
+
+    def flush(self):
+        self.conn.commit()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+
+def _parquet_types():
+    """Parquet列类型，低基数列使用字典类型；未列出的列按string存储"""
+    category = pa.dictionary(pa.int32(), pa.string())
+    return {
+        # 评论
+        '评论ID': pa.int64(), '用户ID': pa.string(), '用户等级': category,
+        '发布时间': pa.timestamp('s'), '发布地点': category,
+        '总评分': pa.int8(), '景色评分': pa.int8(), '趣味评分': pa.int8(), '性价比评分': pa.int8(),
+        '点赞数': pa.int32(), '回复数': pa.int32(), '图片数量': pa.int16(),
+        '是否精选': pa.bool_(), '发布类型': category, '景点ID': pa.int64(),
+        # 景点
+        '所在地区': category, '区域名称': category, '景区等级': category,
+        '热度分': pa.float32(), '评论数量': pa.int32(), '评分': pa.float32(),
+        '是否免费': pa.bool_(), '门票价格': pa.float32(), '价格类型': category, '地区ID': pa.int64(),
+        # 图片
+        '类型': category, '序号': pa.int16(), '链接': pa.string(),
+    }
+
+
+def _to_int(value):
+    if value is None or value == '':
+        return None
+    try:
+        # 先按整数解析，评论ID等大于2**53的整数经float会丢精度
+        return int(value)
+    except (TypeError, ValueError):
+        pass
+    try:
+        return int(float(value))
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+
+def _to_float(value):
+    if value is None or value == '':
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_bool(value):
+    if isinstance(value, bool):
+        return value
+    if value is None or value == '':
+        return None
+    return str(value).strip() in ('True', 'true', 'TRUE', '1', '是')
+
+
+def _to_datetime(value):
+    if isinstance(value, datetime.datetime) or not value:
+        return value or None
+    for fmt in ('%Y-%m-%d %H:%M:%S', '%Y/%m/%d %H:%M', '%Y-%m-%d %H:%M', '%Y-%m-%d'):
+        try:
+            return datetime.datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def to_arrow_table(rows: List[Row], fieldnames: List[str]):
+    """按Parquet列类型把行转换为pyarrow表，无法转换的值记为空"""
+    types = _parquet_types()
+    columns = list(zip(*as_tuples(rows, fieldnames))) or [()] * len(fieldnames)
+    arrays = []
+    fields = []
+    for name, values in zip(fieldnames, columns):
+        arrow_type = types.get(name, pa.string())
+        if pa.types.is_dictionary(arrow_type):
+            array = pa.array([None if v is None else str(v) for v in values], pa.string()).dictionary_encode()
+        elif pa.types.is_integer(arrow_type):
+            array = pa.array([_to_int(v) for v in values], arrow_type)
+        elif pa.types.is_floating(arrow_type):
+            array = pa.array([_to_float(v) for v in values], arrow_type)
+        elif pa.types.is_boolean(arrow_type):
+            array = pa.array([_to_bool(v) for v in values], arrow_type)
+        elif pa.types.is_timestamp(arrow_type):
+            array = pa.array([_to_datetime(v) for v in values], arrow_type)
+        else:
+            array = pa.array([None if v is None else str(v) for v in values], arrow_type)
+        arrays.append(array)
+        fields.append(pa.field(name, array.type))
+    return pa.Table.from_arrays(arrays, schema=pa.schema(fields))
+
+
+class ParquetBackend(StorageBackend):
+    """
+    Parquet存储：按列类型写入（评分为整数、是否精选为布尔、发布时间为时间戳），
+    低基数列使用字典编码
+
+    评论写入 {root}/reviews/景点ID=xxx/ 分区目录，景点写入 {root}/attractions/，
+    images为True时图片表写入 {root}/images/景点ID=xxx/。
+    每次flush写出新的完整文件，写完即可读取，因此断点日志记录的页不会丢失；
+    文件数量随flush次数增长，使用Parquet时宜调大刷盘行数。
+    """
+
+    def __init__(self, root: str, review_fieldnames: Optional[List[str]] = None,
+                 attraction_fieldnames: Optional[List[str]] = None,
+                 compression: str = 'zstd', images: bool = False):
+        if pa is None:
+            raise ImportError("请先安装依赖：pip install pyarrow")
+        self.root = root
+        self.images = images
+        self.review_fieldnames = review_fieldnames
+        self.attraction_fieldnames = attraction_fieldnames
+        self.compression = compression
+        self._pending_reviews = []
+
+    @staticmethod
+    def review_partition(root: str, poi_id) -> str:
+        """单个景点的评论分区目录"""
+        return os.path.join(root, 'reviews', f'景点ID={poi_id}')
+
+    @classmethod
+    def drop_reviews(cls, root: str, poi_id):
+        """删除单个景点已写入的评论和图片表（全量重爬前调用）"""
+        shutil.rmtree(cls.review_partition(root, poi_id), ignore_errors=True)
+        shutil.rmtree(os.path.join(root, 'images', f'景点ID={poi_id}'), ignore_errors=True)
+
+    def _write_table(self, table, subdir, partition_cols=None):
+        dictionary_cols = [f.name for f in table.schema if pa.types.is_dictionary(f.type)]
+        pq.write_to_dataset(
+            table,
+            os.path.join(self.root, subdir),
+            partition_cols=partition_cols,
+            basename_template=f'part-{uuid.uuid4().hex}-{{i}}.parquet',
+            existing_data_behavior='overwrite_or_ignore',
+            compression=self.compression,
+            use_dictionary=dictionary_cols,
+        )
+
+    def write_reviews(self, rows: List[Row]):
+        self._pending_reviews.extend(rows)
+
+    def review_ids(self, poi_id) -> set:
+        partition = self.review_partition(self.root, poi_id)
+        if not os.path.isdir(partition):
+            return set()
+        table = pq.read_table(partition, columns=['评论ID'])
+        return {comment_id for comment_id in table.column('评论ID').to_pylist() if comment_id is not None}
+
+    def write_attractions(self, rows: List[Row]):
+        if not self.attraction_fieldnames:
+            raise ValueError("未配置景点字段，无法写入")
+        self._write_table(to_arrow_table(rows, self.attraction_fieldnames), 'attractions')
+
+    def flush(self):
+        if not self._pending_reviews:
+            return
+        table = to_arrow_table(self._pending_reviews, self.review_fieldnames)
+        self._write_table(table, 'reviews', partition_cols=['景点ID'])
+        if self.images:
+            images = image_rows(self._pending_reviews, self.review_fieldnames)
+            if images:
+                self._write_table(to_arrow_table(images, IMAGE_FIELDNAMES), 'images', partition_cols=['景点ID'])
+        self._pending_reviews = []
+
+    def close(self):
+        self.flush()
+
+
+def read_reviews_parquet(root: str, poi_ids: Optional[List] = None,
+                         columns: Optional[List[str]] = None):
+    """
+    读取Parquet评论数据集为DataFrame，可只读部分景点和部分列
+
+    低基数列读出即为category类型，无需再解析字符串
+    """
+    import pandas as pd
+    filters = [('景点ID', 'in', [int(poi_id) for poi_id in poi_ids])] if poi_ids else None
+    return pd.read_parquet(os.path.join(root, 'reviews'), columns=columns, filters=filters)
+
+
+class BufferedSink:
+    """
+    单写入线程的评论输出
+
+    抓取线程/协程只调用write()把行放进队列，不做任何磁盘I/O；
+    写入线程攒批交给存储后端，行数达到flush_rows或距上次刷盘超过
+    flush_interval秒时刷盘。每批落盘后按顺序调用各自的on_flushed回调
+    （如记录断点日志），保证日志只记录已落盘的数据。
+    """
+
+    def __init__(self, backend: StorageBackend, flush_rows: int = 500,
+                 flush_interval: float = 2.0):
+        self.backend = backend
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.error = None
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='review-sink', daemon=True)
+        self._thread.start()
+
+    def write(self, rows: List[Row], on_flushed: Optional[Callable] = None):
+        """
+        提交一批评论
+
+        rows可以为空列表，此时on_flushed在此前提交的行全部落盘后调用
+        """
+        if self.error is not None:
+            raise RuntimeError(f"写入线程已出错: {self.error}")
+        self._queue.put((rows, on_flushed))
+
+    @property
+    def backlog(self) -> int:
+        """队列中等待写入线程处理的批次数"""
+        return self._queue.qsize()
+
+    def close(self):
+        """写完队列中剩余的数据并关闭存储后端"""
+        self._queue.put(_STOP)
+        self._thread.join()
+        if self.error is not None:
+            raise RuntimeError(f"写入线程出错: {self.error}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _run(self):
+        pending = []
+        buffered = 0
+        last_flush = time.monotonic()
+        stopping = False
+        try:
+            while not stopping:
+                # 没有待写数据时一直等；有待写数据时最多等到下一个刷盘时间点
+                timeout = None
+                if pending:
+                    timeout = max(0.0, self.flush_interval - (time.monotonic() - last_flush))
+                try:
+                    item = self._queue.get(timeout=timeout)
+                    if item is _STOP:
+                        stopping = True
+                    else:
+                        if not pending:
+                            last_flush = time.monotonic()
+                        pending.append(item)
+                        buffered += len(item[0])
+                except queue.Empty:
+                    pass
+
+                if pending and (stopping or buffered >= self.flush_rows
+                                or time.monotonic() - last_flush >= self.flush_interval):
+                    self._flush(pending)
+                    pending = []
+                    buffered = 0
+                    last_flush = time.monotonic()
+        except Exception as e:
+            self.error = e
+            logger.error(f"写入线程出错，停止写入: {e}")
+        finally:
+            try:
+                self.backend.close()
+            except Exception as e:
+                logger.error(f"关闭存储后端失败: {e}")
+
+    def _flush(self, pending):
+        rows = [row for batch, _ in pending for row in batch]
+        if rows:
+            self.backend.write_reviews(rows)
+        self.backend.flush()
+
+        for _, on_flushed in pending:
+            if on_flushed is not None:
+                try:
+                    on_flushed()
+                except Exception as e:
+                    logger.error(f"写入回调失败: {e}")
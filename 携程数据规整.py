@@ -0,0 +1,299 @@
+"""
+评论/景点数据的类型规整，供各分析脚本共用
+
+读入时统一做一次类型转换，结果按输入文件的内容哈希缓存（parquet，需安装pyarrow；否则为pickle），
+之后的分析直接读取已带类型的数据，不必每次重新解析：
+- 评分为小整数（Int8），点赞数/回复数/评论数量等计数为Int16/Int32，空值保留为<NA>
+- 是否精选、是否免费为布尔，发布时间为datetime
+- 门票价格为数值，"距市中心11.7km"/"距市中心800m" 向量化解析为 距离市中心_km
+- 用户等级、发布地点、景区等级等低基数列为category
+列类型与 携程数据存储.py 的parquet存储一致。
+
+省内存读取：columns 只读取分析用到的列（用户头像、图片链接等很宽的字符串列不进内存）；
+缓存按块生成，峰值内存只有一块；比内存还大的文件用 iter_reviews 逐块读取、逐块聚合。
+
+用法：
+    from 携程数据规整 import load_reviews, load_attractions, iter_reviews
+    df = load_reviews('全部评论清洗后.csv', columns=['评论内容', '总评分', '发布时间'])
+    for chunk in iter_reviews('全部评论清洗后.csv', columns=['总评分']):
+        ...
+    python 携程数据规整.py 全部评论清洗后.csv --kind reviews   # 预先生成缓存并查看类型和内存占用
+"""
+import argparse
+import hashlib
+import os
+
+import pandas as pd
+
+# 可选依赖：缓存为parquet需要pyarrow，未安装时缓存为pickle
+try:
+    import pyarrow
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    pyarrow = None
+
+CACHE_DIR = '.规整缓存'  # 缓存目录（位于输入文件所在目录）
+NORMALIZE_VERSION = 1  # 规整规则变化时加1，旧缓存随之失效
+CHUNK_ROWS = 200_000  # 按块读取/生成缓存时每块的行数
+
+REVIEW_TYPES = {
+    '评论ID': 'Int64', '用户ID': 'string', '景点ID': 'Int64',
+    '用户名': 'string', '评论内容': 'string',
+    '用户等级': 'category', '发布地点': 'category', '发布类型': 'category',
+    '总评分': 'Int8', '景色评分': 'Int8', '趣味评分': 'Int8', '性价比评分': 'Int8',
+    '点赞数': 'Int32', '回复数': 'Int32', '图片数量': 'Int16',
+    '是否精选': 'boolean', '发布时间': 'datetime',
+}
+ATTRACTION_TYPES = {
+    '景点ID': 'Int64', '景点名称': 'string', '地区ID': 'Int64',
+    '所在地区': 'category', '区域名称': 'category', '景区等级': 'category', '价格类型': 'category',
+    '热度分': 'float32', '评论数量': 'Int32', '评分': 'float32', '门票价格': 'float32',
+    '是否免费': 'boolean',
+}
+DATETIME_FORMATS = ('%Y-%m-%d %H:%M:%S', '%Y/%m/%d %H:%M', '%Y/%m/%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d')
+TRUE_VALUES = {'True': True, 'true': True, 'TRUE': True, '1': True, '是': True,
+               'False': False, 'false': False, 'FALSE': False, '0': False, '否': False}
+
+
+def to_datetime(series: pd.Series) -> pd.Series:
+    """依次按爬虫输出的几种时间格式向量化解析，无法解析为NaT"""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series
+    result = pd.Series(pd.NaT, index=series.index, dtype='datetime64[ns]')
+    text = series.astype('string').str.strip()
+    for fmt in DATETIME_FORMATS:
+        missing = result.isna() & text.notna()
+        if not missing.any():
+            break
+        result[missing] = pd.to_datetime(text[missing], format=fmt, errors='coerce')
+    return result
+
+
+def to_boolean(series: pd.Series) -> pd.Series:
+    """'是'/'否'、True/False、1/0 转为布尔，其余为<NA>"""
+    if pd.api.types.is_bool_dtype(series):
+        return series.astype('boolean')
+    return series.astype('string').str.strip().map(TRUE_VALUES).astype('boolean')
+
+
+def to_integer(series: pd.Series, dtype: str) -> pd.Series:
+    """数值转为可空整数类型（小数四舍五入），无法解析为<NA>"""
+    return pd.to_numeric(series, errors='coerce').round().astype(dtype)
+
+
+def parse_distance(series: pd.Series) -> pd.Series:
+    """'距市中心11.7km'、'距市中心800m' 向量化解析为公里数（float32）"""
+    parts = series.astype('string').str.extract(r'([\d.]+)\s*(km|m)', expand=True)
+    value = pd.to_numeric(parts[0], errors='coerce')
+    return value.where(parts[1] == 'km', value / 1000).astype('float32')
+
+
+def apply_types(df: pd.DataFrame, types: dict) -> pd.DataFrame:
+    """按类型表转换各列，表中没有的列保持原样"""
+    df = df.copy()
+    for name, dtype in types.items():
+        if name not in df.columns:
+            continue
+        column = df[name]
+        if isinstance(column.dtype, pd.CategoricalDtype) and dtype != 'category':
+            # parquet数据集的分区列（如景点ID）读出为category
+            column = column.astype('string')
+        if dtype == 'datetime':
+            df[name] = to_datetime(column)
+        elif dtype == 'boolean':
+            df[name] = to_boolean(column)
+        elif dtype.startswith('Int'):
+            df[name] = to_integer(column, dtype)
+        elif dtype.startswith('float'):
+            df[name] = pd.to_numeric(column, errors='coerce').astype(dtype)
+        elif dtype == 'category':
+            df[name] = column.astype('string').str.strip().astype('category')
+        else:
+            df[name] = column.astype(dtype)
+    return df
+
+
+def normalize_reviews(df: pd.DataFrame) -> pd.DataFrame:
+    """评论数据的类型规整"""
+    return apply_types(df, REVIEW_TYPES)
+
+
+def normalize_attractions(df: pd.DataFrame) -> pd.DataFrame:
+    """景点数据的类型规整，另外解析出 距离市中心_km"""
+    df = apply_types(df, ATTRACTION_TYPES)
+    if '距离市中心' in df.columns:
+        df['距离市中心_km'] = parse_distance(df['距离市中心'])
+    return df
+
+
+NORMALIZERS = {'reviews': normalize_reviews, 'attractions': normalize_attractions}
+
+
+def file_digest(path: str) -> str:
+    """文件内容的哈希，作为缓存键"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_path(path: str, kind: str, cache_dir=None) -> str:
+    cache_dir = cache_dir or os.path.join(os.path.dirname(os.path.abspath(path)), CACHE_DIR)
+    suffix = '.parquet' if pyarrow is not None else '.pkl'
+    return os.path.join(cache_dir, f'{kind}_v{NORMALIZE_VERSION}_{file_digest(path)}{suffix}')
+
+
+def project(columns, available):
+    """只保留数据中存在的列，columns为None时不投影"""
+    return [name for name in columns if name in available] if columns else None
+
+
+def concat_frames(frames) -> pd.DataFrame:
+    """合并各块，category列先统一类别，避免合并后退化为object"""
+    if len(frames) == 1:
+        return frames[0]
+    for name, dtype in frames[0].dtypes.items():
+        if isinstance(dtype, pd.CategoricalDtype):
+            categories = pd.Index(pd.concat([frame[name].cat.categories.to_series() for frame in frames]).unique())
+            for frame in frames:
+                frame[name] = frame[name].cat.set_categories(categories)
+    return pd.concat(frames, ignore_index=True)
+
+
+def read_csv_chunks(path, columns=None, chunk_rows=CHUNK_ROWS):
+    """按块读取CSV，所有列按字符串读入，columns只解析这些列"""
+    usecols = (lambda name: name in columns) if columns else None
+    return pd.read_csv(path, dtype=str, encoding='utf-8-sig', usecols=usecols, chunksize=chunk_rows)
+
+
+def arrow_schema(table):
+    """缓存文件的固定表结构：字典列的索引统一为int32，全空的列为string，各块才能写入同一个文件"""
+    fields = []
+    for field in table.schema:
+        if pyarrow.types.is_dictionary(field.type):
+            field = field.with_type(pyarrow.dictionary(pyarrow.int32(), field.type.value_type))
+        elif pyarrow.types.is_null(field.type):
+            field = field.with_type(pyarrow.string())
+        fields.append(field)
+    return pyarrow.schema(fields, metadata=table.schema.metadata)
+
+
+def build_cache(path, kind, cached, chunk_rows=CHUNK_ROWS):
+    """按块规整CSV并写入缓存文件，峰值内存只有一块"""
+    normalize = NORMALIZERS[kind]
+    os.makedirs(os.path.dirname(cached), exist_ok=True)
+    tmp_path = cached + '.tmp'
+    if not cached.endswith('.parquet'):
+        concat_frames([normalize(chunk) for chunk in read_csv_chunks(path, chunk_rows=chunk_rows)]).to_pickle(tmp_path)
+        os.replace(tmp_path, cached)
+        return
+    writer = None
+    try:
+        for chunk in read_csv_chunks(path, chunk_rows=chunk_rows):
+            table = pyarrow.Table.from_pandas(normalize(chunk), preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(tmp_path, arrow_schema(table))
+            writer.write_table(table.cast(writer.schema))
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None:
+        normalize(pd.read_csv(path, dtype=str, encoding='utf-8-sig')).to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, cached)
+
+
+def cached_file(path, kind, cache_dir=None, chunk_rows=CHUNK_ROWS) -> str:
+    """已规整数据的缓存文件，不存在时生成"""
+    cached = cache_path(path, kind, cache_dir)
+    if not os.path.exists(cached):
+        build_cache(path, kind, cached, chunk_rows)
+    return cached
+
+
+def load_typed(path: str, kind: str = 'reviews', cache_dir=None, use_cache: bool = True,
+               columns=None, chunk_rows: int = CHUNK_ROWS) -> pd.DataFrame:
+    """
+    读取并规整数据
+
+    Args:
+        path: CSV文件，或爬虫parquet存储的数据集目录（读取其中的reviews/attractions，列已带类型，不缓存）
+        kind: 'reviews' 或 'attractions'
+        cache_dir: 缓存目录，默认为输入文件所在目录下的 .规整缓存
+        use_cache: 为False时不读写缓存
+        columns: 只读取这些列（数据中没有的列忽略），None为全部列
+        chunk_rows: 不使用缓存时按块读取CSV、生成缓存时每块的行数
+    """
+    normalize = NORMALIZERS[kind]
+    if os.path.isdir(path):
+        dataset = os.path.join(path, kind)
+        return normalize(pd.read_parquet(dataset, columns=project(columns, ds.dataset(
+            dataset, format='parquet', partitioning='hive').schema.names)))
+
+    if use_cache:
+        cached = cached_file(path, kind, cache_dir, chunk_rows)
+        if cached.endswith('.parquet'):
+            return pd.read_parquet(cached, columns=project(columns, pq.read_schema(cached).names))
+        df = pd.read_pickle(cached)
+        return df[project(columns, df.columns)] if columns else df
+
+    frames = [normalize(chunk) for chunk in read_csv_chunks(path, columns, chunk_rows)]
+    return concat_frames(frames) if frames else pd.DataFrame(columns=columns or [])
+
+
+def iter_typed(path: str, kind: str = 'reviews', cache_dir=None, use_cache: bool = True,
+               columns=None, chunk_rows: int = CHUNK_ROWS):
+    """
+    逐块产出已规整类型的数据（参数同load_typed），用于比内存还大的文件：逐块聚合后再合并结果
+
+    有pyarrow时从缓存文件或数据集目录按块读取（缓存中的数据已规整，直接产出），否则直接按块读取CSV并规整
+    """
+    normalize = NORMALIZERS[kind]
+    if pyarrow is not None and (os.path.isdir(path) or use_cache):
+        if os.path.isdir(path):
+            source = os.path.join(path, kind)
+        else:
+            source = cached_file(path, kind, cache_dir, chunk_rows)
+            normalize = None
+        dataset = ds.dataset(source, format='parquet', partitioning='hive')
+        for batch in dataset.to_batches(columns=project(columns, dataset.schema.names), batch_size=chunk_rows):
+            frame = batch.to_pandas()
+            yield frame if normalize is None else normalize(frame)
+        return
+    for chunk in read_csv_chunks(path, columns, chunk_rows):
+        yield normalize(chunk)
+
+
+def load_reviews(path: str, cache_dir=None, use_cache: bool = True, columns=None,
+                 chunk_rows: int = CHUNK_ROWS) -> pd.DataFrame:
+    """读取已规整类型的评论数据，见 load_typed"""
+    return load_typed(path, 'reviews', cache_dir, use_cache, columns, chunk_rows)
+
+
+def load_attractions(path: str, cache_dir=None, use_cache: bool = True, columns=None,
+                     chunk_rows: int = CHUNK_ROWS) -> pd.DataFrame:
+    """读取已规整类型的景点数据，见 load_typed"""
+    return load_typed(path, 'attractions', cache_dir, use_cache, columns, chunk_rows)
+
+
+def iter_reviews(path: str, cache_dir=None, use_cache: bool = True, columns=None, chunk_rows: int = CHUNK_ROWS):
+    """逐块读取已规整类型的评论数据，见 iter_typed"""
+    return iter_typed(path, 'reviews', cache_dir, use_cache, columns, chunk_rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='规整评论/景点数据的类型并生成缓存')
+    parser.add_argument('path', help='CSV文件或parquet数据集目录')
+    parser.add_argument('--kind', choices=list(NORMALIZERS), default='reviews')
+    parser.add_argument('--cache-dir', default=None, help='缓存目录，默认为输入文件所在目录下的 .规整缓存')
+    parser.add_argument('--columns', nargs='*', default=None, help='只读取这些列')
+    args = parser.parse_args()
+
+    df = load_typed(args.path, args.kind, args.cache_dir, columns=args.columns)
+    print(f'规整完成！共{len(df)}行，内存占用{df.memory_usage(deep=True).sum() / 1024 / 1024:.1f}MB')
+    print(df.dtypes.to_string())
+
+
+if __name__ == '__main__':
+    main()
@@ -4,6 +4,7 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 from collections import Counter
 import warnings
+from 携程数据规整 import load_attractions
 warnings.filterwarnings('ignore')
 
 # 设置中文字体和图表参数
@@ -13,38 +14,19 @@ plt.rcParams['figure.autolayout'] = True  # 自动调整布局
 
 print("=== 开始生成完整版可视化图表 ===")
 
-# 读取数据
-df = pd.read_csv('携程景点数据.csv')
+# 读取数据（类型规整结果按文件哈希缓存：数值列、是否免费为布尔、距离市中心_km已解析）
+df = load_attractions('携程景点数据.csv')
 print(f"✅ 成功读取数据：{len(df)} 个景点")
 
 def preprocess_data(df):
     df_clean = df.copy()
-    df_clean['热度分'] = pd.to_numeric(df_clean['热度分'], errors='coerce')
-    df_clean['评论数量'] = pd.to_numeric(df_clean['评论数量'], errors='coerce')
-    df_clean['评分'] = pd.to_numeric(df_clean['评分'], errors='coerce')
-    df_clean['门票价格_清洗'] = pd.to_numeric(df_clean['门票价格'], errors='coerce')
-    df_clean['景区等级_清洗'] = df_clean['景区等级'].fillna('无等级')
+    df_clean['门票价格_清洗'] = df_clean['门票价格']
+    grades = df_clean['景区等级']
+    if '无等级' not in grades.cat.categories:
+        grades = grades.cat.add_categories('无等级')
+    df_clean['景区等级_清洗'] = grades.fillna('无等级')
     df_clean['标签列表'] = df_clean['标签'].str.split('、')
-    df_clean['是否免费_bool'] = df_clean['是否免费'] == '是'
-    
-    # 处理距离
-    def extract_distance(distance_str):
-        if pd.isna(distance_str):
-            return np.nan
-        if 'km' in str(distance_str):
-            try:
-                return float(str(distance_str).replace('距市中心', '').replace('km', '').strip())
-            except:
-                return np.nan
-        elif 'm' in str(distance_str):
-            try:
-                return float(str(distance_str).replace('距市中心', '').replace('m', '').strip()) / 1000
-            except:
-                return np.nan
-        else:
-            return np.nan
-    
-    df_clean['距离市中心_km'] = df_clean['距离市中心'].apply(extract_distance)
+    df_clean['是否免费_bool'] = df_clean['是否免费'].fillna(False).astype(bool)
     return df_clean
 
 df = preprocess_data(df)
@@ -108,7 +90,7 @@ plt.figure(figsize=(15, 10))
 
 # 子图1: 免费vs收费
 plt.subplot(2, 2, 1)
-free_count = df['是否免费'].value_counts()
+free_count = df['是否免费_bool'].map({True: '是', False: '否'}).value_counts()
 plt.pie(free_count.values, labels=free_count.index, autopct='%1.1f%%', 
         colors=['lightgreen', 'lightcoral'], startangle=90, textprops={'fontsize': 10})
 plt.title('免费vs收费景点分布', fontweight='bold')
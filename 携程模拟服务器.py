@@ -0,0 +1,255 @@
+"""
+携程接口的本地替身服务器
+
+按爬虫解析代码期望的响应格式返回构造数据，用于离线、可重复地测试和评估爬虫：
+- getAttractionList：ResponseStatus.Ack、attractionList[].card、hasMore
+- getCommentCollapseList：code/msg/result.items（按最新排序）、result.totalCount
+
+支持配置响应延迟、按比例注入403/429（429带Retry-After），超过末尾返回空数据。
+
+用法：python 携程模拟服务器.py --port 8000
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ATTRACTION_ENDPOINT = '/restapi/soa2/18109/json/getAttractionList'
+COMMENT_ENDPOINT = '/restapi/soa2/13444/json/getCommentCollapseList'
+
+BASE_TIME_MS = 1735660800000  # 2025-01-01 00:00:00 +0800，每个景点第1条（最早）评论的发布时间
+USER_LEVELS = ['', '黄金贵宾', '铂金贵宾', '钻石贵宾', '黑钻贵宾']
+LOCATIONS = ['四川', '广东', '北京', '上海', '浙江', '江苏', '重庆', '湖南']
+SIGHT_LEVELS = ['5A', '4A', '3A', '']
+
+
+class MockCtripServer:
+    """
+    携程接口替身
+
+    Args:
+        latency: 每个请求的固定延迟（秒）
+        jitter: 在固定延迟上叠加的随机延迟上限（秒）
+        forbidden_rate: 返回403的概率
+        throttle_rate: 返回429的概率
+        retry_after: 429响应的Retry-After秒数
+        attractions: 景点列表总条数，翻到末尾后hasMore为False
+        comments_per_poi: 每个景点的评论数，也可传 {景点ID: 评论数}
+        seed: 随机种子，相同种子生成相同数据和相同的错误注入序列
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 0.05,
+                 jitter: float = 0.0, forbidden_rate: float = 0.0, throttle_rate: float = 0.0,
+                 retry_after: int = 1, attractions: int = 300, comments_per_poi=1000,
+                 seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.forbidden_rate = forbidden_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.attractions = attractions
+        self.comments_per_poi = comments_per_poi
+        self.random = random.Random(seed)
+        self.stats = Counter()  # (接口, 状态码) -> 次数
+        self.pages_seen = set()  # 请求过的 (接口, 景点/地区ID, 页码)
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    @property
+    def attraction_url(self) -> str:
+        return self.base_url + ATTRACTION_ENDPOINT
+
+    @property
+    def comment_url(self) -> str:
+        return self.base_url + COMMENT_ENDPOINT
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def reset_stats(self):
+        with self._lock:
+            self.stats.clear()
+            self.pages_seen.clear()
+
+    def comment_total(self, poi_id) -> int:
+        if isinstance(self.comments_per_poi, dict):
+            return self.comments_per_poi.get(poi_id, 0)
+        return self.comments_per_poi
+
+    # ---------------------- 构造数据 ----------------------
+    def attraction_page(self, body):
+        index = int(body.get('index', 1))
+        count = int(body.get('count', 10))
+        district_id = body.get('districtId', 104)
+        start = (index - 1) * count
+        cards = []
+        for i in range(start, min(start + count, self.attractions)):
+            poi_id = district_id * 100000 + i + 1
+            rng = random.Random(poi_id)
+            total = self.comment_total(poi_id)
+            cards.append({'card': {
+                'poiId': poi_id,
+                'poiName': f'景点{poi_id}',
+                'districtName': f'地区{district_id}',
+                'zoneName': f'区域{i % 12}',
+                'sightLevelStr': rng.choice(SIGHT_LEVELS),
+                'heatScore': round(rng.uniform(5, 10), 1),
+                'commentCount': total,
+                'commentScore': round(rng.uniform(3.5, 5), 1),
+                'distanceStr': f'距市中心{rng.uniform(0.5, 60):.1f}km',
+                'tagNameList': ['亲近动物', '遛娃宝藏地'][:rng.randint(0, 2)],
+                'shortFeatures': ['萌哒哒的国宝在等你'],
+                'isFree': rng.random() < 0.3,
+                'price': rng.choice([0, 30, 55, 80, 120]),
+                'priceTypeDesc': '门票',
+                'detailUrlInfo': {'url': f'https://you.ctrip.com/sight/{poi_id}.html'},
+            }})
+        return {
+            'ResponseStatus': {'Ack': 'Success'},
+            'attractionList': cards,
+            'hasMore': start + count < self.attractions,
+        }
+
+    def comment_page(self, body):
+        arg = body.get('arg', {})
+        poi_id = int(arg.get('poiId', 0))
+        page = int(arg.get('pageIndex', 1))
+        size = int(arg.get('pageSize', 10))
+        total = self.comment_total(poi_id)
+        items = []
+        # 按最新排序：位置越靠前越新；评论按发布先后编号（第1条最早），
+        # 内容、评论ID和发布时间都由编号决定，评论总数增加时已有评论不变，新评论更新
+        for n in range((page - 1) * size, min(page * size, total)):
+            number = total - n
+            rng = random.Random(poi_id * 1000003 + number)
+            images = [{'imageSrcUrl': f'https://dimg04.c-ctrip.com/images/{poi_id}_{number}_{k}.jpg'}
+                      for k in range(rng.randint(0, 3))]
+            items.append({
+                'commentId': poi_id * 10000000 + number,
+                'userInfo': {
+                    'userId': rng.randint(1, 10 ** 9),
+                    'userNick': f'用户{rng.randint(1, 99999)}',
+                    'userMember': rng.choice(USER_LEVELS),
+                    'userImage': f'https://dimg04.c-ctrip.com/images/avatar_{rng.randint(1, 500)}.jpg',
+                },
+                'content': f'景点{poi_id}的第{number}条评论，' + '很好玩' * rng.randint(1, 30),
+                'publishTime': f'/Date({BASE_TIME_MS + (number - 1) * 3600 * 1000}+0800)/',
+                'ipLocatedName': rng.choice(LOCATIONS),
+                'score': rng.randint(1, 5),
+                'scores': [{'name': name, 'score': rng.randint(1, 5)} for name in ('景色', '趣味', '性价比')],
+                'usefulCount': rng.randint(0, 50),
+                'replyCount': rng.randint(0, 5),
+                'images': images,
+                'isPicked': rng.random() < 0.05,
+                'publishTypeTag': '发布点评',
+            })
+        return {'code': 200, 'msg': '请求成功', 'result': {'items': items, 'totalCount': total}}
+
+    # ---------------------- 请求处理 ----------------------
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, payload=None, headers=None):
+                data = json.dumps(payload, ensure_ascii=False).encode('utf-8') if payload is not None else b''
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(data)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                path = self.path.split('?', 1)[0]
+                length = int(self.headers.get('Content-Length') or 0)
+                try:
+                    body = json.loads(self.rfile.read(length) or b'{}')
+                except json.JSONDecodeError:
+                    body = {}
+
+                if path.endswith('getAttractionList'):
+                    endpoint = 'attraction'
+                    page_key = (endpoint, body.get('districtId'), body.get('index'))
+                elif path.endswith('getCommentCollapseList'):
+                    endpoint = 'comment'
+                    arg = body.get('arg', {})
+                    page_key = (endpoint, arg.get('poiId'), arg.get('pageIndex'))
+                else:
+                    self._send(404, {'msg': 'not found'})
+                    return
+
+                with server._lock:
+                    roll = server.random.random()
+                    delay = server.latency + server.random.uniform(0, server.jitter)
+                    server.pages_seen.add(page_key)
+                time.sleep(delay)
+
+                if roll < server.forbidden_rate:
+                    status, payload, headers = 403, None, None
+                elif roll < server.forbidden_rate + server.throttle_rate:
+                    status, payload, headers = 429, None, {'Retry-After': str(server.retry_after)}
+                elif endpoint == 'attraction':
+                    status, payload, headers = 200, server.attraction_page(body), None
+                else:
+                    status, payload, headers = 200, server.comment_page(body), None
+
+                with server._lock:
+                    server.stats[(endpoint, status)] += 1
+                self._send(status, payload, headers)
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description='携程接口本地替身服务器')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--latency', type=float, default=0.05, help='固定延迟（秒）')
+    parser.add_argument('--jitter', type=float, default=0.0, help='随机延迟上限（秒）')
+    parser.add_argument('--forbidden-rate', type=float, default=0.0, help='403注入比例')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='429注入比例')
+    parser.add_argument('--attractions', type=int, default=300, help='景点总数')
+    parser.add_argument('--comments', type=int, default=1000, help='每个景点的评论数')
+    args = parser.parse_args()
+
+    server = MockCtripServer(args.host, args.port, args.latency, args.jitter,
+                             args.forbidden_rate, args.throttle_rate,
+                             attractions=args.attractions, comments_per_poi=args.comments)
+    print(f'景点接口：{server.attraction_url}')
+    print(f'评论接口：{server.comment_url}')
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.httpd.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,23 @@
+"""
+按文件路径加载爬虫脚本
+
+两个爬虫脚本的文件名含全角括号，无法直接import；响应归档的重新解析、基准测试和测试
+都通过load_crawler加载它们，各自传入不同的模块名，互不共享模块级状态。
+"""
+import importlib.util
+import os
+import sys
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+REVIEW_CRAWLER = os.path.join(BASE_DIR, '携程爬虫源代码（评论）.py')
+ATTRACTION_CRAWLER = os.path.join(BASE_DIR, '携程爬虫源代码（景点）.py')
+
+
+def load_crawler(path, name):
+    """按文件路径加载爬虫脚本，name为加载后的模块名"""
+    if BASE_DIR not in sys.path:
+        sys.path.insert(0, BASE_DIR)
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
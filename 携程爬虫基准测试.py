@@ -0,0 +1,243 @@
+"""
+爬虫吞吐量基准测试
+
+在本地替身服务器（携程模拟服务器.py）上运行景点爬虫和评论爬虫，
+报告页/秒、单页耗时p50/p99（含重试）以及服务器看到的重试次数和状态码分布。
+所有输出写入临时目录，不影响当前目录下的数据文件。
+--decode 只运行评论解析的微基准：对比原解析路径（json.loads + 字典 + 逐条转换日期 + DictWriter）
+和当前路径（orjson + CommentRecord + 按页批量转换日期 + csv.writer），不发请求。
+
+用法：python 携程爬虫基准测试.py --pages 200 --latency 0.05 --rate 50
+      python 携程爬虫基准测试.py --decode --pages 500
+"""
+import argparse
+import asyncio
+import contextlib
+import csv
+import functools
+import io
+import json
+import logging
+import os
+import statistics
+import tempfile
+import time
+
+from 携程模拟服务器 import MockCtripServer
+from 携程爬虫加载 import ATTRACTION_CRAWLER, REVIEW_CRAWLER, load_crawler
+from 携程爬虫监控 import metrics, setup_logging
+
+
+def record_latency(module, func_name, latencies):
+    """给爬虫模块中的单页请求函数套上计时，记录每页耗时（含重试）"""
+    func = getattr(module, func_name)
+    if asyncio.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                latencies.append(time.perf_counter() - start)
+    else:
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                latencies.append(time.perf_counter() - start)
+    setattr(module, func_name, timed)
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def report(name, server, endpoint, elapsed, latencies):
+    requests_sent = sum(count for (ep, _), count in server.stats.items() if ep == endpoint)
+    pages = sum(1 for key in server.pages_seen if key[0] == endpoint)
+    statuses = {status: count for (ep, status), count in sorted(server.stats.items()) if ep == endpoint}
+    print(f'[{name}]')
+    print(f'  页数：{pages}，请求数：{requests_sent}，重试：{requests_sent - pages}，状态码：{statuses}')
+    print(f'  总耗时：{elapsed:.2f}秒，吞吐：{pages / elapsed if elapsed else 0:.1f}页/秒')
+    if latencies:
+        print(f'  单页耗时 p50：{percentile(latencies, 50) * 1000:.1f}ms，'
+              f'p99：{percentile(latencies, 99) * 1000:.1f}ms，'
+              f'均值：{statistics.mean(latencies) * 1000:.1f}ms')
+    counters = metrics.snapshot()['counters']
+    print(f'  爬虫指标：重试{counters.get("retries", 0)}次，'
+          f'退避{counters.get("backoff_seconds", 0):.1f}秒，写入{counters.get("rows", 0)}行')
+
+
+def bench_attractions(server, pages, workers=5, verbose=False, districts=(104,)):
+    crawler = load_crawler(ATTRACTION_CRAWLER, 'bench_attraction_crawler')
+    crawler.API_URL = server.attraction_url
+    latencies = []
+    record_latency(crawler, 'fetch_ctrip_attractions', latencies)
+
+    server.reset_stats()
+    metrics.reset()
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    start = time.perf_counter()
+    with output:
+        crawler.crawl_ctrip_attractions(start_page=1, end_page=pages, page_size=10, max_workers=workers,
+                                        district_ids=districts)
+    elapsed = time.perf_counter() - start
+    report(f'景点爬虫（{len(districts)}个地区）', server, 'attraction', elapsed, latencies)
+
+
+def bench_reviews(server, pages, engine, rate, concurrency, delay, verbose=False):
+    crawler = load_crawler(REVIEW_CRAWLER, 'bench_review_crawler')
+    crawler.API_URL = server.comment_url
+    crawler.USE_ASYNC = engine == 'async'
+    crawler.RATE_LIMIT = rate
+    crawler.MAX_CONCURRENCY = concurrency
+    crawler.RANDOM_DELAY = (delay, delay)
+    latencies = []
+    record_latency(crawler, 'fetch_page_async' if crawler.USE_ASYNC else 'fetch_page', latencies)
+
+    server.reset_stats()
+    metrics.reset()
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    start = time.perf_counter()
+    with output:
+        crawler.crawl_full([(crawler.POI_ID, pages)])
+    elapsed = time.perf_counter() - start
+    report(f'评论爬虫（{engine}）', server, 'comment', elapsed, latencies)
+
+
+def legacy_parse_comments(crawler, data, poi_id):
+    """原解析路径：每条评论构造19个中文键的字典，逐条转换日期"""
+    comments = []
+    for item in data.get('result', {}).get('items', []):
+        user_info = item.get('userInfo', {})
+        scores = {}
+        for score_item in item.get('scores', []):
+            scores[score_item.get('name', '')] = score_item.get('score', 0)
+        images = [img.get('imageSrcUrl', '') for img in item.get('images', []) if img.get('imageSrcUrl')]
+        comments.append({
+            '评论ID': item.get('commentId', ''),
+            '用户ID': user_info.get('userId', ''),
+            '用户名': user_info.get('userNick', ''),
+            '用户等级': user_info.get('userMember', ''),
+            '用户头像': user_info.get('userImage', ''),
+            '评论内容': item.get('content', '').strip().replace('\n', ' '),
+            '发布时间': crawler.convert_date(item.get('publishTime', '')),
+            '发布地点': item.get('ipLocatedName', ''),
+            '总评分': item.get('score', 0),
+            '景色评分': scores.get('景色', 0),
+            '趣味评分': scores.get('趣味', 0),
+            '性价比评分': scores.get('性价比', 0),
+            '点赞数': item.get('usefulCount', 0),
+            '回复数': item.get('replyCount', 0),
+            '图片数量': len(images),
+            '图片链接': '|'.join(images) if images else '',
+            '是否精选': item.get('isPicked', False),
+            '发布类型': item.get('publishTypeTag', ''),
+            '景点ID': poi_id,
+        })
+    return comments
+
+
+def bench_decode(pages, repeat=5):
+    """评论解析微基准：同一批响应体分别走原路径和当前路径，取repeat次中最快的一次"""
+    crawler = load_crawler(REVIEW_CRAWLER, 'bench_decode_crawler')
+    poi_id = crawler.POI_ID
+    server = MockCtripServer(comments_per_poi=pages * crawler.PAGE_SIZE)
+    server.httpd.server_close()  # 只用来构造响应数据，不提供服务
+    bodies = [
+        json.dumps(server.comment_page({'arg': {'poiId': poi_id, 'pageIndex': page,
+                                                 'pageSize': crawler.PAGE_SIZE}}),
+                   ensure_ascii=False).encode('utf-8')
+        for page in range(1, pages + 1)
+    ]
+
+    def legacy():
+        out = io.StringIO()
+        writer = csv.DictWriter(out, fieldnames=crawler.CSV_HEADERS)
+        for body in bodies:
+            writer.writerows(legacy_parse_comments(crawler, json.loads(body), poi_id))
+        return out.getvalue()
+
+    def current():
+        out = io.StringIO()
+        writer = csv.writer(out)
+        for page, body in enumerate(bodies, 1):
+            comments, _ = crawler.parse_comments(crawler.decode_json(body), poi_id, page)
+            writer.writerows(comments)
+        return out.getvalue()
+
+    rows = pages * crawler.PAGE_SIZE
+    decoder = 'orjson' if crawler.orjson is not None else 'json'
+    print(f'评论解析微基准：{pages}页，{rows}条评论，当前路径使用{decoder}')
+    results = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        for name, func in (('原路径', legacy), ('当前路径', current)):
+            best = float('inf')
+            for _ in range(repeat):
+                start = time.perf_counter()
+                results[name] = func()
+                best = min(best, time.perf_counter() - start)
+            results[name + '耗时'] = best
+    for name in ('原路径', '当前路径'):
+        elapsed = results[name + '耗时']
+        print(f'  {name}：{elapsed * 1000:.1f}ms，{elapsed / rows * 1e6:.2f}微秒/条')
+    print(f'  加速：{results["原路径耗时"] / results["当前路径耗时"]:.2f}倍，'
+          f'输出{"一致" if results["原路径"] == results["当前路径"] else "不一致"}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='在本地替身服务器上评估爬虫吞吐量')
+    parser.add_argument('--pages', type=int, default=100, help='评论爬虫爬取的页数')
+    parser.add_argument('--attraction-pages', type=int, default=30, help='景点爬虫爬取的页数')
+    parser.add_argument('--attraction-workers', type=int, default=5, help='景点爬虫同时在途的页数')
+    parser.add_argument('--districts', type=int, nargs='+', default=[104], help='景点爬虫爬取的地区ID')
+    parser.add_argument('--engine', choices=['async', 'thread'], default='async', help='评论爬虫引擎')
+    parser.add_argument('--rate', type=float, default=50.0, help='评论爬虫的RATE_LIMIT（次/秒）')
+    parser.add_argument('--concurrency', type=int, default=20, help='评论爬虫的MAX_CONCURRENCY')
+    parser.add_argument('--delay', type=float, default=0.0, help='线程池引擎每次请求前的等待（秒）')
+    parser.add_argument('--latency', type=float, default=0.05, help='服务器固定延迟（秒）')
+    parser.add_argument('--jitter', type=float, default=0.02, help='服务器随机延迟上限（秒）')
+    parser.add_argument('--forbidden-rate', type=float, default=0.0, help='403注入比例')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='429注入比例')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--verbose', action='store_true', help='显示爬虫自身的输出')
+    parser.add_argument('--decode', action='store_true', help='只运行评论解析微基准（页数取--pages）')
+    args = parser.parse_args()
+
+    if args.verbose:
+        setup_logging('INFO')
+    else:
+        logging.getLogger('携程爬虫').setLevel(logging.ERROR)
+
+    if args.decode:
+        bench_decode(args.pages)
+        return
+
+    server = MockCtripServer(
+        latency=args.latency, jitter=args.jitter,
+        forbidden_rate=args.forbidden_rate, throttle_rate=args.throttle_rate,
+        attractions=args.attraction_pages * 10, comments_per_poi=args.pages * 10,
+        seed=args.seed,
+    )
+    cwd = os.getcwd()
+    with server, tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        try:
+            print(f'替身服务器：{server.base_url}，延迟{args.latency}s+{args.jitter}s，'
+                  f'403比例{args.forbidden_rate}，429比例{args.throttle_rate}')
+            bench_attractions(server, args.attraction_pages, args.attraction_workers, args.verbose,
+                              args.districts)
+            bench_reviews(server, args.pages, args.engine, args.rate, args.concurrency,
+                          args.delay, args.verbose)
+        finally:
+            os.chdir(cwd)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,118 +1,199 @@
 import requests
 import json
 import csv
+import logging
 import os
-from typing import Dict, List, Any, Optional
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, List, Any, Optional, Tuple
 
-def fetch_ctrip_attractions(page_index: int = 1, count: int = 10) -> Optional[Dict]:
+from requests.adapters import HTTPAdapter
+
+from 携程数据存储 import StorageBackend, SqliteBackend, ParquetBackend
+from 携程爬虫监控 import MetricsReporter, RateLimiter, metrics, setup_logging
+from 携程响应归档 import ResponseArchive
+from 景点快照历史 import SnapshotStore
+
+API_URL = 'https://m.ctrip.com/restapi/soa2/18109/json/getAttractionList'
+
+# 地区配置：多个地区在一次运行中并发爬取，共用连接池、线程池和限速
+DISTRICT_IDS = [104]  # 要爬取的地区ID（104为香港）
+# 各地区请求体中的坐标（纬度, 经度），未列出的地区沿用REQUEST_TEMPLATE中的坐标
+COORDINATES = {
+    104: (22.33893178511237, 114.17097715578561),
+}
+RATE_LIMIT = None  # 全局请求预算（次/秒），所有地区共用，None不限速
+SNAPSHOT_DB = '景点快照.db'  # 每次爬取结束后记录一次快照（只存热度分、评论数量等变化的字段），None不记录
+
+# 监控配置
+LOG_LEVEL = 'INFO'  # 日志级别：DEBUG / INFO / WARNING / ERROR
+LOG_FORMAT = 'text'  # 'text'只输出消息；'json'每行一个JSON对象
+METRICS_FILE = '景点爬取监控.json'  # 定期写入的指标快照，None不写
+METRICS_INTERVAL = 5  # 指标快照的写入间隔（秒）
+METRICS_PORT = None  # 设为端口号时在127.0.0.1上提供Prometheus指标 /metrics
+ARCHIVE_DIR = None  # 设为目录（如'响应归档'）时压缩归档每个原始响应，可用 携程响应归档.py 离线重新生成输出
+ARCHIVE_COMPRESSION = None  # 'zstd'（需安装zstandard）或 'gzip'，None时自动选择
+
+logger = logging.getLogger('携程爬虫.景点')
+
+# CSV表头 / 数据库字段
+FIELDNAMES = [
+    '景点ID', '景点名称', '所在地区', '区域名称', '景区等级', 
+    '热度分', '评论数量', '评分', '距离市中心', '标签', 
+    '短特色', '是否免费', '门票价格', '价格类型', '详情链接', '地区ID'
+]
+
+# 请求模板：cookies、请求头、参数和请求体只构造一次，每页只替换districtId/index/count（和坐标）
+COOKIES = {
+    'UBT_VID': '1763382479749.13a8GtXW3P5J',
+    'Hm_lvt_a8d6737197d542432f4ff4abc6e06384': '1763382480',
+    'HMACCOUNT': 'E0B9E8224ADF1206',
+    'MKT_CKID': '1763382479876.z77yi.njgb',
+    'GUID': '09031178411654044234',
+    '_RGUID': '29c49f95-1653-4b5b-967b-d5c0aaa61d4e',
+    'MKT_Pagesource': 'H5',
+    'nfes_isSupportWebP': '1',
+    'nfes_isSupportWebP': '1',
+    'Hm_lpvt_a8d6737197d542432f4ff4abc6e06384': '1763382588',
+    'Union': 'OUID=&AllianceID=4902&SID=22921635&SourceID=&createtime=1763382588&Expires=1763987388341',
+    'MKT_OrderClick': 'ASID=490222921635&AID=4902&CSID=22921635&OUID=&CT=1763382588342&CURL=https%3A%2F%2Fwww.ctrip.com%2F%3Fallianceid%3D4902%26sid%3D22921635%26msclkid%3Dc61ae724524d194b58238e3f4680351d%26keywordid%3D82533150992350&VAL={"pc_vid":"1763382479749.13a8GtXW3P5J"};',
+    '_ubtstatus': '%7B%22vid%22%3A%221763382479749.13a8GtXW3P5J%22%2C%22sid%22%3A1%2C%22pvid%22%3A10%2C%22pid%22%3A0%7D',
+    '_pd': '%7B%22_o%22%3A1%2C%22s%22%3A3%2C%22_s%22%3A0%7D',
+    '_bfa': '1.1763382479749.13a8GtXW3P5J.1.1763385626643.1763454189742.2.1.10650142842',
+    '_jzqco': '%7C%7C%7C%7C1763382480625%7C1.2063646721.1763382479874.1763385627432.1763454190567.1763385627432.1763454190567.undefined.0.0.11.11',
+}
+
+HEADERS = {
+    'accept': '*/*',
+    'accept-language': 'zh-CN,zh;q=0.9,en;q=0.8,en-GB;q=0.7,en-US;q=0.6',
+    'content-type': 'application/json',
+    'cookieorigin': 'https://you.ctrip.com',
+    'origin': 'https://you.ctrip.com',
+    'priority': 'u=1, i',
+    'referer': 'https://you.ctrip.com/',
+    'sec-ch-ua': '"Chromium";v="142", "Microsoft Edge";v="142", "Not_A Brand";v="99"',
+    'sec-ch-ua-mobile': '?0',
+    'sec-ch-ua-platform': '"Windows"',
+    'sec-fetch-dest': 'empty',
+    'sec-fetch-mode': 'cors',
+    'sec-fetch-site': 'same-site',
+    'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/142.0.0.0 Safari/537.36 Edg/142.0.0.0',
+    'x-ctx-ubt-pageid': '10650142842',
+    'x-ctx-ubt-pvid': '1',
+    'x-ctx-ubt-sid': '2',
+    'x-ctx-ubt-vid': '1763382479749.13a8GtXW3P5J',
+    'x-ctx-wclient-req': 'a25042e298f3dad5079a95e975c3b0ba',
+}
+
+PARAMS = {
+    '_fxpcqlniredt': '09031178411654044234',
+    'x-traceID': '09031178411654044234-1763454200208-3396853',
+}
+
+REQUEST_TEMPLATE = {
+    'head': {
+        'cid': '09031178411654044234',
+        'ctok': '',
+        'cver': '1.0',
+        'lang': '01',
+        'sid': '8888',
+        'syscode': '999',
+        'auth': '',
+        'xsid': '',
+        'extension': [],
+    },
+    'scene': 'online',
+    'districtId': 104,
+    'index': 1,
+    'sortType': 1,
+    'count': 10,
+    'filter': {
+        'filterItems': [],
+    },
+    'coordinate': {
+        'latitude': 22.33893178511237,
+        'longitude': 114.17097715578561,
+        'coordinateType': 'WGS84',
+    },
+    'returnModuleType': 'product',
+}
+
+def create_session(pool_size: int = 10) -> requests.Session:
+    """
+    创建带连接池的会话
+    
+    cookies和请求头挂在会话上，所有请求复用同一个连接池（keep-alive），
+    pool_size应不小于并发请求数
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update(HEADERS)
+    session.cookies.update(COOKIES)
+    return session
+
+session = create_session()
+limiter = RateLimiter(RATE_LIMIT)
+archive = None  # 爬取期间的原始响应归档（ResponseArchive）
+
+def build_request(district_id: int, page_index: int, count: int) -> Dict:
+    """构造一页的请求体：替换地区ID、页码、每页数量，已配置坐标的地区同时替换坐标"""
+    json_data = dict(REQUEST_TEMPLATE, districtId=district_id, index=page_index, count=count)
+    if district_id in COORDINATES:
+        latitude, longitude = COORDINATES[district_id]
+        json_data['coordinate'] = dict(REQUEST_TEMPLATE['coordinate'], latitude=latitude, longitude=longitude)
+    return json_data
+
+def fetch_ctrip_attractions(page_index: int = 1, count: int = 10,
+                            district_id: int = REQUEST_TEMPLATE['districtId']) -> Optional[Dict]:
     """
     获取携程景点列表数据
     
     Args:
         page_index: 页码，从1开始
         count: 每页数量
+        district_id: 地区ID
     
     Returns:
         返回JSON响应数据，请求失败返回None
     """
-    cookies = {
-        'UBT_VID': '1763382479749.13a8GtXW3P5J',
-        'Hm_lvt_a8d6737197d542432f4ff4abc6e06384': '1763382480',
-        'HMACCOUNT': 'E0B9E8224ADF1206',
-        'MKT_CKID': '1763382479876.z77yi.njgb',
-        'GUID': '09031178411654044234',
-        '_RGUID': '29c49f95-1653-4b5b-967b-d5c0aaa61d4e',
-        'MKT_Pagesource': 'H5',
-        'nfes_isSupportWebP': '1',
-        'nfes_isSupportWebP': '1',
-        'Hm_lpvt_a8d6737197d542432f4ff4abc6e06384': '1763382588',
-        'Union': 'OUID=&AllianceID=4902&SID=22921635&SourceID=&createtime=1763382588&Expires=1763987388341',
-        'MKT_OrderClick': 'ASID=490222921635&AID=4902&CSID=22921635&OUID=&CT=1763382588342&CURL=https%3A%2F%2Fwww.ctrip.com%2F%3Fallianceid%3D4902%26sid%3D22921635%26msclkid%3Dc61ae724524d194b58238e3f4680351d%26keywordid%3D82533150992350&VAL={"pc_vid":"1763382479749.13a8GtXW3P5J"};',
-        '_ubtstatus': '%7B%22vid%22%3A%221763382479749.13a8GtXW3P5J%22%2C%22sid%22%3A1%2C%22pvid%22%3A10%2C%22pid%22%3A0%7D',
-        '_pd': '%7B%22_o%22%3A1%2C%22s%22%3A3%2C%22_s%22%3A0%7D',
-        '_bfa': '1.1763382479749.13a8GtXW3P5J.1.1763385626643.1763454189742.2.1.10650142842',
-        '_jzqco': '%7C%7C%7C%7C1763382480625%7C1.2063646721.1763382479874.1763385627432.1763454190567.1763385627432.1763454190567.undefined.0.0.11.11',
-    }
-
-    headers = {
-        'accept': '*/*',
-        'accept-language': 'zh-CN,zh;q=0.9,en;q=0.8,en-GB;q=0.7,en-US;q=0.6',
-        'content-type': 'application/json',
-        'cookieorigin': 'https://you.ctrip.com',
-        'origin': 'https://you.ctrip.com',
-        'priority': 'u=1, i',
-        'referer': 'https://you.ctrip.com/',
-        'sec-ch-ua': '"Chromium";v="142", "Microsoft Edge";v="142", "Not_A Brand";v="99"',
-        'sec-ch-ua-mobile': '?0',
-        'sec-ch-ua-platform': '"Windows"',
-        'sec-fetch-dest': 'empty',
-        'sec-fetch-mode': 'cors',
-        'sec-fetch-site': 'same-site',
-        'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/142.0.0.0 Safari/537.36 Edg/142.0.0.0',
-        'x-ctx-ubt-pageid': '10650142842',
-        'x-ctx-ubt-pvid': '1',
-        'x-ctx-ubt-sid': '2',
-        'x-ctx-ubt-vid': '1763382479749.13a8GtXW3P5J',
-        'x-ctx-wclient-req': 'a25042e298f3dad5079a95e975c3b0ba',
-    }
-
-    params = {
-        '_fxpcqlniredt': '09031178411654044234',
-        'x-traceID': '09031178411654044234-1763454200208-3396853',
-    }
-
-    json_data = {
-        'head': {
-            'cid': '09031178411654044234',
-            'ctok': '',
-            'cver': '1.0',
-            'lang': '01',
-            'sid': '8888',
-            'syscode': '999',
-            'auth': '',
-            'xsid': '',
-            'extension': [],
-        },
-        'scene': 'online',
-        'districtId': 104,
-        'index': page_index,
-        'sortType': 1,
-        'count': count,
-        'filter': {
-            'filterItems': [],
-        },
-        'coordinate': {
-            'latitude': 22.33893178511237,
-            'longitude': 114.17097715578561,
-            'coordinateType': 'WGS84',
-        },
-        'returnModuleType': 'product',
-    }
+    json_data = build_request(district_id, page_index, count)
 
+    limiter.acquire()
+    started = time.monotonic()
+    status = 'error'
     try:
-        response = requests.post(
-            'https://m.ctrip.com/restapi/soa2/18109/json/getAttractionList',
-            params=params,
-            cookies=cookies,
-            headers=headers,
+        response = session.post(
+            API_URL,
+            params=PARAMS,
             json=json_data,
             timeout=30
         )
+        status = response.status_code
         response.raise_for_status()
-        return response.json()
+        data = response.json()
+        if archive is not None:
+            archive.add('attraction', district_id, page_index, response.content)
+        return data
     except requests.exceptions.RequestException as e:
-        print(f"请求失败: {e}")
+        logger.warning(f"地区{district_id}第 {page_index} 页请求失败: {e}",
+                       extra={'district_id': district_id, 'page': page_index, 'status': status})
         return None
     except json.JSONDecodeError as e:
-        print(f"JSON解析失败: {e}")
+        logger.error(f"地区{district_id}第 {page_index} 页JSON解析失败: {e}",
+                     extra={'district_id': district_id, 'page': page_index})
         return None
+    finally:
+        metrics.observe_request('attraction', status, time.monotonic() - started)
 
-def extract_attraction_data(card_data: Dict) -> Dict:
+def extract_attraction_data(card_data: Dict, district_id='') -> Dict:
     """
     从景点card数据中提取所需字段
     
     Args:
         card_data: 单个景点card数据字典
+        district_id: 请求的地区ID，写入'地区ID'列
     
     Returns:
         提取后的景点数据
@@ -178,7 +259,8 @@ def extract_attraction_data(card_data: Dict) -> Dict:
         '是否免费': is_free_str,
         '门票价格': price,
         '价格类型': price_type_desc,
-        '详情链接': detail_url
+        '详情链接': detail_url,
+        '地区ID': district_id,
     }
 
 def save_to_csv(data_list: List[Dict], filename: str = "携程景点数据.csv"):
@@ -189,12 +271,7 @@ def save_to_csv(data_list: List[Dict], filename: str = "携程景点数据.csv")
         data_list: 景点数据列表
         filename: CSV文件名
     """
-    # 定义表头
-    fieldnames = [
-        '景点ID', '景点名称', '所在地区', '区域名称', '景区等级', 
-        '热度分', '评论数量', '评分', '距离市中心', '标签', 
-        '短特色', '是否免费', '门票价格', '价格类型', '详情链接'
-    ]
+    fieldnames = FIELDNAMES
     
     # 检查文件是否存在
     file_exists = os.path.exists(filename)
@@ -206,86 +283,280 @@ def save_to_csv(data_list: List[Dict], filename: str = "携程景点数据.csv")
             # 如果文件不存在，写入表头
             if not file_exists:
                 writer.writeheader()
-                print(f"创建新文件 {filename} 并写入表头")
+                logger.info(f"创建新文件 {filename} 并写入表头")
             
             # 写入数据
             for data in data_list:
                 writer.writerow(data)
             
-            print(f"成功写入 {len(data_list)} 条数据到 {filename}")
+            logger.debug(f"成功写入 {len(data_list)} 条数据到 {filename}", extra={'rows': len(data_list)})
             
     except Exception as e:
-        print(f"写入CSV文件失败: {e}")
+        logger.error(f"写入CSV文件失败: {e}")
+
+def migrate_csv_header(filename: str = "携程景点数据.csv"):
+    """
+    检查已有CSV的表头，追加写入前保证与FIELDNAMES一致
+
+    旧版本输出的表头缺少后来新增的列（如'地区ID'）时，把文件改写为新表头，已有行的新列留空；
+    表头中有FIELDNAMES之外的列时无法迁移，抛出ValueError，避免新旧列错位地追加到同一个文件
+
+    Args:
+        filename: CSV文件名
+    """
+    if not os.path.exists(filename) or os.path.getsize(filename) == 0:
+        return
+    with open(filename, 'r', newline='', encoding='utf-8-sig') as csvfile:
+        header = next(csv.reader(csvfile), [])
+    if header == FIELDNAMES:
+        return
+    unknown = [name for name in header if name not in FIELDNAMES]
+    if unknown:
+        raise ValueError(f"{filename} 的表头包含未知列 {unknown}，请改用新文件名或手动迁移后再追加")
+
+    tmp_name = filename + '.tmp'
+    with open(filename, 'r', newline='', encoding='utf-8-sig') as src, \
+            open(tmp_name, 'w', newline='', encoding='utf-8-sig') as dst:
+        writer = csv.DictWriter(dst, fieldnames=FIELDNAMES, restval='')
+        writer.writeheader()
+        writer.writerows(csv.DictReader(src))
+    os.replace(tmp_name, filename)
+    missing = [name for name in FIELDNAMES if name not in header]
+    logger.info(f"已将 {filename} 的表头迁移为当前格式，新增列 {missing}")
+
+def save_to_backend(data_list: List[Dict], backend: StorageBackend):
+    """
+    将景点数据写入存储后端（如SQLite按景点ID upsert，重复运行不会产生重复数据）
+    
+    Args:
+        data_list: 景点数据列表
+        backend: 存储后端
+    """
+    try:
+        backend.write_attractions(data_list)
+        logger.debug(f"成功写入 {len(data_list)} 条数据到存储后端", extra={'rows': len(data_list)})
+    except Exception as e:
+        logger.error(f"写入存储后端失败: {e}")
 
-def crawl_ctrip_attractions(start_page: int = 1, end_page: int = 5, page_size: int = 10):
+def parse_attraction_page(page: int, response_data: Optional[Dict],
+                          district_id=REQUEST_TEMPLATE['districtId']) -> Tuple[Optional[List[Dict]], bool]:
+    """
+    校验并解析一页景点数据
+    
+    Returns:
+        (景点数据列表, 是否继续翻页)，该页失败或无有效数据时列表为None
+    """
+    extra = {'district_id': district_id, 'page': page}
+    if not response_data:
+        logger.warning(f"地区{district_id}第 {page} 页数据获取失败，跳过", extra=extra)
+        return None, True
+    
+    try:
+        # 检查响应状态
+        if response_data.get('ResponseStatus', {}).get('Ack') != 'Success':
+            logger.warning(f"地区{district_id}第 {page} 页响应状态异常: {response_data.get('ResponseStatus', {})}",
+                           extra=extra)
+            return None, True
+        
+        # 解析数据 - 景点数据在attractionList数组中，每个item的card字段中
+        attractions_list = response_data.get('attractionList', [])
+        
+        if not attractions_list:
+            logger.info(f"地区{district_id}第 {page} 页没有景点数据", extra=dict(extra, rows=0))
+            return None, False
+        
+        # 提取数据
+        page_data = []
+        for item in attractions_list:
+            card_data = item.get('card', {})
+            if card_data:  # 确保card数据存在
+                attraction_data = extract_attraction_data(card_data, district_id)
+                page_data.append(attraction_data)
+        
+        if not page_data:
+            logger.warning(f"地区{district_id}第 {page} 页没有有效数据", extra=dict(extra, rows=0))
+            return None, True
+        
+        # 检查是否还有更多数据
+        return page_data, response_data.get('hasMore', False)
+    
+    except Exception as e:
+        logger.error(f"地区{district_id}第 {page} 页数据处理失败: {e}", extra=extra)
+        return None, True
+
+class DistrictCrawl:
+    """
+    单个地区的翻页状态
+    
+    页可以乱序返回，结果先暂存，按页码顺序解析；遇到最后一页（hasMore为False或没有景点数据）
+    或到达end_page后结束，不再提交该地区的新页
+    """
+    
+    def __init__(self, district_id: int, start_page: int, end_page: int):
+        self.district_id = district_id
+        self.end_page = end_page
+        self.next_submit = start_page  # 下一个要提交的页码
+        self.next_parse = start_page  # 下一个要按顺序解析的页码
+        self.pending = {}  # 在途页码 -> future
+        self.results = {}  # 已返回、等待按顺序解析的页码 -> 响应
+        self.done = False
+        self.rows = 0
+    
+    def can_submit(self, max_ahead: int) -> bool:
+        """未结束、还有页可提交，且领先于解析进度不超过max_ahead页"""
+        return (not self.done and self.next_submit <= self.end_page
+                and self.next_submit < self.next_parse + max_ahead)
+    
+    def ready_pages(self):
+        """按页码顺序取出已返回的连续页 (页码, 响应)"""
+        while not self.done and self.next_parse in self.results:
+            page = self.next_parse
+            self.next_parse += 1
+            yield page, self.results.pop(page)
+    
+    def finish(self) -> int:
+        """结束该地区：未开始的页取消，已在途或已返回的后续页丢弃，返回丢弃的页数"""
+        self.done = True
+        for future in self.pending.values():
+            future.cancel()
+        skipped = len(self.pending) + len(self.results)
+        self.pending.clear()
+        self.results.clear()
+        return skipped
+
+def crawl_ctrip_attractions(start_page: int = 1, end_page: int = 5, page_size: int = 10,
+                            storage: str = 'csv', db_path: str = '携程数据.db',
+                            parquet_dir: str = '携程数据_parquet', max_workers: int = 5,
+                            archive_dir: Optional[str] = ARCHIVE_DIR,
+                            district_ids: Optional[List[int]] = None,
+                            rate_limit: Optional[float] = RATE_LIMIT,
+                            snapshot_db: Optional[str] = SNAPSHOT_DB):
     """
     爬取携程景点数据的主函数
     
+    所有地区共用一个线程池和连接池，最多max_workers页同时请求，各地区轮流提交新页；
+    每个地区的结果按页码顺序解析和保存，遇到该地区的最后一页（hasMore为False或没有景点数据）后
+    不再提交它的新页，已在途的后续页结果直接丢弃，其他地区不受影响。
+    每条景点数据带'地区ID'列，单个地区的输出与逐页爬取一致
+    
     Args:
         start_page: 起始页码
-        end_page: 结束页码
+        end_page: 结束页码（每个地区）
         page_size: 每页数量
+        storage: 存储方式，'csv'追加写入携程景点数据.csv，'sqlite'按景点ID upsert写入db_path，
+                 'parquet'按列类型写入parquet_dir（需安装pyarrow）
+        db_path: sqlite存储的数据库文件
+        parquet_dir: parquet存储的数据集目录
+        max_workers: 同时在途的页数（所有地区合计），1即逐页爬取
+        archive_dir: 原始响应的归档目录，None不归档
+        district_ids: 要爬取的地区ID列表，默认为DISTRICT_IDS
+        rate_limit: 所有地区共用的请求预算（次/秒），None不限速
+        snapshot_db: 快照历史数据库，爬取结束后把本次结果记为一个快照，None不记录
     """
+    global archive, limiter
+    district_ids = list(district_ids or DISTRICT_IDS)
     all_attractions = []
+    backend = None
+    if storage == 'sqlite':
+        backend = SqliteBackend(db_path, attraction_fieldnames=FIELDNAMES)
+    elif storage == 'parquet':
+        backend = ParquetBackend(parquet_dir, attraction_fieldnames=FIELDNAMES)
+    else:
+        migrate_csv_header()
+    if archive_dir:
+        archive = ResponseArchive(archive_dir, ARCHIVE_COMPRESSION)
+    limiter = RateLimiter(rate_limit)
     
-    for page in range(start_page, end_page + 1):
-        print(f"正在爬取第 {page} 页...")
-        
-        # 获取数据
-        response_data = fetch_ctrip_attractions(page, page_size)
+    def handle_page(crawl: DistrictCrawl, page: int, response_data: Optional[Dict]):
+        page_data, has_more = parse_attraction_page(page, response_data, crawl.district_id)
+        extra = {'district_id': crawl.district_id, 'page': page}
         
-        if not response_data:
-            print(f"第 {page} 页数据获取失败，跳过")
-            continue
-        
-        try:
-            # 检查响应状态
-            if response_data.get('ResponseStatus', {}).get('Ack') != 'Success':
-                print(f"第 {page} 页响应状态异常: {response_data.get('ResponseStatus', {})}")
-                continue
-            
-            # 解析数据 - 景点数据在attractionList数组中，每个item的card字段中
-            attractions_list = response_data.get('attractionList', [])
-            
-            if not attractions_list:
-                print(f"第 {page} 页没有景点数据")
-                break
-            
-            # 提取数据
-            page_data = []
-            for item in attractions_list:
-                card_data = item.get('card', {})
-                if card_data:  # 确保card数据存在
-                    attraction_data = extract_attraction_data(card_data)
-                    page_data.append(attraction_data)
-            
-            if not page_data:
-                print(f"第 {page} 页没有有效数据")
-                continue
-            
-            # 保存到CSV
-            save_to_csv(page_data)
+        if page_data:
+            # 保存到CSV或存储后端
+            if backend is not None:
+                save_to_backend(page_data, backend)
+            else:
+                save_to_csv(page_data)
             all_attractions.extend(page_data)
+            crawl.rows += len(page_data)
+            metrics.inc('pages_ok')
+            metrics.inc('rows', len(page_data))
             
-            print(f"第 {page} 页爬取完成，共 {len(page_data)} 条数据")
-            
-            # 检查是否还有更多数据
-            has_more = response_data.get('hasMore', False)
+            logger.info(f"地区{crawl.district_id}第 {page} 页爬取完成，共 {len(page_data)} 条数据",
+                        extra=dict(extra, rows=len(page_data)))
             if not has_more:
-                print("没有更多数据，爬取结束")
+                logger.info(f"地区{crawl.district_id}没有更多数据，爬取结束", extra=extra)
+        else:
+            metrics.inc('pages_empty' if not has_more else 'pages_failed')
+        
+        if not has_more or page >= crawl.end_page:
+            metrics.inc('pages_skipped', crawl.finish())
+    
+    crawls = [DistrictCrawl(district_id, start_page, end_page) for district_id in district_ids]
+    in_flight = {}  # future -> (地区状态, 页码)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while True:
+            # 各地区轮流提交新页，保持合计最多max_workers页在途；
+            # 每个地区最多领先解析进度 max_workers/未结束地区数 页，减少末页之后白发的请求
+            active = sum(1 for crawl in crawls if not crawl.done)
+            max_ahead = max(1, -(-max_workers // active)) if active else max_workers
+            submitted = True
+            while submitted and len(in_flight) < max_workers:
+                submitted = False
+                for crawl in crawls:
+                    if len(in_flight) >= max_workers:
+                        break
+                    if crawl.can_submit(max_ahead):
+                        page = crawl.next_submit
+                        crawl.next_submit += 1
+                        logger.debug(f"正在爬取地区{crawl.district_id}第 {page} 页...",
+                                     extra={'district_id': crawl.district_id, 'page': page})
+                        future = executor.submit(fetch_ctrip_attractions, page, page_size, crawl.district_id)
+                        crawl.pending[page] = future
+                        in_flight[future] = (crawl, page)
+                        submitted = True
+            metrics.set_gauge('queue_depth', len(in_flight))
+            if not in_flight:
                 break
             
-        except Exception as e:
-            print(f"第 {page} 页数据处理失败: {e}")
-            continue
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                crawl, page = in_flight.pop(future)
+                if crawl.done:
+                    continue  # 该地区已结束，结果丢弃（已计入跳过的页）
+                crawl.pending.pop(page, None)
+                crawl.results[page] = future.result()
+                for ready_page, response_data in crawl.ready_pages():
+                    handle_page(crawl, ready_page, response_data)
+    
+    if backend is not None:
+        backend.close()
+    if archive is not None:
+        archive.close()
+        archive = None
     
+    if snapshot_db and all_attractions:
+        store = SnapshotStore(snapshot_db)
+        try:
+            snapshot_id, changes = store.record(all_attractions)
+            logger.info(f"已记录第 {snapshot_id} 次快照，{changes} 个字段有变化",
+                        extra={'snapshot_id': snapshot_id, 'changes': changes})
+        finally:
+            store.close()
+    
+    if len(crawls) > 1:
+        for crawl in crawls:
+            print(f"地区{crawl.district_id}：{crawl.rows} 条景点数据")
     print(f"爬取完成！总共获取 {len(all_attractions)} 条景点数据")
     return all_attractions
 
 # 使用示例
 if __name__ == "__main__":
-    # 爬取前30页，每页10条数据
-    attractions_data = crawl_ctrip_attractions(start_page=1, end_page=30, page_size=10)
+    setup_logging(LOG_LEVEL, LOG_FORMAT)
+    
+    # 爬取DISTRICT_IDS中各地区的前30页，每页10条数据
+    with MetricsReporter(metrics, METRICS_FILE, METRICS_INTERVAL, METRICS_PORT):
+        attractions_data = crawl_ctrip_attractions(start_page=1, end_page=30, page_size=10)
     
     # 如果需要查看数据，可以打印前几条
     if attractions_data:
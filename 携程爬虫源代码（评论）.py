@@ -3,14 +3,42 @@ import json
 import csv
 import time
 import random
+import math
+import re
+import asyncio
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import Counter, namedtuple
 from threading import Lock
+from contextlib import contextmanager
+from functools import partial
 import datetime
+import email.utils
 import hashlib
+import logging
+
+from 评论爬取状态 import CrawlState, comment_mark
+from 评论任务队列 import LeaseKeeper, WorkQueue, default_worker_id
+from 携程数据存储 import BufferedSink, CsvBackend, ParquetBackend, SqliteBackend, comment_id_key
+from 携程爬虫监控 import MetricsReporter, metrics, setup_logging
+from 携程响应归档 import ResponseArchive
+
+try:
+    import aiohttp
+except ImportError:  # 未安装aiohttp时回退到线程池引擎
+    aiohttp = None
+
+try:
+    import orjson
+except ImportError:  # 未安装orjson时用标准库解析响应
+    orjson = None
+
+# 响应解析：优先使用orjson（直接解析字节，比json.loads快数倍），两者的解析错误都是json.JSONDecodeError
+decode_json = orjson.loads if orjson is not None else json.loads
 
 # ---------------------- 基础配置 ----------------------
 # 动态生成基础信息，避免固定值
-def generate_dynamic_params():
+def generate_dynamic_params(poi_id=None):
+    poi_id = poi_id or POI_ID
     timestamp = str(int(time.time() * 1000))
     guid = hashlib.md5(timestamp.encode()).hexdigest()[:20]
     
@@ -39,7 +67,7 @@ def generate_dynamic_params():
         'cookieorigin': 'https://you.ctrip.com',
         'origin': 'https://you.ctrip.com',
         'priority': 'u=1, i',
-        'referer': f'https://you.ctrip.com/sight/beijing1/{POI_ID}.html',
+        'referer': f'https://you.ctrip.com/sight/beijing1/{poi_id}.html',
         'sec-ch-ua': '"Google Chrome";v="119", "Chromium";v="119", "Not?A_Brand";v="24"',
         'sec-ch-ua-mobile': '?0',
         'sec-ch-ua-platform': '"Windows"',
@@ -62,13 +90,27 @@ def generate_dynamic_params():
     return cookies, headers, params
 
 # 爬取配置
-POI_ID = 76342  # 景点ID
+POI_ID = 76342  # 景点ID（单景点模式）
 TOTAL_PAGES = 500  # 总爬取页数
 PAGE_SIZE = 10  # 每页评论数
 MAX_RETRIES = 5  # 增加重试次数
-THREAD_NUM = 5   # 减少线程数，降低频率
+THREAD_NUM = 5   # 初始并发数，之后由自适应并发控制器调整
 RANDOM_DELAY = (2, 6)  # 增加等待时间
 PROXY = None  # 可配置代理，如：{'http': 'http://127.0.0.1:8080', 'https': 'https://127.0.0.1:8080'}
+API_URL = 'https://m.ctrip.com/restapi/soa2/13444/json/getCommentCollapseList'
+
+# 异步引擎配置
+USE_ASYNC = True  # 使用asyncio引擎（需安装aiohttp），否则使用线程池
+RATE_LIMIT = 2.0  # 全局请求预算：每秒请求数
+RATE_BURST = 2  # 令牌桶容量，允许的瞬时突发请求数
+MAX_CONCURRENCY = 20  # 同时在途的请求上限（自适应控制器的并发上限最多增长到这里）
+
+# 自适应并发配置（AIMD，两种引擎共用）：按限流反馈和延迟自动调整同时在途的请求数
+MIN_CONCURRENCY = 1  # 并发上限的下限
+DECREASE_FACTOR = 0.5  # 被限流或延迟升高时并发上限乘以该系数
+LATENCY_TOLERANCE = 3.0  # 平均延迟超过最低延迟的多少倍时视为服务器吃紧
+BACKOFF_BASE = 5  # 被限流且响应无Retry-After时全局暂停的秒数，连续被限流时翻倍
+BACKOFF_MAX = 60  # 全局暂停的最长秒数
 
 # 文件配置
 CSV_HEADERS = [
@@ -76,12 +118,59 @@ CSV_HEADERS = [
     '发布时间', '发布地点', '总评分', '景色评分', '趣味评分', '性价比评分',
     '点赞数', '回复数', '图片数量', '图片链接', '是否精选', '发布类型', '景点ID'
 ]
+# 评论记录：按CSV_HEADERS排列的命名元组（无实例字典），存储后端按列顺序直接写出
+CommentRecord = namedtuple('CommentRecord', CSV_HEADERS)
 SINGLE_CSV = f'{POI_ID}_评论.csv'
 TOTAL_CSV = '全部评论.csv'
 
+# 多景点模式配置
+CRAWL_ALL_ATTRACTIONS = False  # 为True时按景点CSV批量爬取所有景点的评论
+ATTRACTION_CSV = '携程景点数据.csv'  # crawl_ctrip_attractions 的输出文件
+
+# 增量爬取配置
+INCREMENTAL = False  # 增量模式：按页顺序只追加上次之后的新评论，遇到全是已有评论的页即停止
+STATE_DB = '评论爬取状态.db'  # 爬取状态数据库（各景点的高水位标记、断点续爬日志）
+RESUME = True  # 断点续爬：上次运行中断时只爬未完成的页
+
+# 失败页重试配置
+RETRY_FAILED = True  # 本次运行结束前以较低并发重跑死信队列中的失败页
+RETRY_CONCURRENCY = 2  # 重跑失败页时的并发数
+RETRY_DEAD_LETTERS = False  # 为True时只重跑死信队列中的失败页（如补齐上次运行的失败页）
+
+# 分布式爬取配置（多个进程/机器共用一个任务队列）
+QUEUE_DB = None  # 设为任务队列数据库（如'评论任务队列.db'，多机时放在共享存储上）时，全量爬取改为从队列领取任务
+QUEUE_BATCH = 100  # 每次领取的任务数
+LEASE_SECONDS = 300  # 租约时长（秒）：进程崩溃后，它持有的任务最多这么久后被其他进程收回
+QUEUE_MAX_ATTEMPTS = 3  # 每个任务最多被领取的次数，超过后标记为失败
+QUEUE_RETRY_DELAY = 30  # 失败任务放回队列后，至少等待多少秒才能再次被领取
+QUEUE_POLL_INTERVAL = 5  # 暂时没有可领取的任务（其他进程还持有）时，等待多少秒再查看
+
+# 写入配置（由单独的写入线程攒批写入）
+STORAGE_BACKEND = 'csv'  # 'csv'、'sqlite'（按评论ID upsert，写入时即去重）或 'parquet'（按景点ID分区的列式存储，需安装pyarrow）
+SQLITE_DB = '携程数据.db'  # sqlite存储的数据库文件
+PARQUET_DIR = '携程数据_parquet'  # parquet存储的数据集目录（使用parquet时宜把FLUSH_ROWS调大到数千行）
+FLUSH_ROWS = 500  # 攒够多少行刷一次盘
+FLUSH_INTERVAL = 2.0  # 最长多少秒刷一次盘
+FSYNC_POLICY = 'close'  # csv存储：'none'不fsync；'flush'每次刷盘后fsync；'close'关闭文件时fsync
+IMAGE_TABLE = True  # 同时输出图片表（评论ID、景点ID、类型、序号、链接），每张评论图片/用户头像一行
+IMAGE_CSV = '评论图片.csv'  # csv存储的图片表文件（sqlite为review_images表，parquet为images目录）
+ARCHIVE_DIR = None  # 设为目录（如'响应归档'）时压缩归档每个原始响应，可用 携程响应归档.py 离线重新生成输出
+ARCHIVE_COMPRESSION = None  # 'zstd'（需安装zstandard）或 'gzip'，None时自动选择
+
+# 监控配置
+LOG_LEVEL = 'INFO'  # 日志级别：DEBUG / INFO / WARNING / ERROR
+LOG_FORMAT = 'text'  # 'text'只输出消息；'json'每行一个JSON对象（含景点ID、页码、状态码等字段）
+METRICS_FILE = '评论爬取监控.json'  # 定期写入的指标快照（耗时分位数、状态码、重试、退避、行/秒等），None不写
+METRICS_INTERVAL = 5  # 指标快照的写入间隔（秒）
+METRICS_PORT = None  # 设为端口号（如9108）时在127.0.0.1上提供Prometheus指标 /metrics
+
 # 会话管理
 session = requests.Session()
 file_lock = Lock()
+sink = None  # 爬取期间运行的写入线程（BufferedSink），未启动时直接写CSV文件
+archive = None  # 爬取期间的原始响应归档（ResponseArchive），未配置ARCHIVE_DIR时为None
+seen_comments = None  # 爬取期间各景点已写入的评论ID（SeenComments），用于丢弃翻页错位产生的重复评论
+logger = logging.getLogger('携程爬虫.评论')
 
 # ---------------------- 工具函数 ----------------------
 def convert_date(date_str):
@@ -94,6 +183,43 @@ def convert_date(date_str):
     except Exception:
         return ''
 
+_DATE_PATTERN = re.compile(r'Date\((-?\d+)\+')
+_CLOCK_MINUTES = [f'{h:02d}:{m:02d}:' for h in range(24) for m in range(60)]
+_CLOCK_SECONDS = [f'{s:02d}' for s in range(60)]
+_day_strings = {}  # 本地日序号 -> 'YYYY-MM-DD '
+
+def convert_dates(date_strs):
+    """
+    批量转换一页的携程日期，结果与逐条调用convert_date相同
+    
+    一页的时间戳通常落在同一时区偏移内：首尾偏移相同时只取一次本地时区偏移，
+    日期部分按天缓存，时分秒查表拼接，避免逐条fromtimestamp和strftime
+    """
+    timestamps = []
+    for date_str in date_strs:
+        match = _DATE_PATTERN.search(date_str) if date_str else None
+        timestamps.append(int(match.group(1)) // 1000 if match else None)
+    valid = [ts for ts in timestamps if ts is not None]
+    if not valid:
+        return [''] * len(timestamps)
+    try:
+        offset = time.localtime(valid[0]).tm_gmtoff
+        if time.localtime(valid[-1]).tm_gmtoff != offset:
+            return [convert_date(date_str) for date_str in date_strs]
+        results = []
+        for ts in timestamps:
+            if ts is None:
+                results.append('')
+                continue
+            day, seconds = divmod(ts + offset, 86400)
+            day_str = _day_strings.get(day)
+            if day_str is None:
+                day_str = _day_strings[day] = time.strftime('%Y-%m-%d ', time.gmtime(day * 86400))
+            results.append(day_str + _CLOCK_MINUTES[seconds // 60] + _CLOCK_SECONDS[seconds % 60])
+        return results
+    except (OverflowError, OSError, ValueError):
+        return [convert_date(date_str) for date_str in date_strs]
+
 def get_proxy():
     """获取代理（如果需要）"""
     return PROXY
@@ -103,10 +229,10 @@ def random_sleep(min_seconds=1, max_seconds=5):
     sleep_time = random.uniform(min_seconds, max_seconds)
     time.sleep(sleep_time)
 
-def fetch_page(page_index):
-    """爬取单页评论"""
+def build_request(poi_id, page_index):
+    """构造单页评论请求的参数、cookies、请求头和请求体"""
     # 每次请求都生成新的参数
-    cookies, headers, params = generate_dynamic_params()
+    cookies, headers, params = generate_dynamic_params(poi_id)
     
     json_data = {
         'arg': {
@@ -115,7 +241,7 @@ def fetch_page(page_index):
             'commentTagId': 0,
             'pageIndex': page_index,
             'pageSize': PAGE_SIZE,
-            'poiId': POI_ID,
+            'poiId': poi_id,
             'sourceType': 1,
             'sortType': 3,
             'starType': 0,
@@ -132,8 +258,284 @@ def fetch_page(page_index):
             'extension': [],
         },
     }
+    return cookies, headers, params, json_data
+
+def parse_comments(data, poi_id, page_index):
+    """
+    校验响应并解析评论数据
+    
+    Returns:
+        (评论列表, 错误信息)，评论为CommentRecord，请求失败时评论列表为None，已无数据时为空列表
+    """
+    if data.get('code') != 200 or data.get('msg') != '请求成功':
+        error_msg = data.get('msg', '未知错误')
+        logger.warning(f'景点{poi_id}第{page_index}页请求失败：{error_msg}',
+                       extra={'poi_id': poi_id, 'page': page_index, 'error': error_msg})
+        return None, error_msg
+
+    # 解析评论数据
+    items = data.get('result', {}).get('items', [])
+    
+    if not items:
+        logger.info(f'景点{poi_id}第{page_index}页无数据，可能已到末尾',
+                    extra={'poi_id': poi_id, 'page': page_index, 'rows': 0})
+        return [], None
+    
+    # 发布时间按页批量转换
+    publish_times = convert_dates([item.get('publishTime', '') for item in items])
+    comments = []
+    for item, publish_time in zip(items, publish_times):
+        user_info = item.get('userInfo', {})
+        scores = {score_item.get('name', ''): score_item.get('score', 0)
+                  for score_item in item.get('scores', [])}
+        images = [img['imageSrcUrl'] for img in item.get('images', []) if img.get('imageSrcUrl')]
+
+        # 字段顺序与CSV_HEADERS一致
+        comments.append(CommentRecord(
+            item.get('commentId', ''),
+            user_info.get('userId', ''),
+            user_info.get('userNick', ''),
+            user_info.get('userMember', ''),
+            user_info.get('userImage', ''),
+            item.get('content', '').strip().replace('\n', ' '),
+            publish_time,
+            item.get('ipLocatedName', ''),
+            item.get('score', 0),
+            scores.get('景色', 0),
+            scores.get('趣味', 0),
+            scores.get('性价比', 0),
+            item.get('usefulCount', 0),
+            item.get('replyCount', 0),
+            len(images),
+            '|'.join(images) if images else '',
+            item.get('isPicked', False),
+            item.get('publishTypeTag', ''),
+            poi_id,
+        ))
+
+    logger.info(f'景点{poi_id}第{page_index}页爬取成功，获取{len(comments)}条评论',
+                extra={'poi_id': poi_id, 'page': page_index, 'rows': len(comments)})
+    return comments, None
+
+def parse_total(data):
+    """响应中的评论总数（result.totalCount），没有时返回None"""
+    total = (data.get('result') or {}).get('totalCount')
+    try:
+        return int(total) if total is not None else None
+    except (TypeError, ValueError):
+        return None
+
+def detect_last_page(page_index, comments, total):
+    """
+    根据一页的结果推断末页页码
+    
+    评论总数可知时按PAGE_SIZE算出页数；本页无数据（已到末尾）时末页为前一页；都无法判断时返回None
+    """
+    candidates = []
+    if total is not None:
+        candidates.append(math.ceil(total / PAGE_SIZE))
+    if comments == []:
+        candidates.append(page_index - 1)
+    return min(candidates) if candidates else None
+
+class LastPageTracker:
+    """
+    各景点的末页页码，从响应的评论总数或无数据页推断
+    
+    传入state时读取和保存已知末页，断点续爬和重跑失败页时直接按已知末页规划
+    """
+
+    def __init__(self, state=None):
+        self.state = state
+        self.last_pages = {}
+
+    def get(self, poi_id):
+        """景点的末页页码，尚未推断出时返回None"""
+        if poi_id not in self.last_pages:
+            self.last_pages[poi_id] = self.state.get_last_page(poi_id) if self.state else None
+        return self.last_pages[poi_id]
+
+    def past_end(self, poi_id, page):
+        """页码是否在已知末页之后"""
+        last_page = self.get(poi_id)
+        return last_page is not None and page > last_page
+
+    def update(self, poi_id, page, comments, total):
+        """根据一页的结果更新末页，末页变小（有页可以跳过）时返回True"""
+        last_page = detect_last_page(page, comments, total)
+        current = self.get(poi_id)
+        if last_page is None or (current is not None and last_page >= current):
+            return False
+        self.last_pages[poi_id] = last_page
+        if self.state is not None:
+            self.state.set_last_page(poi_id, last_page)
+        logger.info(f'景点{poi_id}共{last_page}页，之后的页不再爬取',
+                    extra={'poi_id': poi_id, 'last_page': last_page})
+        return True
+
+def is_rate_limited(error_msg):
+    """接口返回的错误是否为限流（需要等待更长时间后重试）"""
+    return '频繁' in error_msg or '限制' in error_msg
+
+def parse_retry_after(value):
+    """解析Retry-After响应头（秒数或HTTP日期），没有或无法解析时返回None"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+        return max(0.0, (when - datetime.datetime.now(when.tzinfo)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+# ---------------------- 自适应并发控制 ----------------------
+class AdaptiveConcurrency:
+    """
+    AIMD自适应并发控制器，同一次爬取的所有请求共用，线程池引擎和异步引擎都可使用
+    
+    - 加性增：每连续完成limit个正常请求，并发上限+1，最多到max_limit
+    - 乘性减：被限流（403/429/接口提示频繁）时并发上限乘以DECREASE_FACTOR，
+      并让所有请求一起暂停（全局退避）：响应带Retry-After时按其等待，
+      否则等待BACKOFF_BASE秒，连续被限流时翻倍，最长BACKOFF_MAX秒；
+      平均延迟超过最低延迟的LATENCY_TOLERANCE倍时同样减小上限，但不暂停
+    - 同一轮拥塞只减一次：只有上次减小之后发出的请求才会再次触发减小
+    
+    当前并发上限和在途请求数实时写入监控指标（concurrency_limit、in_flight），
+    全局暂停的时长累计到backoff_seconds
+    """
+
+    POLL_INTERVAL = 0.02  # 名额已满时重新检查的间隔（秒）
+
+    def __init__(self, initial, min_limit=MIN_CONCURRENCY, max_limit=None):
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(max_limit or initial, self.min_limit)
+        self.limit = float(min(max(initial, self.min_limit), self.max_limit))
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.backoff = BACKOFF_BASE
+        self.min_latency = None
+        self.avg_latency = None
+        self.last_decrease = 0.0
+        self._successes = 0
+        self._lock = Lock()
+
+    def try_acquire(self):
+        """
+        尝试占用一个在途名额
+        
+        Returns:
+            (需要等待的秒数, 发出时间)，等待秒数为0时已占用名额，请求结束后须调用on_*归还
+        """
+        with self._lock:
+            now = time.monotonic()
+            if now < self.paused_until:
+                return self.paused_until - now, None
+            if self.in_flight >= int(self.limit):
+                return self.POLL_INTERVAL, None
+            self.in_flight += 1
+            self._publish()
+            return 0, now
+
+    def acquire(self):
+        """阻塞到取得名额（线程池引擎），返回发出时间"""
+        while True:
+            wait, started = self.try_acquire()
+            if not wait:
+                return started
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        """等待到取得名额（异步引擎），返回发出时间"""
+        while True:
+            wait, started = self.try_acquire()
+            if not wait:
+                return started
+            await asyncio.sleep(wait)
+
+    def on_success(self, started):
+        """请求正常返回：根据延迟加性增或乘性减"""
+        with self._lock:
+            self.in_flight -= 1
+            self.backoff = BACKOFF_BASE
+            latency = time.monotonic() - started
+            if self.min_latency is None or latency < self.min_latency:
+                self.min_latency = latency
+            if self.avg_latency is None:
+                self.avg_latency = latency
+            else:
+                self.avg_latency = 0.8 * self.avg_latency + 0.2 * latency
+            if self.avg_latency > self.min_latency * LATENCY_TOLERANCE:
+                self._decrease(started)
+                self._publish()
+                return
+            self._successes += 1
+            if self._successes >= int(self.limit):
+                self._successes = 0
+                self.limit = min(self.max_limit, self.limit + 1)
+            self._publish()
+
+    def on_backpressure(self, started, retry_after=None):
+        """请求被限流：乘性减并全局暂停，retry_after为响应的Retry-After秒数"""
+        metrics.inc('throttled')
+        with self._lock:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if self._decrease(started):
+                wait = retry_after if retry_after is not None else self.backoff
+                self.backoff = min(BACKOFF_MAX, self.backoff * 2)
+            else:
+                # 同一轮拥塞中的其他请求只延长暂停（如有Retry-After），不再减小上限
+                wait = retry_after or 0
+            resume_at = max(self.paused_until, now + wait)
+            metrics.inc('backoff_seconds', resume_at - max(self.paused_until, now))
+            self.paused_until = resume_at
+            self._publish()
 
+    def on_error(self, started):
+        """请求出错（网络错误、解析失败等）：只归还名额，不调整上限"""
+        with self._lock:
+            self.in_flight -= 1
+            self._publish()
+
+    def _publish(self):
+        metrics.set_gauge('concurrency_limit', self.limit)
+        metrics.set_gauge('in_flight', self.in_flight)
+
+    def _decrease(self, started):
+        if started < self.last_decrease:
+            return False
+        self.limit = max(self.min_limit, self.limit * DECREASE_FACTOR)
+        self.last_decrease = time.monotonic()
+        self.avg_latency = None
+        self._successes = 0
+        return True
+
+def record_request(started, status):
+    """记录一次评论请求（含重试中的每一次）的状态和耗时，started为控制器给出的发出时间"""
+    metrics.observe_request('comment', status, time.monotonic() - started)
+
+def fetch_page(page_index, poi_id=POI_ID, controller=None):
+    """
+    爬取单页评论
+    
+    controller为同一次爬取共用的AdaptiveConcurrency，不传时按单并发处理（仍会按Retry-After退避）
+    
+    Returns:
+        (评论列表, 错误信息, 评论总数)，无数据时评论列表为空，爬取失败时为None并附失败原因，
+        响应中没有评论总数时为None
+    """
+    controller = controller or AdaptiveConcurrency(1)
+    cookies, headers, params, json_data = build_request(poi_id, page_index)
+
+    reason = ''
     for retry in range(MAX_RETRIES):
+        started = None
+        response = None
+        if retry:
+            metrics.inc('retries')
         try:
             # 随机等待，模拟人类行为
             random_sleep(*RANDOM_DELAY)
@@ -141,6 +543,7 @@ def fetch_page(page_index):
             # 随机决定是否使用代理
             proxies = get_proxy() if random.random() > 0.7 else None
             
+            started = controller.acquire()
             response = session.post(
                 API_URL,
                 params=params,
@@ -151,168 +554,953 @@ def fetch_page(page_index):
                 proxies=proxies,
                 verify=False  # 跳过SSL验证（谨慎使用）
             )
+            record_request(started, response.status_code)
             
-            # 检查是否被反爬
+            # 检查是否被反爬，由控制器全局退避后重试
             if response.status_code == 403:
-                print(f'第{page_index}页触发反爬机制（403），等待后重试...')
-                time.sleep(30)  # 长时间等待
+                logger.warning(f'景点{poi_id}第{page_index}页触发反爬机制（403），退避后重试...',
+                               extra={'poi_id': poi_id, 'page': page_index, 'status': 403})
+                reason = 'HTTP 403 触发反爬'
+                controller.on_backpressure(started, parse_retry_after(response.headers.get('Retry-After')))
                 continue
                 
             if response.status_code == 429:
-                print(f'第{page_index}页请求过于频繁（429），等待后重试...')
-                time.sleep(60)  # 更长时间等待
+                logger.warning(f'景点{poi_id}第{page_index}页请求过于频繁（429），退避后重试...',
+                               extra={'poi_id': poi_id, 'page': page_index, 'status': 429})
+                reason = 'HTTP 429 请求过于频繁'
+                controller.on_backpressure(started, parse_retry_after(response.headers.get('Retry-After')))
                 continue
                 
             response.raise_for_status()
-            data = response.json()
+            data = decode_json(response.content)
+            if archive is not None:
+                archive.add('comment', poi_id, page_index, response.content)
+            comments, error = parse_comments(data, poi_id, page_index)
+            # 如果是限流错误，同样全局退避
+            if error and is_rate_limited(error):
+                reason = error
+                controller.on_backpressure(started)
+                continue
+            controller.on_success(started)
+            return comments, error, parse_total(data)
 
-            # 校验响应
-            if data.get('code') != 200 or data.get('msg') != '请求成功':
-                error_msg = data.get('msg', '未知错误')
-                print(f'第{page_index}页请求失败：{error_msg}')
-                
-                # 如果是特定错误，等待更长时间
-                if '频繁' in error_msg or '限制' in error_msg:
-                    time.sleep(30)
-                    continue
-                return []
+        except requests.exceptions.RequestException as e:
+            if started is not None:
+                if response is None:
+                    record_request(started, 'error')
+                controller.on_error(started)
+            logger.warning(f'景点{poi_id}第{page_index}页网络错误（重试{retry+1}/{MAX_RETRIES}）：{str(e)}',
+                           extra={'poi_id': poi_id, 'page': page_index, 'attempt': retry + 1})
+            if retry == MAX_RETRIES - 1:
+                return None, f'网络错误：{str(e)}', None
+            # 指数退避策略
+            delay = 2 ** retry + random.uniform(1, 3)
+            metrics.inc('backoff_seconds', delay)
+            time.sleep(delay)
+        except json.JSONDecodeError as e:
+            controller.on_error(started)
+            logger.error(f'景点{poi_id}第{page_index}页JSON解析错误：{str(e)}',
+                         extra={'poi_id': poi_id, 'page': page_index})
+            return None, f'JSON解析错误：{str(e)}', None
+        except Exception as e:
+            if started is not None:
+                controller.on_error(started)
+            logger.error(f'景点{poi_id}第{page_index}页未知错误：{str(e)}',
+                         extra={'poi_id': poi_id, 'page': page_index})
+            return None, f'未知错误：{str(e)}', None
+    return None, f'重试{MAX_RETRIES}次后仍失败：{reason}', None
+
+# ---------------------- 异步引擎 ----------------------
+class TokenBucket:
+    """全局令牌桶限速器：每秒补充rate个令牌，最多积攒capacity个"""
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """取得一个令牌，令牌不足时等待到下一个令牌生成"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+async def fetch_page_async(http, limiter, poi_id, page_index, controller=None):
+    """
+    异步爬取单页评论，每次发请求前先从自适应并发控制器取在途名额（全局暂停期间在此等待），
+    再从令牌桶取令牌，暂停结束后的请求因此仍按RATE_LIMIT放行，返回值同fetch_page
+    """
+    controller = controller or AdaptiveConcurrency(1)
+    cookies, headers, params, json_data = build_request(poi_id, page_index)
+    timeout = aiohttp.ClientTimeout(total=15)
 
-            # 解析评论数据
-            comments = []
-            items = data.get('result', {}).get('items', [])
+    reason = ''
+    for retry in range(MAX_RETRIES):
+        started = None
+        if retry:
+            metrics.inc('retries')
+        try:
+            started = await controller.acquire_async()
+            await limiter.acquire()
+            # 发出时间从取到令牌算起，延迟统计不含令牌桶的排队时间
+            started = time.monotonic()
             
-            if not items:
-                print(f'第{page_index}页无数据，可能已到末尾')
-                return []
-                
-            for item in items:
-                user_info = item.get('userInfo', {})
-                scores_list = item.get('scores', [])
-                images_list = item.get('images', [])
-
-                scores = {}
-                for score_item in scores_list:
-                    scores[score_item.get('name', '')] = score_item.get('score', 0)
-
-                images = [img.get('imageSrcUrl', '') for img in images_list if img.get('imageSrcUrl')]
-
-                comment = {
-                    '评论ID': item.get('commentId', ''),
-                    '用户ID': user_info.get('userId', ''),
-                    '用户名': user_info.get('userNick', ''),
-                    '用户等级': user_info.get('userMember', ''),
-                    '用户头像': user_info.get('userImage', ''),
-                    '评论内容': item.get('content', '').strip().replace('\n', ' '),
-                    '发布时间': convert_date(item.get('publishTime', '')),
-                    '发布地点': item.get('ipLocatedName', ''),
-                    '总评分': item.get('score', 0),
-                    '景色评分': scores.get('景色', 0),
-                    '趣味评分': scores.get('趣味', 0),
-                    '性价比评分': scores.get('性价比', 0),
-                    '点赞数': item.get('usefulCount', 0),
-                    '回复数': item.get('replyCount', 0),
-                    '图片数量': len(images),
-                    '图片链接': '|'.join(images) if images else '',
-                    '是否精选': item.get('isPicked', False),
-                    '发布类型': item.get('publishTypeTag', ''),
-                    '景点ID': POI_ID
-                }
-                comments.append(comment)
-
-            print(f'第{page_index}页爬取成功，获取{len(comments)}条评论')
-            return comments
+            # 随机决定是否使用代理（aiohttp只接受单个代理地址）
+            proxy = PROXY.get('https') if PROXY and random.random() > 0.7 else None
+            
+            async with http.post(
+                API_URL,
+                params=params,
+                cookies=cookies,
+                headers=headers,
+                json=json_data,
+                timeout=timeout,
+                proxy=proxy,
+                ssl=False  # 跳过SSL验证（谨慎使用）
+            ) as response:
+                body = await response.read()
+                record_request(started, response.status)
+                if response.status == 403:
+                    logger.warning(f'景点{poi_id}第{page_index}页触发反爬机制（403），退避后重试...',
+                                   extra={'poi_id': poi_id, 'page': page_index, 'status': 403})
+                    reason = 'HTTP 403 触发反爬'
+                    controller.on_backpressure(started, parse_retry_after(response.headers.get('Retry-After')))
+                    continue
+                    
+                if response.status == 429:
+                    logger.warning(f'景点{poi_id}第{page_index}页请求过于频繁（429），退避后重试...',
+                                   extra={'poi_id': poi_id, 'page': page_index, 'status': 429})
+                    reason = 'HTTP 429 请求过于频繁'
+                    controller.on_backpressure(started, parse_retry_after(response.headers.get('Retry-After')))
+                    continue
+                    
+                response.raise_for_status()
+            data = decode_json(body)
+            if archive is not None:
+                archive.add('comment', poi_id, page_index, body)
 
-        except requests.exceptions.RequestException as e:
-            print(f'第{page_index}页网络错误（重试{retry+1}/{MAX_RETRIES}）：{str(e)}')
+            comments, error = parse_comments(data, poi_id, page_index)
+            # 如果是限流错误，同样全局退避
+            if error and is_rate_limited(error):
+                reason = error
+                controller.on_backpressure(started)
+                continue
+            controller.on_success(started)
+            return comments, error, parse_total(data)
+
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            if started is not None:
+                if not isinstance(e, aiohttp.ClientResponseError):
+                    record_request(started, 'error')
+                controller.on_error(started)
+            logger.warning(f'景点{poi_id}第{page_index}页网络错误（重试{retry+1}/{MAX_RETRIES}）：{str(e)}',
+                           extra={'poi_id': poi_id, 'page': page_index, 'attempt': retry + 1})
             if retry == MAX_RETRIES - 1:
-                return []
+                return None, f'网络错误：{str(e)}', None
             # 指数退避策略
-            time.sleep(2 ** retry + random.uniform(1, 3))
+            delay = 2 ** retry + random.uniform(1, 3)
+            metrics.inc('backoff_seconds', delay)
+            await asyncio.sleep(delay)
         except json.JSONDecodeError as e:
-            print(f'第{page_index}页JSON解析错误：{str(e)}')
-            return []
+            controller.on_error(started)
+            logger.error(f'景点{poi_id}第{page_index}页JSON解析错误：{str(e)}',
+                         extra={'poi_id': poi_id, 'page': page_index})
+            return None, f'JSON解析错误：{str(e)}', None
+        except asyncio.CancelledError:
+            # 任务被取消时归还名额，避免占住并发上限
+            if started is not None:
+                controller.on_error(started)
+            raise
         except Exception as e:
-            print(f'第{page_index}页未知错误：{str(e)}')
-            return []
+            if started is not None:
+                controller.on_error(started)
+            logger.error(f'景点{poi_id}第{page_index}页未知错误：{str(e)}',
+                         extra={'poi_id': poi_id, 'page': page_index})
+            return None, f'未知错误：{str(e)}', None
+    return None, f'重试{MAX_RETRIES}次后仍失败：{reason}', None
+
+async def crawl_tasks_async(tasks, state=None, concurrency=None):
+    """
+    异步爬取一组(景点ID, 页码)任务
+    
+    所有任务共用一个连接池、一个令牌桶、一个自适应并发控制器和concurrency（默认MAX_CONCURRENCY）
+    个工作协程，同时在途的请求数由控制器在THREAD_NUM和concurrency之间调整；
+    按tasks的顺序依次出队，因此排在前面的任务优先被爬取。
+    末页未知的景点先只爬它的第一个任务页，从响应的评论总数算出末页后再放行其余页；
+    之后发现更早的末尾（某页无数据）时，取消该景点末页之后在途的请求，排队中的页直接跳过。
+    传入state时，每页写入磁盘后记入断点日志，失败页放入死信队列，末页页码持久化。
+    
+    Returns:
+        各景点成功爬取的页数 {景点ID: 页数}
+    """
+    concurrency = concurrency or MAX_CONCURRENCY
+    limiter = TokenBucket(RATE_LIMIT, RATE_BURST)
+    controller = AdaptiveConcurrency(min(THREAD_NUM, concurrency), max_limit=concurrency)
+    async with aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=concurrency)
+    ) as http:
+        successful_pages = await run_tasks_async(http, limiter, controller, tasks, state, concurrency)
+    logger.info(f'自适应并发：结束时并发上限为{controller.limit:.1f}', extra={'concurrency_limit': controller.limit})
+    return successful_pages
+
+async def run_tasks_async(http, limiter, controller, tasks, state=None, concurrency=None):
+    """
+    用已有的连接池、令牌桶和自适应并发控制器爬取一组任务（规则见crawl_tasks_async），
+    供需要在同一个事件循环中多次爬取的流程（如分布式队列逐批领取）复用这些资源
+    
+    Returns:
+        各景点成功爬取的页数 {景点ID: 页数}
+    """
+    concurrency = concurrency or MAX_CONCURRENCY
+    tracker = LastPageTracker(state)
+
+    # 按任务序号出队；末页未知的景点只放入第一页，其余页暂存在held中
+    queue = asyncio.PriorityQueue()
+    held = {}
+    seen = set()
+    for index, (poi_id, page) in enumerate(tasks):
+        if poi_id in held:
+            held[poi_id].append((index, poi_id, page))
+            continue
+        if poi_id not in seen and tracker.get(poi_id) is None:
+            held[poi_id] = []
+        seen.add(poi_id)
+        queue.put_nowait((index, poi_id, page))
+
+    successful_pages = Counter()
+    skipped_pages = Counter()
+    in_flight = {}  # (景点ID, 页码) -> 请求任务
+
+    async def crawl_one(poi_id, page):
+        if tracker.past_end(poi_id, page):
+            skipped_pages[poi_id] += 1
+            metrics.inc('pages_skipped')
+            return
+        fetch = asyncio.ensure_future(fetch_page_async(http, limiter, poi_id, page, controller))
+        in_flight[(poi_id, page)] = fetch
+        try:
+            await asyncio.wait([fetch])
+        finally:
+            del in_flight[(poi_id, page)]
+        if fetch.cancelled():
+            skipped_pages[poi_id] += 1
+            metrics.inc('pages_skipped')
+            return
+
+        comments, error, total = fetch.result()
+        if tracker.update(poi_id, page, comments, total):
+            for (task_poi, task_page), task in in_flight.items():
+                if task_poi == poi_id and tracker.past_end(task_poi, task_page):
+                    task.cancel()
+        if comments:
+            successful_pages[poi_id] += 1
+        elif comments is None:
+            logger.warning(f'景点{poi_id}第{page}页爬取失败：{error}', extra={'poi_id': poi_id, 'page': page})
+        store_page_result(state, poi_id, page, comments, error)
+
+    async def worker():
+        while True:
+            _, poi_id, page = await queue.get()
+            metrics.set_gauge('queue_depth', queue.qsize())
+            try:
+                await crawl_one(poi_id, page)
+            finally:
+                # 第一页返回后（无论成败）放行该景点的其余页
+                for item in held.pop(poi_id, ()):
+                    queue.put_nowait(item)
+                queue.task_done()
+
+    workers = [asyncio.ensure_future(worker()) for _ in range(concurrency)]
+    join = asyncio.ensure_future(queue.join())
+    done, _ = await asyncio.wait([join, *workers], return_when=asyncio.FIRST_COMPLETED)
+    join.cancel()
+    for task in workers:
+        task.cancel()
+    await asyncio.gather(*workers, return_exceptions=True)
+    for task in done:
+        task.result()  # 工作协程出错时在这里抛出
+
+    if skipped_pages:
+        logger.info(f'跳过末页之后的{sum(skipped_pages.values())}页', extra={'pages': sum(skipped_pages.values())})
+    return successful_pages
 
-def save_to_csv(comments, is_total=False):
-    """保存评论到CSV文件"""
+def single_csv_path(poi_id):
+    """单个景点的评论文件名"""
+    return CsvBackend.review_path(poi_id)
+
+def save_to_csv(comments, is_total=False, single_csv=SINGLE_CSV):
+    """保存评论（CommentRecord）到CSV文件，按列顺序直接写出"""
     with file_lock:
         # 保存单个景点CSV
-        with open(SINGLE_CSV, 'a', encoding='utf-8-sig', newline='') as f:
-            writer = csv.DictWriter(f, fieldnames=CSV_HEADERS)
+        with open(single_csv, 'a', encoding='utf-8-sig', newline='') as f:
+            writer = csv.writer(f)
             if f.tell() == 0:
-                writer.writeheader()
+                writer.writerow(CSV_HEADERS)
             writer.writerows(comments)
 
         # 保存汇总CSV
         if is_total:
             with open(TOTAL_CSV, 'a', encoding='utf-8-sig', newline='') as f:
-                writer = csv.DictWriter(f, fieldnames=CSV_HEADERS)
+                writer = csv.writer(f)
                 if f.tell() == 0:
-                    writer.writeheader()
+                    writer.writerow(CSV_HEADERS)
                 writer.writerows(comments)
 
-def batch_crawl(pages):
-    """批量爬取页面，支持断点续爬"""
+def open_backend():
+    """按STORAGE_BACKEND创建评论存储后端"""
+    if STORAGE_BACKEND == 'sqlite':
+        return SqliteBackend(SQLITE_DB, CSV_HEADERS, images=IMAGE_TABLE)
+    if STORAGE_BACKEND == 'parquet':
+        return ParquetBackend(PARQUET_DIR, CSV_HEADERS, images=IMAGE_TABLE)
+    return CsvBackend(CSV_HEADERS, TOTAL_CSV, fsync_policy=FSYNC_POLICY,
+                      image_path=IMAGE_CSV if IMAGE_TABLE else None)
+
+class SeenComments:
+    """
+    各景点已写入的评论ID集合
+    
+    按最新排序翻页时，爬取期间新发布的评论会把已爬过的评论挤到下一页，同一条评论出现在两页上；
+    写入前按评论ID丢弃重复评论，存储和后续清洗都不会再看到它们。
+    使用精确集合而不是布隆过滤器：误判会丢掉真实评论，而每个评论ID只占几十字节
+    """
+    
+    def __init__(self):
+        self.ids = {}  # 景点ID -> 评论ID集合
+        self._lock = Lock()
+    
+    def seed(self, poi_id, comment_ids):
+        """预置已写入的评论ID（断点续爬时从已有输出读取）"""
+        with self._lock:
+            self.ids.setdefault(poi_id, set()).update(comment_ids)
+    
+    def drop_seen(self, poi_id, comments):
+        """返回本页中此前未写入过的评论（本页内的重复也只保留第一条），并把它们记为已写入"""
+        with self._lock:
+            seen = self.ids.setdefault(poi_id, set())
+            fresh = []
+            for comment in comments:
+                key = comment_id_key(comment.评论ID)
+                if key in seen:
+                    continue
+                seen.add(key)
+                fresh.append(comment)
+        dropped = len(comments) - len(fresh)
+        if dropped:
+            metrics.inc('duplicates_dropped', dropped)
+            logger.debug(f'景点{poi_id}丢弃{dropped}条重复评论', extra={'poi_id': poi_id, 'rows': dropped})
+        return fresh
+
+def drop_duplicates(poi_id, comments):
+    """丢弃已写入过的评论，爬取未启动去重集合时原样返回"""
+    if seen_comments is None or not comments:
+        return comments
+    return seen_comments.drop_seen(poi_id, comments)
+
+def seed_seen_comments(poi_ids, backend=None):
+    """
+    从已有输出读入这些景点已写入的评论ID，加入去重集合（默认读写入线程正在使用的存储后端）
+    
+    读取失败（如其他进程正在写同一个Parquet分区）时只记录警告，该景点本次不预置
+    
+    Returns:
+        读入的评论ID数
+    """
+    backend = backend or sink.backend
+    seeded = 0
+    for poi_id in poi_ids:
+        try:
+            comment_ids = backend.review_ids(poi_id)
+        except Exception as e:
+            logger.warning(f'景点{poi_id}读取已有评论ID失败：{str(e)}', extra={'poi_id': poi_id})
+            continue
+        seen_comments.seed(poi_id, comment_ids)
+        seeded += len(comment_ids)
+    return seeded
+
+@contextmanager
+def running_sink(resume_pois=()):
+    """
+    爬取期间启动写入线程，抓取端只把评论放进队列，结束时写完剩余数据；
+    同时建立评论ID去重集合，resume_pois中的景点（断点续爬）先从已有输出读入评论ID；
+    配置了ARCHIVE_DIR时同时启动原始响应归档
+    """
+    global sink, archive, seen_comments
+    backend = open_backend()
+    seen_comments = SeenComments()
+    if resume_pois:
+        seeded = seed_seen_comments(resume_pois, backend)
+        logger.info(f'已从现有输出读入{seeded}个评论ID用于去重', extra={'rows': seeded})
+    sink = BufferedSink(backend, FLUSH_ROWS, FLUSH_INTERVAL)
+    if ARCHIVE_DIR:
+        archive = ResponseArchive(ARCHIVE_DIR, ARCHIVE_COMPRESSION)
+    try:
+        yield sink
+    finally:
+        running, sink = sink, None
+        archiving, archive = archive, None
+        seen_comments = None
+        try:
+            running.close()
+        finally:
+            if archiving is not None:
+                archiving.close()
+
+def save_page(poi_id, comments, on_flushed=None):
+    """写入一页评论，落盘后调用on_flushed；写入线程未启动时直接写文件"""
+    if sink is not None:
+        sink.write(comments, on_flushed)
+        metrics.set_gauge('sink_backlog', sink.backlog)
+        return
+    if comments:
+        save_to_csv(comments, is_total=True, single_csv=single_csv_path(poi_id))
+    if on_flushed is not None:
+        on_flushed()
+
+def store_page_result(state, poi_id, page, comments, error):
+    """
+    保存一页的爬取结果
+    
+    成功的页（含无数据的末尾页）写入后记入断点日志，失败的页连同原因放入死信队列
+    """
+    if comments is None:
+        metrics.inc('pages_failed')
+        if state is not None:
+            state.add_dead_letter(poi_id, page, error)
+        return
+    metrics.inc('pages_ok' if comments else 'pages_empty')
+    comments = drop_duplicates(poi_id, comments)
+    metrics.inc('rows', len(comments))
+    on_flushed = partial(state.mark_page_done, poi_id, page, len(comments)) if state else None
+    save_page(poi_id, comments, on_flushed)
+
+def batch_crawl(pages, poi_id=POI_ID, state=None, max_workers=None, controller=None, tracker=None):
+    """
+    批量爬取页面，传入state时记录断点日志和死信队列，支持断点续爬
+    
+    线程池开max_workers（默认MAX_CONCURRENCY）个线程，实际同时在途的请求数由controller调整，
+    不传controller时新建一个（从THREAD_NUM开始）；
+    已知末页之后的页不提交，批内发现末尾后取消还未开始的后续页，已在等待的线程发请求前也会跳过
+    """
     successful_pages = 0
+    max_workers = max_workers or MAX_CONCURRENCY
+    controller = controller or AdaptiveConcurrency(min(THREAD_NUM, max_workers), max_limit=max_workers)
+    tracker = tracker or LastPageTracker(state)
+    pages = [page for page in pages if not tracker.past_end(poi_id, page)]
+    
+    def fetch(page):
+        if tracker.past_end(poi_id, page):
+            return None
+        return fetch_page(page, poi_id, controller)
     
-    with ThreadPoolExecutor(max_workers=THREAD_NUM) as executor:
-        future_to_page = {executor.submit(fetch_page, page): page for page in pages}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        future_to_page = {executor.submit(fetch, page): page for page in pages}
         
-        for future in as_completed(future_to_page):
+        for remaining, future in enumerate(as_completed(future_to_page), 1):
+            metrics.set_gauge('queue_depth', len(future_to_page) - remaining)
             page = future_to_page[future]
+            if future.cancelled():
+                metrics.inc('pages_skipped')
+                continue
             try:
-                comments = future.result()
+                result = future.result()
+                if result is None:  # 等待期间发现已过末页
+                    metrics.inc('pages_skipped')
+                    continue
+                comments, error, total = result
+                if tracker.update(poi_id, page, comments, total):
+                    for other, other_page in future_to_page.items():
+                        if tracker.past_end(poi_id, other_page):
+                            other.cancel()
                 if comments:
-                    save_to_csv(comments, is_total=True)
                     successful_pages += 1
-                else:
-                    print(f'第{page}页爬取失败或无数据')
+                elif comments is None:
+                    logger.warning(f'景点{poi_id}第{page}页爬取失败：{error}', extra={'poi_id': poi_id, 'page': page})
+                store_page_result(state, poi_id, page, comments, error)
             except Exception as e:
-                print(f'第{page}页任务处理失败：{str(e)}')
+                logger.error(f'景点{poi_id}第{page}页任务处理失败：{str(e)}', extra={'poi_id': poi_id, 'page': page})
+                store_page_result(state, poi_id, page, None, f'任务处理失败：{str(e)}')
     
     return successful_pages
 
-# ---------------------- 主函数 ----------------------
-def main():
-    # 清空历史文件
-    with open(SINGLE_CSV, 'w', encoding='utf-8-sig', newline='') as f:
-        pass
-    with open(TOTAL_CSV, 'w', encoding='utf-8-sig', newline='') as f:
-        pass
-
-    print(f'开始爬取景点ID：{POI_ID}，共{TOTAL_PAGES}页评论')
-    start_time = time.time()
-
-    # 分批爬取，避免一次性请求过多
-    batch_size = 50  # 每批50页
-    all_pages = list(range(1, TOTAL_PAGES + 1))
-    batches = [all_pages[i:i + batch_size] for i in range(0, len(all_pages), batch_size)]
+def crawl_in_batches(all_pages, poi_id=POI_ID, state=None, batch_size=50):
+    """
+    线程池引擎：分批爬取，避免一次性请求过多，各批共用一个自适应并发控制器
+    
+    末页未知时先单独爬第一页，按响应的评论总数只保留需要的页；发现末尾后不再爬之后的批次
+    """
+    controller = AdaptiveConcurrency(THREAD_NUM, max_limit=MAX_CONCURRENCY)
+    tracker = LastPageTracker(state)
+    pages = list(all_pages)
     
     total_successful = 0
+    if pages and tracker.get(poi_id) is None:
+        total_successful += batch_crawl(pages[:1], poi_id, state, controller=controller, tracker=tracker)
+        pages = pages[1:]
+    pages = [page for page in pages if not tracker.past_end(poi_id, page)]
+    batches = [pages[i:i + batch_size] for i in range(0, len(pages), batch_size)]
     
     for i, batch in enumerate(batches, 1):
-        print(f'开始第{i}批爬取，共{len(batch)}页...')
-        batch_success = batch_crawl(batch)
+        batch = [page for page in batch if not tracker.past_end(poi_id, page)]
+        if not batch:
+            break
+        logger.info(f'开始第{i}批爬取，共{len(batch)}页...', extra={'poi_id': poi_id, 'batch': i, 'pages': len(batch)})
+        batch_success = batch_crawl(batch, poi_id, state, controller=controller, tracker=tracker)
         total_successful += batch_success
         
-        # 批次间休息
-        if i < len(batches):
+        # 批次间休息（已到末尾时不再休息）
+        if i < len(batches) and not tracker.past_end(poi_id, batches[i][0]):
             rest_time = random.randint(10, 30)
-            print(f'批次完成，休息{rest_time}秒...')
+            logger.info(f'批次完成，休息{rest_time}秒...', extra={'poi_id': poi_id, 'batch': i})
             time.sleep(rest_time)
+    
+    return total_successful
+
+# ---------------------- 增量爬取 ----------------------
+def select_new_comments(comments, mark):
+    """筛出比高水位标记更新的评论，mark为None（首次爬取）时全部视为新评论"""
+    if mark is None:
+        return comments
+    return [comment for comment in comments if comment_mark(comment) > mark]
+
+def advance_mark(mark, comments):
+    """用本页新评论推进高水位标记"""
+    marks = [comment_mark(comment) for comment in comments]
+    if mark is not None:
+        marks.append(mark)
+    return max(marks) if marks else None
+
+def crawl_poi_incremental(poi_id, max_pages, state, controller=None):
+    """
+    按页顺序增量爬取单个景点（未启用异步引擎时使用）
+    
+    Returns:
+        新增评论数
+    """
+    mark = state.get_mark(poi_id)
+    new_mark = mark
+    new_count = 0
+    for page in range(1, max_pages + 1):
+        comments, _, _ = fetch_page(page, poi_id, controller)
+        if comments is None:
+            metrics.inc('pages_failed')
+            logger.warning(f'景点{poi_id}第{page}页爬取失败，本次不更新增量标记',
+                           extra={'poi_id': poi_id, 'page': page})
+            return new_count
+        fresh = select_new_comments(comments, mark)
+        metrics.inc('pages_ok' if fresh else 'pages_empty')
+        if fresh:
+            unique = drop_duplicates(poi_id, fresh)
+            metrics.inc('rows', len(unique))
+            save_page(poi_id, unique)
+            new_count += len(unique)
+            new_mark = advance_mark(new_mark, fresh)
+        # 已到末尾，或本页已越过高水位标记（按最新排序，后面的页只会更旧），不再多请求一页
+        if len(fresh) < len(comments) or not comments:
+            break
+    if new_mark != mark:
+        # 新评论全部落盘后才推进高水位标记
+        save_page(poi_id, [], partial(state.set_mark, poi_id, new_mark))
+    return new_count
+
+async def crawl_poi_incremental_async(http, limiter, poi_id, max_pages, state, controller=None):
+    """按页顺序增量爬取单个景点，返回值同crawl_poi_incremental"""
+    mark = state.get_mark(poi_id)
+    new_mark = mark
+    new_count = 0
+    for page in range(1, max_pages + 1):
+        comments, _, _ = await fetch_page_async(http, limiter, poi_id, page, controller)
+        if comments is None:
+            metrics.inc('pages_failed')
+            logger.warning(f'景点{poi_id}第{page}页爬取失败，本次不更新增量标记',
+                           extra={'poi_id': poi_id, 'page': page})
+            return new_count
+        fresh = select_new_comments(comments, mark)
+        metrics.inc('pages_ok' if fresh else 'pages_empty')
+        if fresh:
+            unique = drop_duplicates(poi_id, fresh)
+            metrics.inc('rows', len(unique))
+            save_page(poi_id, unique)
+            new_count += len(unique)
+            new_mark = advance_mark(new_mark, fresh)
+        if len(fresh) < len(comments) or not comments:
+            break
+    if new_mark != mark:
+        # 新评论全部落盘后才推进高水位标记
+        save_page(poi_id, [], partial(state.set_mark, poi_id, new_mark))
+    return new_count
+
+async def crawl_incremental_async(plan, state):
+    """异步增量爬取：同一景点的页按顺序爬取，不同景点共用工作池、令牌桶和自适应并发控制器并发爬取"""
+    limiter = TokenBucket(RATE_LIMIT, RATE_BURST)
+    controller = AdaptiveConcurrency(THREAD_NUM, max_limit=MAX_CONCURRENCY)
+    queue = asyncio.Queue()
+    for item in plan:
+        queue.put_nowait(item)
+    new_comments = Counter()
+
+    async with aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=MAX_CONCURRENCY)
+    ) as http:
+
+        async def worker():
+            while True:
+                try:
+                    poi_id, max_pages = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                new_comments[poi_id] = await crawl_poi_incremental_async(
+                    http, limiter, poi_id, max_pages, state, controller
+                )
+
+        await asyncio.gather(*(worker() for _ in range(MAX_CONCURRENCY)))
+
+    return new_comments
+
+def crawl_incremental(plan):
+    """
+    增量爬取一组景点，只追加新评论，不清空历史文件
+    
+    某页失败时已写入的新评论保留，但不推进高水位标记（失败页之后可能还有更早的新评论），
+    下次运行会重新爬到这些评论；因此先从已有输出读入这些景点的评论ID，写入前按评论ID去重
+    
+    Args:
+        plan: [(景点ID, 最多爬取页数), ...]
+    
+    Returns:
+        各景点新增评论数 {景点ID: 条数}
+    """
+    state = CrawlState(STATE_DB)
+    try:
+        with running_sink([poi_id for poi_id, _ in plan]):
+            if USE_ASYNC and aiohttp is not None:
+                return asyncio.run(crawl_incremental_async(plan, state))
+            new_comments = Counter()
+            controller = AdaptiveConcurrency(1)  # 逐页顺序爬取，共用控制器以便全局退避
+            for poi_id, max_pages in plan:
+                new_comments[poi_id] = crawl_poi_incremental(poi_id, max_pages, state, controller)
+            return new_comments
+    finally:
+        state.close()
+
+# ---------------------- 多景点调度 ----------------------
+def load_attractions(csv_path=ATTRACTION_CSV):
+    """
+    读取景点CSV（crawl_ctrip_attractions的输出），按景点ID去重
+    
+    Returns:
+        按评论数量从多到少排序的 [(景点ID, 评论数量), ...]，评论数量未知时为None
+    """
+    attractions = {}
+    with open(csv_path, 'r', encoding='utf-8-sig', newline='') as f:
+        for row in csv.DictReader(f):
+            poi_id = str(row.get('景点ID', '')).strip()
+            if not poi_id.isdigit():
+                continue
+            try:
+                comment_count = int(float(row.get('评论数量') or ''))
+            except ValueError:
+                comment_count = None
+            # 重复的景点保留评论数量最新（最大）的一条
+            previous = attractions.get(int(poi_id))
+            if previous is None or (comment_count or 0) > previous:
+                attractions[int(poi_id)] = comment_count
+    return sorted(attractions.items(), key=lambda x: x[1] or 0, reverse=True)
+
+def plan_pages(comment_count, max_pages=TOTAL_PAGES):
+    """按评论数量计算需要爬取的页数，评论数量未知时按max_pages爬取"""
+    if comment_count is None:
+        return max_pages
+    return min(math.ceil(comment_count / PAGE_SIZE), max_pages)
+
+def crawl_all_attractions(csv_path=ATTRACTION_CSV):
+    """按景点CSV批量爬取所有景点的评论，评论多的景点优先"""
+    attractions = load_attractions(csv_path)
+    plan = [(poi_id, plan_pages(count)) for poi_id, count in attractions]
+    plan = [(poi_id, pages) for poi_id, pages in plan if pages > 0]
+    total_pages = sum(pages for _, pages in plan)
+
+    if INCREMENTAL:
+        print(f'共{len(plan)}个景点，增量爬取新评论')
+        start_time = time.time()
+        new_comments = crawl_incremental(plan)
+        for poi_id, _ in plan:
+            print(f'景点{poi_id}：新增{new_comments[poi_id]}条评论')
+        print(f'增量爬取完成！共新增{sum(new_comments.values())}条评论，总耗时：{time.time() - start_time:.2f}秒')
+        return
+
+    print(f'共{len(plan)}个景点，计划爬取{total_pages}页评论')
+    start_time = time.time()
+
+    successful, skipped = crawl_full(plan)
+
+    total_time = time.time() - start_time
+    for poi_id, pages in plan:
+        print(f'景点{poi_id}：成功{successful[poi_id]}/{pages}页')
+    total_successful = sum(successful.values())
+    print(f'爬取完成！成功爬取{total_successful}/{total_pages}页，总耗时：{total_time:.2f}秒')
+    print_outputs()
+
+# ---------------------- 全量爬取（断点续爬） ----------------------
+def truncate_outputs(poi_ids):
+    """清空历史文件（sqlite存储按评论ID upsert，无需清空）"""
+    if STORAGE_BACKEND == 'parquet':
+        for poi_id in poi_ids:
+            ParquetBackend.drop_reviews(PARQUET_DIR, poi_id)
+        return
+    if STORAGE_BACKEND != 'csv':
+        return
+    for poi_id in poi_ids:
+        with open(single_csv_path(poi_id), 'w', encoding='utf-8-sig', newline='') as f:
+            pass
+    with open(TOTAL_CSV, 'w', encoding='utf-8-sig', newline='') as f:
+        pass
+    if IMAGE_TABLE:
+        with open(IMAGE_CSV, 'w', encoding='utf-8-sig', newline='') as f:
+            pass
+
+def planned_pages(state, poi_id, pages):
+    """景点实际要爬的页数：已知末页时不超过末页"""
+    last_page = state.get_last_page(poi_id)
+    return pages if last_page is None else min(pages, last_page)
+
+def crawl_full(plan):
+    """
+    全量爬取一组景点
+    
+    每页评论写入磁盘后记入断点日志，失败页放入死信队列并在结束前重跑（RETRY_FAILED）；
+    上次运行中断时（日志中还有这些景点的记录）不清空历史文件，只爬未完成的页。
+    按响应的评论总数推断出末页后，末页之后的页不再爬取。
+    全部页完成后清空日志，下次运行重新开始。
+    
+    Args:
+        plan: [(景点ID, 最多爬取页数), ...]
+    
+    Returns:
+        (本次各景点成功爬取的页数, 跳过的页数（断点续爬已完成的页和末页之后的页）)
+    """
+    if QUEUE_DB:
+        return crawl_from_queue(plan)
+    state = CrawlState(STATE_DB)
+    try:
+        poi_ids = [poi_id for poi_id, _ in plan]
+        resuming = RESUME and bool(state.pois_in_progress() & set(poi_ids))
+        if not resuming:
+            for poi_id in poi_ids:
+                state.clear_pages(poi_id)
+            truncate_outputs(poi_ids)
+
+        tasks = []
+        skipped = 0
+        for poi_id, pages in plan:
+            done = state.completed_pages(poi_id) if resuming else set()
+            remaining = [
+                page for page in range(1, planned_pages(state, poi_id, pages) + 1)
+                if page not in done
+            ]
+            skipped += len(done)
+            tasks.extend((poi_id, page) for page in remaining)
+        if resuming:
+            logger.info(f'检测到上次中断的爬取，跳过已完成的{skipped}页，剩余{len(tasks)}页',
+                        extra={'pages': len(tasks)})
+
+        with running_sink(poi_ids if resuming else ()):
+            if USE_ASYNC and aiohttp is not None:
+                # 所有景点的页面共用一个工作池和令牌桶
+                logger.info(f'使用异步引擎，限速{RATE_LIMIT}次/秒')
+                successful = asyncio.run(crawl_tasks_async(tasks, state))
+            else:
+                successful = Counter()
+                for poi_id, _ in plan:
+                    pages = [page for task_poi, page in tasks if task_poi == poi_id]
+                    if pages:
+                        successful[poi_id] = crawl_in_batches(pages, poi_id, state)
+
+            if RETRY_FAILED:
+                successful.update(retry_dead_letters(state, poi_ids))
+
+        unfinished = []
+        for poi_id, pages in plan:
+            expected = planned_pages(state, poi_id, pages)
+            skipped += pages - expected
+            if len(state.completed_pages(poi_id) & set(range(1, expected + 1))) < expected:
+                unfinished.append(poi_id)
+        if unfinished:
+            logger.warning(f'{len(unfinished)}个景点仍有未完成的页，重新运行即可断点续爬')
+        else:
+            for poi_id in poi_ids:
+                state.clear_pages(poi_id)
+        return successful, skipped
+    finally:
+        state.close()
+
+def crawl_from_queue(plan):
+    """
+    分布式全量爬取：从共享任务队列（QUEUE_DB）领取 (景点ID, 页码) 任务
+    
+    在多个进程/机器上用相同配置运行即可分担同一批景点：每个进程先把计划加入队列（已有的任务不变），
+    再循环领取QUEUE_BATCH个任务爬取；页落盘后确认完成，失败页放回队列由任意进程重试，
+    推断出的末页对所有进程生效。进程崩溃时它持有的任务在LEASE_SECONDS秒后被其他进程收回。
+    每批任务爬取前先从已有输出读入这些景点的评论ID，已由其他进程（或收回前的持有者）写入的评论不再写入。
+    不清空历史文件，多个进程写同一份输出时宜使用sqlite或parquet存储。
+    
+    Returns:
+        (本进程各景点成功爬取的页数, 队列中跳过的页数（末页之后的页）)
+    """
+    queue = WorkQueue(QUEUE_DB, max_attempts=QUEUE_MAX_ATTEMPTS, retry_delay=QUEUE_RETRY_DELAY)
+    worker = default_worker_id()
+    try:
+        added = queue.enqueue(plan)
+        logger.info(f'任务队列：{QUEUE_DB}，新加入{added}个任务，本进程：{worker}', extra={'worker': worker})
+        task_state = queue.worker_state(worker)
+        with running_sink(), LeaseKeeper(queue, worker, LEASE_SECONDS):
+            if USE_ASYNC and aiohttp is not None:
+                # 整个领取循环在一个事件循环中运行，各批共用连接池、令牌桶和自适应并发控制器
+                successful = asyncio.run(crawl_queue_async(queue, worker, task_state))
+            else:
+                successful = Counter()
+                controller = AdaptiveConcurrency(min(THREAD_NUM, MAX_CONCURRENCY), max_limit=MAX_CONCURRENCY)
+                while True:
+                    tasks = lease_tasks(queue, worker)
+                    if tasks is None:
+                        break
+                    if not tasks:
+                        time.sleep(QUEUE_POLL_INTERVAL)
+                        continue
+                    for poi_id in dict.fromkeys(task_poi for task_poi, _ in tasks):
+                        pages = [page for task_poi, page in tasks if task_poi == poi_id]
+                        successful[poi_id] += batch_crawl(pages, poi_id, task_state, controller=controller)
+
+        counts = queue.counts()
+        logger.info('队列状态：' + '，'.join(f'{status} {count}' for status, count in sorted(counts.items())))
+        for poi_id, page, reason, attempts in queue.failed():
+            logger.warning(f'景点{poi_id}第{page}页：领取{attempts}次仍失败，原因：{reason}',
+                           extra={'poi_id': poi_id, 'page': page})
+        return successful, counts.get('skipped', 0)
+    finally:
+        queue.close()
+
+def lease_tasks(queue, worker):
+    """
+    从队列领取一批任务，并为其中的景点预置去重集合
+    
+    Returns:
+        任务列表；暂时领不到任务（其他进程还持有任务，或失败任务在等待重试）时为空列表；
+        队列中已没有未完成的任务时为None
+    """
+    tasks = queue.lease(worker, QUEUE_BATCH, LEASE_SECONDS)
+    if not tasks:
+        return [] if queue.unfinished(exclude_worker=worker) else None
+    metrics.inc('tasks_leased', len(tasks))
+    seed_seen_comments(dict.fromkeys(poi_id for poi_id, _ in tasks))
+    return tasks
+
+async def crawl_queue_async(queue, worker, task_state):
+    """异步引擎的领取循环：逐批领取并爬取，直到队列中没有未完成的任务"""
+    limiter = TokenBucket(RATE_LIMIT, RATE_BURST)
+    controller = AdaptiveConcurrency(min(THREAD_NUM, MAX_CONCURRENCY), max_limit=MAX_CONCURRENCY)
+    successful = Counter()
+    async with aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=MAX_CONCURRENCY)
+    ) as http:
+        while True:
+            tasks = lease_tasks(queue, worker)
+            if tasks is None:
+                break
+            if not tasks:
+                await asyncio.sleep(QUEUE_POLL_INTERVAL)
+                continue
+            successful.update(await run_tasks_async(http, limiter, controller, tasks, task_state))
+    return successful
+
+# ---------------------- 失败页重试 ----------------------
+def retry_dead_letters(state, poi_ids=None):
+    """
+    以RETRY_CONCURRENCY的较低并发重跑死信队列中的失败页
+    
+    Returns:
+        各景点重跑成功的页数 {景点ID: 页数}
+    """
+    entries = state.dead_letters(poi_ids)
+    if not entries:
+        return Counter()
+    logger.info(f'死信队列中有{len(entries)}个失败页，以并发{RETRY_CONCURRENCY}重跑...', extra={'pages': len(entries)})
+    tasks = [(poi_id, page) for poi_id, page, _, _ in entries]
+
+    if USE_ASYNC and aiohttp is not None:
+        successful = asyncio.run(crawl_tasks_async(tasks, state, concurrency=RETRY_CONCURRENCY))
+    else:
+        successful = Counter()
+        for poi_id in sorted({poi_id for poi_id, _ in tasks}):
+            pages = [page for task_poi, page in tasks if task_poi == poi_id]
+            successful[poi_id] += batch_crawl(pages, poi_id, state, max_workers=RETRY_CONCURRENCY)
+
+    remaining = state.dead_letters(poi_ids)
+    logger.info(f'重跑完成：恢复{len(entries) - len(remaining)}页，仍失败{len(remaining)}页',
+                extra={'pages': len(remaining)})
+    return successful
+
+def retry_failed_pages():
+    """只重跑死信队列（不做新的爬取），用于补齐之前运行中失败的页"""
+    state = CrawlState(STATE_DB)
+    try:
+        entries = state.dead_letters()
+        for poi_id, page, reason, attempts in entries:
+            print(f'景点{poi_id}第{page}页：已失败{attempts}次，原因：{reason}')
+        # 补齐的页写入已有输出之后，先读入这些景点已有的评论ID去重
+        with running_sink(sorted({poi_id for poi_id, _, _, _ in entries})):
+            retry_dead_letters(state)
+    finally:
+        state.close()
+
+# ---------------------- 主函数 ----------------------
+def print_outputs():
+    """打印评论的输出位置"""
+    if STORAGE_BACKEND == 'sqlite':
+        print(f'评论数据库：{SQLITE_DB}')
+    elif STORAGE_BACKEND == 'parquet':
+        print(f'评论数据集：{PARQUET_DIR}')
+    else:
+        print(f'单个景点评论文件：{SINGLE_CSV}')
+        print(f'汇总评论文件：{TOTAL_CSV}')
+        if IMAGE_TABLE:
+            print(f'评论图片表：{IMAGE_CSV}')
+    if METRICS_FILE:
+        print(f'爬取指标快照：{METRICS_FILE}')
+    if ARCHIVE_DIR:
+        print(f'原始响应归档：{ARCHIVE_DIR}')
+
+def main():
+    """爬取单个景点（POI_ID）的评论"""
+    if INCREMENTAL:
+        print(f'开始增量爬取景点ID：{POI_ID}，最多{TOTAL_PAGES}页评论')
+        start_time = time.time()
+        new_comments = crawl_incremental([(POI_ID, TOTAL_PAGES)])[POI_ID]
+        print(f'增量爬取完成！新增{new_comments}条评论，总耗时：{time.time() - start_time:.2f}秒')
+        print_outputs()
+        return
+
+    print(f'开始爬取景点ID：{POI_ID}，共{TOTAL_PAGES}页评论')
+    start_time = time.time()
+
+    successful, skipped = crawl_full([(POI_ID, TOTAL_PAGES)])
+    total_successful = successful[POI_ID]
 
     end_time = time.time()
     total_time = end_time - start_time
     print(f'爬取完成！成功爬取{total_successful}页，总耗时：{total_time:.2f}秒')
-    print(f'成功率：{total_successful/TOTAL_PAGES*100:.2f}%')
-    print(f'单个景点评论文件：{SINGLE_CSV}')
-    print(f'汇总评论文件：{TOTAL_CSV}')
+    if TOTAL_PAGES > skipped:
+        print(f'成功率：{total_successful/(TOTAL_PAGES - skipped)*100:.2f}%')
+    print_outputs()
 
 if __name__ == '__main__':
-    API_URL = 'https://m.ctrip.com/restapi/soa2/13444/json/getCommentCollapseList'
-    
     # 忽略SSL警告
     import urllib3
     urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
@@ -323,4 +1511,14 @@ if __name__ == '__main__':
         print('请先安装依赖：pip install requests')
         exit()
     
-    main()
\ No newline at end of file
+    setup_logging(LOG_LEVEL, LOG_FORMAT)
+    if USE_ASYNC and aiohttp is None:
+        print('未安装aiohttp，使用线程池引擎（pip install aiohttp 可启用异步引擎）')
+    
+    with MetricsReporter(metrics, METRICS_FILE, METRICS_INTERVAL, METRICS_PORT):
+        if RETRY_DEAD_LETTERS:
+            retry_failed_pages()
+        elif CRAWL_ALL_ATTRACTIONS:
+            crawl_all_attractions()
+        else:
+            main()
\ No newline at end of file
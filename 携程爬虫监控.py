@@ -0,0 +1,317 @@
+"""
+爬虫运行监控：指标收集、快照输出和结构化日志
+
+- CrawlMetrics：按接口记录请求耗时直方图和状态码计数，以及重试次数、退避时长、
+  写入行数（行/秒）、队列深度等，线程安全，两个爬虫共用模块级的 metrics 实例
+- MetricsReporter：后台线程定期把指标快照写成JSON文件，可选在本机端口提供
+  Prometheus文本格式（/metrics）和JSON（/metrics.json）
+- RateLimiter：线程安全的请求限速器，景点爬虫和评论图片下载共用
+- setup_logging：按级别输出日志，text格式只打印消息，json格式每行一个JSON对象，
+  extra传入的字段（景点ID、页码、状态码等）作为独立的键
+"""
+import bisect
+import datetime
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+# 请求耗时直方图的桶上界（秒）
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+METRIC_PREFIX = 'ctrip_crawler'
+
+
+class Histogram:
+    """固定桶直方图，分位数按桶内线性插值估计"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # 最后一个桶为 +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for i, count in enumerate(self.counts):
+            if cumulative + count >= rank and count:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                if i == len(self.buckets):  # 落在 +Inf 桶，只能给出最后一个上界
+                    return lower
+                return lower + (self.buckets[i] - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-1]
+
+    def summary(self) -> Dict:
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(list(self.buckets) + ['+Inf'], self.counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 6),
+            'mean': round(self.sum / self.count, 6) if self.count else 0.0,
+            'p50': round(self.quantile(0.5), 6),
+            'p90': round(self.quantile(0.9), 6),
+            'p99': round(self.quantile(0.99), 6),
+            'buckets': buckets,
+        }
+
+
+class CrawlMetrics:
+    """
+    爬取指标
+
+    计数器（只增）：retries、backoff_seconds、rows、pages_ok、pages_empty、pages_failed、pages_skipped等
+    仪表（当前值）：queue_depth、in_flight、concurrency_limit、sink_backlog（写入队列中等待落盘的批次数）
+    请求：按 (接口, 状态) 计数，按接口记录耗时直方图；状态为HTTP状态码或error（网络错误）
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """清空所有指标，开始新一次爬取时调用"""
+        with self._lock:
+            self.started = time.time()
+            self.counters = Counter()
+            self.gauges = {}
+            self.statuses = Counter()  # (接口, 状态) -> 次数
+            self.latency = {}  # 接口 -> Histogram
+
+    def observe_request(self, endpoint: str, status, seconds: float):
+        """记录一次请求（含重试中的每一次）的状态和耗时"""
+        with self._lock:
+            self.statuses[(endpoint, str(status))] += 1
+            histogram = self.latency.get(endpoint)
+            if histogram is None:
+                histogram = self.latency[endpoint] = Histogram()
+            histogram.observe(seconds)
+
+    def inc(self, name: str, value: float = 1):
+        with self._lock:
+            self.counters[name] += value
+
+    def set_gauge(self, name: str, value: float):
+        with self._lock:
+            self.gauges[name] = value
+
+    def snapshot(self) -> Dict:
+        """当前指标的可JSON序列化快照"""
+        with self._lock:
+            uptime = time.time() - self.started
+            statuses = {}
+            for (endpoint, status), count in sorted(self.statuses.items()):
+                statuses.setdefault(endpoint, {})[status] = count
+            return {
+                'time': datetime.datetime.now().isoformat(timespec='seconds'),
+                'started_at': datetime.datetime.fromtimestamp(self.started).isoformat(timespec='seconds'),
+                'uptime_seconds': round(uptime, 3),
+                'rows_per_second': round(self.counters['rows'] / uptime, 3) if uptime > 0 else 0.0,
+                'counters': dict(self.counters),
+                'gauges': dict(self.gauges),
+                'requests': statuses,
+                'latency_seconds': {endpoint: h.summary() for endpoint, h in self.latency.items()},
+            }
+
+    def to_prometheus(self) -> str:
+        """Prometheus文本格式"""
+        snapshot = self.snapshot()
+        lines = [
+            f'# TYPE {METRIC_PREFIX}_requests_total counter',
+        ]
+        for endpoint, statuses in snapshot['requests'].items():
+            for status, count in statuses.items():
+                lines.append(f'{METRIC_PREFIX}_requests_total{{endpoint="{endpoint}",status="{status}"}} {count}')
+        lines.append(f'# TYPE {METRIC_PREFIX}_request_seconds histogram')
+        for endpoint, summary in snapshot['latency_seconds'].items():
+            for bound, count in summary['buckets'].items():
+                lines.append(f'{METRIC_PREFIX}_request_seconds_bucket{{endpoint="{endpoint}",le="{bound}"}} {count}')
+            lines.append(f'{METRIC_PREFIX}_request_seconds_sum{{endpoint="{endpoint}"}} {summary["sum"]}')
+            lines.append(f'{METRIC_PREFIX}_request_seconds_count{{endpoint="{endpoint}"}} {summary["count"]}')
+        for name, value in sorted(snapshot['counters'].items()):
+            lines.append(f'# TYPE {METRIC_PREFIX}_{name}_total counter')
+            lines.append(f'{METRIC_PREFIX}_{name}_total {value}')
+        for name, value in sorted(snapshot['gauges'].items()):
+            lines.append(f'# TYPE {METRIC_PREFIX}_{name} gauge')
+            lines.append(f'{METRIC_PREFIX}_{name} {value}')
+        lines.append(f'# TYPE {METRIC_PREFIX}_rows_per_second gauge')
+        lines.append(f'{METRIC_PREFIX}_rows_per_second {snapshot["rows_per_second"]}')
+        lines.append(f'# TYPE {METRIC_PREFIX}_uptime_seconds gauge')
+        lines.append(f'{METRIC_PREFIX}_uptime_seconds {snapshot["uptime_seconds"]}')
+        return '\n'.join(lines) + '\n'
+
+    def write_snapshot(self, path: str):
+        """写入JSON快照（先写临时文件再替换，读取方不会读到半个文件）"""
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+
+metrics = CrawlMetrics()
+
+
+class RateLimiter:
+    """线程安全的限速器：相邻两次请求的发出时间至少间隔1/rate秒，rate为None或0时不限速"""
+
+    def __init__(self, rate: Optional[float] = None):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.next_time = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            wait_seconds = self.next_time - now
+            self.next_time = max(now, self.next_time) + self.interval
+        if wait_seconds > 0:
+            time.sleep(wait_seconds)
+
+
+class MetricsReporter:
+    """
+    指标输出
+
+    snapshot_path不为None时每interval秒写一次JSON快照，停止时再写一次；
+    port不为None时在host:port提供 /metrics（Prometheus文本）和 /metrics.json，
+    port为0时随机分配端口（见 self.port）
+    """
+
+    def __init__(self, crawl_metrics: CrawlMetrics = metrics, snapshot_path: Optional[str] = None,
+                 interval: float = 5.0, port: Optional[int] = None, host: str = '127.0.0.1'):
+        self.metrics = crawl_metrics
+        self.snapshot_path = snapshot_path
+        self.interval = interval
+        self.port = port
+        self.host = host
+        self.httpd = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.snapshot_path:
+            self._thread = threading.Thread(target=self._run, name='metrics-snapshot', daemon=True)
+            self._thread.start()
+        if self.port is not None:
+            self.httpd = ThreadingHTTPServer((self.host, self.port), self._handler_class())
+            self.httpd.daemon_threads = True
+            self.port = self.httpd.server_address[1]
+            threading.Thread(target=self.httpd.serve_forever, name='metrics-http', daemon=True).start()
+            logging.getLogger('携程爬虫.监控').info(
+                f'指标地址：http://{self.host}:{self.port}/metrics', extra={'port': self.port}
+            )
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self.httpd is not None:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _run(self):
+        while True:
+            stopping = self._stop.wait(self.interval)
+            try:
+                self.metrics.write_snapshot(self.snapshot_path)
+            except OSError as e:
+                logging.getLogger('携程爬虫.监控').warning(f'写入指标快照失败：{e}')
+            if stopping:
+                return
+
+    def _handler_class(self):
+        reporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                path = self.path.split('?', 1)[0]
+                if path == '/metrics':
+                    body = reporter.metrics.to_prometheus().encode('utf-8')
+                    content_type = 'text/plain; version=0.0.4; charset=utf-8'
+                elif path == '/metrics.json':
+                    body = json.dumps(reporter.metrics.snapshot(), ensure_ascii=False).encode('utf-8')
+                    content_type = 'application/json; charset=utf-8'
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+
+# ---------------------- 结构化日志 ----------------------
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+def log_fields(record: logging.LogRecord) -> Dict:
+    """日志记录中通过extra传入的字段"""
+    return {key: value for key, value in vars(record).items() if key not in _RECORD_ATTRS}
+
+
+class JsonFormatter(logging.Formatter):
+    """每条日志输出一行JSON：时间、级别、记录器、消息和extra字段"""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        entry.update(log_fields(record))
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def setup_logging(level: str = 'INFO', fmt: str = 'text'):
+    """
+    配置爬虫日志（记录器 携程爬虫.*）输出到标准输出
+
+    Args:
+        level: DEBUG / INFO / WARNING / ERROR
+        fmt: 'text' 输出时间、级别和消息；'json' 每行一个JSON对象
+    """
+    if fmt not in ('text', 'json'):
+        raise ValueError(f"未知的日志格式: {fmt}")
+    handler = logging.StreamHandler(sys.stdout)
+    if fmt == 'json':
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(message)s', '%H:%M:%S'))
+    logger = logging.getLogger('携程爬虫')
+    logger.handlers[:] = [handler]
+    logger.setLevel(level)
+    logger.propagate = False
+    return logger
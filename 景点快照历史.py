@@ -0,0 +1,240 @@
+"""
+景点快照历史（SQLite，差量存储）
+
+每次景点爬取记为一个带时间戳的快照，只保存与该景点上一次取值不同的字段（热度分、评论数量、
+评分、门票价格），没有变化的景点不占空间。按需还原任意景点在各快照时刻的取值，
+用于热度、评论增长等趋势分析。
+
+用法：
+    store = SnapshotStore('景点快照.db')
+    store.record(attractions)                   # 爬取结束后记录一次快照
+    store.series(poi_id, '评论数量')              # [(时间, 值), ...]，只含发生变化的时刻
+    store.to_frame(fields=['热度分'])             # 各快照时刻的宽表（需安装pandas），可直接画趋势图
+    store.growth('评论数量', since='2025-01-01')  # 各景点在时间段内的增量
+"""
+import datetime
+import sqlite3
+from threading import Lock
+from typing import Dict, Iterable, List, Optional
+
+TRACKED_FIELDS = ('热度分', '评论数量', '评分', '门票价格')
+
+
+def to_number(value):
+    """快照中的取值统一为数值，空值或无法解析时为None"""
+    if value is None or value == '':
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class SnapshotStore:
+    """
+    景点快照的差量存储
+
+    - snapshots: 每次爬取一行（快照ID、时间、景点数、变化的字段数）
+    - changes:   (景点ID, 字段, 快照ID) -> 新值，只记录相对上一次取值有变化的字段
+    - latest:    每个景点各字段的当前取值，用于写入时比较，不必回放历史
+    字段名以整数编号存储（fields表），changes表不带rowid，每条变化只占十几个字节
+    """
+
+    def __init__(self, db_path: str = '景点快照.db', fields=TRACKED_FIELDS):
+        self.db_path = db_path
+        self.fields = tuple(fields)
+        self._lock = Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS snapshots (
+                snapshot_id INTEGER PRIMARY KEY,
+                taken_at TEXT NOT NULL,
+                attractions INTEGER NOT NULL,
+                changes INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS fields (
+                field_id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL UNIQUE
+            );
+            CREATE TABLE IF NOT EXISTS changes (
+                poi_id INTEGER NOT NULL,
+                field_id INTEGER NOT NULL,
+                snapshot_id INTEGER NOT NULL,
+                value REAL,
+                PRIMARY KEY (poi_id, field_id, snapshot_id)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS latest (
+                poi_id INTEGER NOT NULL,
+                field_id INTEGER NOT NULL,
+                value REAL,
+                PRIMARY KEY (poi_id, field_id)
+            ) WITHOUT ROWID;
+        ''')
+        for name in self.fields:
+            self.conn.execute('INSERT OR IGNORE INTO fields (name) VALUES (?)', (name,))
+        self.conn.commit()
+        self.field_ids = dict(self.conn.execute('SELECT name, field_id FROM fields'))
+
+    def record(self, attractions: Iterable[Dict], taken_at: Optional[str] = None):
+        """
+        记录一次快照
+
+        Args:
+            attractions: 景点数据（extract_attraction_data的输出），同一景点出现多次时以最后一次为准
+            taken_at: 快照时间，默认为当前时间
+
+        Returns:
+            (快照ID, 变化的字段数)
+        """
+        taken_at = taken_at or datetime.datetime.now().isoformat(sep=' ', timespec='seconds')
+        current = {}
+        for row in attractions:
+            try:
+                poi_id = int(row.get('景点ID'))
+            except (TypeError, ValueError):
+                continue
+            current[poi_id] = tuple(to_number(row.get(name)) for name in self.fields)
+
+        with self._lock:
+            previous = {}
+            for poi_id, field_id, value in self.conn.execute('SELECT poi_id, field_id, value FROM latest'):
+                previous[(poi_id, field_id)] = value
+            changed = []
+            for poi_id, values in current.items():
+                for name, value in zip(self.fields, values):
+                    key = (poi_id, self.field_ids[name])
+                    # 第一次出现的景点记录全部字段，之后只记录变化的字段
+                    if key not in previous or previous[key] != value:
+                        changed.append((poi_id, key[1], value))
+
+            cursor = self.conn.execute(
+                'INSERT INTO snapshots (taken_at, attractions, changes) VALUES (?, ?, ?)',
+                (taken_at, len(current), len(changed))
+            )
+            snapshot_id = cursor.lastrowid
+            self.conn.executemany(
+                'INSERT INTO changes (poi_id, field_id, snapshot_id, value) VALUES (?, ?, ?, ?)',
+                [(poi_id, field_id, snapshot_id, value) for poi_id, field_id, value in changed]
+            )
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO latest (poi_id, field_id, value) VALUES (?, ?, ?)', changed
+            )
+            self.conn.commit()
+        return snapshot_id, len(changed)
+
+    def snapshots(self) -> List[tuple]:
+        """全部快照 [(快照ID, 时间, 景点数, 变化的字段数), ...]"""
+        with self._lock:
+            return self.conn.execute(
+                'SELECT snapshot_id, taken_at, attractions, changes FROM snapshots ORDER BY snapshot_id'
+            ).fetchall()
+
+    def series(self, poi_id, field: str = '评论数量', since: Optional[str] = None,
+               until: Optional[str] = None) -> List[tuple]:
+        """
+        单个景点单个字段的变化序列
+
+        Returns:
+            [(快照时间, 值), ...]，只含取值发生变化的快照；指定since时第一项为since时刻的取值
+        """
+        field_id = self.field_ids[field]
+        with self._lock:
+            rows = self.conn.execute(
+                '''SELECT s.taken_at, c.value FROM changes c JOIN snapshots s USING (snapshot_id)
+                   WHERE c.poi_id = ? AND c.field_id = ? AND s.taken_at <= ?
+                   ORDER BY c.snapshot_id''',
+                (int(poi_id), field_id, until or '9999')
+            ).fetchall()
+        if since is None:
+            return rows
+        # since之前的最后一次取值就是since时刻的取值
+        before = [row for row in rows if row[0] < since]
+        after = [row for row in rows if row[0] >= since]
+        if before:
+            after.insert(0, (since, before[-1][1]))
+        return after
+
+    def values_at(self, taken_at: str, fields: Optional[List[str]] = None) -> Dict[int, Dict]:
+        """各景点在某一时刻的取值 {景点ID: {字段: 值}}（还原该时刻及之前最后一次变化）"""
+        fields = list(fields or self.fields)
+        ids = {self.field_ids[name]: name for name in fields}
+        result = {}
+        with self._lock:
+            rows = self.conn.execute(
+                '''SELECT c.poi_id, c.field_id, c.value FROM changes c JOIN snapshots s USING (snapshot_id)
+                   WHERE s.taken_at <= ? ORDER BY c.snapshot_id''',
+                (taken_at,)
+            ).fetchall()
+        for poi_id, field_id, value in rows:
+            if field_id in ids:
+                result.setdefault(poi_id, {})[ids[field_id]] = value
+        return result
+
+    def growth(self, field: str = '评论数量', since: Optional[str] = None,
+               until: Optional[str] = None) -> List[tuple]:
+        """
+        各景点某字段在时间段内的增量，按增量从大到小排列
+
+        Returns:
+            [(景点ID, 起始值, 结束值, 增量), ...]，起止任一端没有取值的景点不列出
+        """
+        end = self.values_at(until or '9999', [field])
+        start = self.values_at(since, [field]) if since else {}
+        if not since:
+            # 未指定起点时以每个景点第一次出现的取值为起点
+            field_id = self.field_ids[field]
+            with self._lock:
+                rows = self.conn.execute(
+                    '''SELECT poi_id, value FROM changes WHERE field_id = ?
+                       ORDER BY snapshot_id DESC''',
+                    (field_id,)
+                ).fetchall()
+            start = {poi_id: {field: value} for poi_id, value in rows}
+        result = []
+        for poi_id, values in end.items():
+            first = start.get(poi_id, {}).get(field)
+            last = values.get(field)
+            if first is not None and last is not None:
+                result.append((poi_id, first, last, last - first))
+        return sorted(result, key=lambda x: x[3], reverse=True)
+
+    def to_frame(self, poi_ids: Optional[List] = None, fields: Optional[List[str]] = None):
+        """
+        还原为宽表DataFrame：每个 (快照时间, 景点ID) 一行，各字段一列，未变化的快照沿用上一次的取值
+
+        只包含景点第一次出现之后的快照，可直接按景点分组画趋势图
+        """
+        import pandas as pd
+
+        fields = list(fields or self.fields)
+        ids = {self.field_ids[name]: name for name in fields}
+        query = 'SELECT snapshot_id, poi_id, field_id, value FROM changes'
+        params = []
+        if poi_ids:
+            query += f' WHERE poi_id IN ({", ".join("?" for _ in poi_ids)})'
+            params = [int(poi_id) for poi_id in poi_ids]
+        with self._lock:
+            rows = self.conn.execute(query, params).fetchall()
+            times = dict(self.conn.execute('SELECT snapshot_id, taken_at FROM snapshots'))
+
+        changes = pd.DataFrame(
+            [row for row in rows if row[2] in ids], columns=['snapshot_id', '景点ID', 'field_id', 'value']
+        )
+        if changes.empty:
+            return pd.DataFrame(columns=['快照时间', '景点ID'] + fields)
+        changes['字段'] = changes['field_id'].map(ids)
+        wide = changes.set_index(['景点ID', 'snapshot_id', '字段'])['value'].unstack('字段')
+        snapshot_ids = sorted(times)
+        frames = []
+        for poi_id, group in wide.groupby(level=0):
+            group = group.droplevel(0)
+            group = group.reindex([i for i in snapshot_ids if i >= group.index.min()]).ffill()
+            group.insert(0, '景点ID', poi_id)
+            frames.append(group)
+        frame = pd.concat(frames).reset_index()
+        frame.columns.name = None
+        frame.insert(0, '快照时间', pd.to_datetime(frame.pop('snapshot_id').map(times)))
+        return frame[['快照时间', '景点ID'] + [name for name in fields if name in frame.columns]]
+
+    def close(self):
+        self.conn.close()
@@ -1,17 +1,549 @@
+"""
+评论清洗：按评论内容去重，保留每条内容第一次出现的评论（与 drop_duplicates(keep="first") 一致）
+
+流式处理：按块读取CSV，每条评论内容只保存一个64位哈希，留下的评论逐块追加写出，
+内存占用取决于不重复的评论数而不是文件大小。
+不重复的评论数多到哈希集合也放不进内存时用 --external：先把 (哈希, 行号) 按哈希分桶写到临时文件，
+再逐桶找出重复行，最后重读一遍输入写出留下的行，内存只需容纳一个桶。
+
+近似去重（--near-dup）：只差标点、表情或几个字的复制粘贴/模板评论，按字符shingle计算MinHash签名，
+LSH分段找出候选对（不必两两比较），签名相似度达到阈值的评论归为一组，输出列"近似重复组"
+（组号从1开始，不属于任何组的评论为空）；--drop-near-dup 时每组只保留第一条。
+签名计算在进程池中进行，签名占用 评论数×NUM_PERM×4 字节内存。
+
+合并多个文件：--input 为目录（读取其中的 *_评论.csv，即评论爬虫每个景点一个的文件）或通配符时，
+各文件在进程池中并行解析和规整（统一为评论爬虫的列、按文件名补齐景点ID），按文件名顺序合并去重，
+输出为CSV或parquet（--format，默认按输出文件扩展名）。
+
+用法：python 清洗评论源代码.py --input 全部评论.csv --output 全部评论清洗后.csv
+      python 清洗评论源代码.py --input 评论目录 --output 全部评论清洗后.parquet --workers 8
+      python 清洗评论源代码.py --input "评论目录/1040*_评论.csv" --output 成都评论.csv
+      python 清洗评论源代码.py --input 全部评论.csv --external --tmp-dir D:/tmp
+      python 清洗评论源代码.py --input 全部评论.csv --near-dup --threshold 0.8 --workers 8
+"""
+import argparse
+import glob
+import os
+import pickle
+import re
+import shutil
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 import pandas as pd
 
 # 修正路径中的斜杠（用正斜杠/）
-file_path = "C:/Users/23218/Desktop/携程/全部评论(1).csv"
-comment_column = "评论内容"
-save_path = "C:/Users/23218/Desktop/携程/全部评论清洗后.csv"
+FILE_PATH = "C:/Users/23218/Desktop/携程/全部评论(1).csv"
+COMMENT_COLUMN = "评论内容"
+SAVE_PATH = "C:/Users/23218/Desktop/携程/全部评论清洗后.csv"
+
+REVIEW_FILE_PATTERN = "*_评论.csv"  # --input为目录时读取的文件（评论爬虫每个景点一个文件）
+# 合并多个文件时统一的列，与评论爬虫的CSV_HEADERS一致
+REVIEW_COLUMNS = [
+    "评论ID", "用户ID", "用户名", "用户等级", "用户头像", "评论内容",
+    "发布时间", "发布地点", "总评分", "景色评分", "趣味评分", "性价比评分",
+    "点赞数", "回复数", "图片数量", "图片链接", "是否精选", "发布类型", "景点ID"
+]
+
+CHUNK_ROWS = 200_000  # 每次读入的行数
+EXTERNAL_BUCKETS = 64  # 外部去重的分桶数，每个桶约占 不重复行数×16/桶数 字节内存
+
+NEAR_DUP_COLUMN = "近似重复组"  # 近似去重输出的组号列
+NEAR_DUP_THRESHOLD = 0.8  # 估计的Jaccard相似度达到该值视为近似重复
+SHINGLE_SIZE = 3  # 字符shingle的长度
+NUM_PERM = 64  # MinHash签名长度（哈希函数个数），越大越准，内存和耗时也越多
+MINHASH_SEED = 1  # 哈希函数的随机种子，同一种子的签名才能相互比较
+SIGNATURE_BATCH = 5000  # 每个进程任务处理的评论数
+
+
+def read_chunks(path, chunk_rows=CHUNK_ROWS, columns=None, fmt=None):
+    """按块读取评论CSV或parquet文件（fmt同output_format），所有列按字符串读入，写出时保持原样"""
+    if output_format(path, fmt) == "parquet":
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows, columns=columns):
+            yield batch.to_pandas()
+        return
+    yield from pd.read_csv(path, dtype=str, encoding="utf-8-sig", chunksize=chunk_rows, usecols=columns)
+
+
+def source_files(source) -> list:
+    """--input 对应的文件：单个文件、目录（其中的 *_评论.csv）或通配符，按文件名排序"""
+    if os.path.isdir(source):
+        files = sorted(glob.glob(os.path.join(source, REVIEW_FILE_PATTERN)))
+    elif glob.has_magic(source):
+        files = sorted(glob.glob(source))
+    else:
+        files = [source]
+    if not files:
+        raise FileNotFoundError(f"没有找到评论文件：{source}")
+    return files
+
+
+def load_review_file(path, spill_path, chunk_rows=CHUNK_ROWS) -> int:
+    """
+    按块读取并规整一个景点的评论文件（进程池任务）
+
+    列统一为REVIEW_COLUMNS（缺少的列为空，多余的列丢弃），景点ID为空时按文件名 {景点ID}_评论.csv 补齐，
+    去掉整行为空的行。规整后的块逐个pickle写入spill_path，由主进程按块读回（见read_spill），
+    进程间只传文件路径，两边的内存占用都不超过一块
+
+    Returns:
+        规整后的行数
+    """
+    match = re.match(r"(\d+)_", os.path.basename(path))
+    rows = 0
+    with open(spill_path, "wb") as f:
+        for df in read_chunks(path, chunk_rows):
+            df.columns = df.columns.str.strip()
+            df = df.reindex(columns=REVIEW_COLUMNS)
+            if match:
+                df["景点ID"] = df["景点ID"].fillna(match.group(1))
+            df = df.dropna(how="all", subset=[column for column in REVIEW_COLUMNS if column != "景点ID"])
+            pickle.dump(df, f, protocol=pickle.HIGHEST_PROTOCOL)
+            rows += len(df)
+    return rows
+
+
+def read_spill(path):
+    """按写入顺序逐块读回load_review_file写出的块"""
+    with open(path, "rb") as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+
+def iter_frames(source, chunk_rows=CHUNK_ROWS, workers=None, tmp_dir=None):
+    """
+    按顺序逐块产出输入数据
+
+    --input 为单个文件时按块流式读取，保持原样；目录或通配符（即使只匹配到一个文件）在进程池中并行读取和规整，
+    各文件的块暂存在tmp_dir下的临时文件中，按文件名顺序逐块产出，同时在解析中的文件不超过进程数的两倍
+    """
+    if os.path.isfile(source):
+        yield from read_chunks(source, chunk_rows)
+        return
+    files = source_files(source)
+    workers = workers or os.cpu_count() or 1
+    with tempfile.TemporaryDirectory(prefix="评论合并_", dir=tmp_dir) as spill_dir, \
+            ProcessPoolExecutor(max_workers=workers) as executor:
+
+        def submit(index, path):
+            spill_path = os.path.join(spill_dir, f"{index}.pkl")
+            return spill_path, executor.submit(load_review_file, path, spill_path, chunk_rows)
+
+        remaining = enumerate(files)
+        pending = deque(submit(index, path) for _, (index, path) in zip(range(workers * 2), remaining))
+        while pending:
+            spill_path, future = pending.popleft()
+            future.result()
+            following = next(remaining, None)
+            if following is not None:
+                pending.append(submit(*following))
+            yield from read_spill(spill_path)
+            os.remove(spill_path)
+
+
+def output_format(path, fmt=None) -> str:
+    """输出格式：显式指定的fmt，否则按扩展名（.parquet为parquet，其余为csv）"""
+    return fmt or ("parquet" if path.endswith(".parquet") else "csv")
+
+
+def content_hashes(chunk, column=COMMENT_COLUMN) -> np.ndarray:
+    """评论内容的64位哈希（向量化），空内容彼此相同（与drop_duplicates对NaN的处理一致）"""
+    return pd.util.hash_pandas_object(chunk[column], index=False).to_numpy()
+
+
+class ChunkWriter:
+    """逐块追加写出CSV，第一块写表头和BOM"""
+
+    def __init__(self, path):
+        self.path = path
+        self.rows = 0
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def write(self, chunk):
+        first = self.rows == 0
+        chunk.to_csv(self.path, index=False, header=first, mode="w" if first else "a",
+                     encoding="utf-8-sig" if first else "utf-8")
+        self.rows += len(chunk)
+
+    def finish(self, columns):
+        if self.rows == 0:
+            # 没有留下任何行时也写出表头
+            pd.DataFrame(columns=columns).to_csv(self.path, index=False, encoding="utf-8-sig")
+
+
+class ParquetChunkWriter:
+    """逐块写出parquet文件的行组（需安装pyarrow），接口与ChunkWriter相同"""
+
+    def __init__(self, path):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        self.pa, self.pq = pa, pq
+        self.path = path
+        self.rows = 0
+        self.writer = None
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def _schema(self, chunk):
+        # 全为空的列推断不出类型，按字符串处理，避免之后的块类型不一致
+        schema = self.pa.Schema.from_pandas(chunk, preserve_index=False)
+        return self.pa.schema([field.with_type(self.pa.string()) if field.type == self.pa.null() else field
+                               for field in schema])
+
+    def write(self, chunk):
+        if self.writer is None:
+            self.writer = self.pq.ParquetWriter(self.path, self._schema(chunk), compression="zstd")
+        self.writer.write_table(self.pa.Table.from_pandas(chunk, schema=self.writer.schema,
+                                                          preserve_index=False))
+        self.rows += len(chunk)
+
+    def finish(self, columns):
+        if self.writer is None:
+            self.writer = self.pq.ParquetWriter(
+                self.path, self.pa.schema([(str(column), self.pa.string()) for column in columns])
+            )
+        self.writer.close()
+
+
+def open_writer(path, fmt=None):
+    return ParquetChunkWriter(path) if output_format(path, fmt) == "parquet" else ChunkWriter(path)
+
+
+def dedupe_stream(source, output_path, column=COMMENT_COLUMN, chunk_rows=CHUNK_ROWS, workers=None, fmt=None):
+    """
+    内存中保存已出现内容的哈希集合，单遍流式去重
+
+    Args:
+        source: 评论文件、目录或通配符（见 source_files），多个文件时合并后去重
+        fmt: 输出格式 'csv' 或 'parquet'，None时按output_path的扩展名
+
+    Returns:
+        (原数据条数, 去重后条数)
+    """
+    seen = set()
+    writer = open_writer(output_path, fmt)
+    total = 0
+    columns = None
+    for chunk in iter_frames(source, chunk_rows, workers):
+        columns = chunk.columns
+        total += len(chunk)
+        hashes = content_hashes(chunk, column)
+        # 块内只保留第一次出现的内容，再去掉之前的块中已出现过的
+        keep = ~pd.Series(hashes).duplicated().to_numpy()
+        for i in np.flatnonzero(keep):
+            h = int(hashes[i])
+            if h in seen:
+                keep[i] = False
+            else:
+                seen.add(h)
+        writer.write(chunk[keep])
+    writer.finish(columns if columns is not None else [])
+    return total, writer.rows
+
+
+def dedupe_external(source, output_path, column=COMMENT_COLUMN, chunk_rows=CHUNK_ROWS,
+                    buckets=EXTERNAL_BUCKETS, tmp_dir=None, workers=None, fmt=None):
+    """
+    基于磁盘的去重，内存只需容纳一个桶，适用于不重复的评论多到哈希集合放不进内存的情况（参数同dedupe_stream）
+
+    1. 读一遍输入，(哈希, 行号) 按哈希分桶追加到临时文件，同一桶内行号递增
+    2. 逐桶排序，同一哈希只保留行号最小的一行，其余行在磁盘上的标记数组中记为重复
+    3. 再读一遍输入，按标记写出留下的行
+
+    Returns:
+        (原数据条数, 去重后条数)
+    """
+    work_dir = tempfile.mkdtemp(prefix="评论去重_", dir=tmp_dir)
+    try:
+        bucket_paths = [os.path.join(work_dir, f"{i}.bin") for i in range(buckets)]
+        bucket_files = [open(path, "wb") for path in bucket_paths]
+        pair = np.dtype([("hash", "<u8"), ("row", "<u8")])
+        total = 0
+        try:
+            for chunk in iter_frames(source, chunk_rows, workers, tmp_dir):
+                hashes = content_hashes(chunk, column)
+                pairs = np.empty(len(chunk), dtype=pair)
+                pairs["hash"] = hashes
+                pairs["row"] = np.arange(total, total + len(chunk), dtype=np.uint64)
+                bucket_of = (hashes % np.uint64(buckets)).astype(np.int64)
+                for i in np.unique(bucket_of):
+                    pairs[bucket_of == i].tofile(bucket_files[i])
+                total += len(chunk)
+        finally:
+            for f in bucket_files:
+                f.close()
+
+        # 每行一个字节的重复标记，放在磁盘上，由操作系统按需换入
+        duplicate = np.memmap(os.path.join(work_dir, "duplicate.bin"), dtype=np.uint8, mode="w+",
+                              shape=(max(total, 1),))
+        for path in bucket_paths:
+            pairs = np.fromfile(path, dtype=pair)
+            if len(pairs) == 0:
+                continue
+            # 稳定排序后同一哈希的行按行号递增，每组第一行就是第一次出现的评论
+            pairs = pairs[np.argsort(pairs["hash"], kind="stable")]
+            repeated = np.empty(len(pairs), dtype=bool)
+            repeated[0] = False
+            repeated[1:] = pairs["hash"][1:] == pairs["hash"][:-1]
+            duplicate[pairs["row"][repeated]] = 1
+            os.remove(path)
+        duplicate.flush()
+
+        writer = open_writer(output_path, fmt)
+        offset = 0
+        columns = []
+        for chunk in iter_frames(source, chunk_rows, workers, tmp_dir):
+            columns = chunk.columns
+            writer.write(chunk[duplicate[offset:offset + len(chunk)] == 0])
+            offset += len(chunk)
+        writer.finish(columns)
+        del duplicate
+        return total, writer.rows
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def normalize_text(text) -> str:
+    """去掉标点、空白和表情，英文转小写，只比较文字本身"""
+    if not isinstance(text, str):
+        return ""
+    return re.sub(r"[\W_]+", "", text.lower())
+
+
+def hash_functions(num_perm=NUM_PERM, seed=MINHASH_SEED):
+    """MinHash使用的num_perm个乘法移位哈希 ((a*x + b) mod 2^64) >> 32，a为奇数"""
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 2 ** 63, num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+    b = rng.integers(0, 2 ** 63, num_perm, dtype=np.uint64)
+    return a, b
+
+
+def minhash_signatures(texts, shingle=SHINGLE_SIZE, num_perm=NUM_PERM, seed=MINHASH_SEED):
+    """
+    计算一批评论的MinHash签名（进程池任务，整批向量化计算）
+
+    Returns:
+        (签名 uint32[len(texts), num_perm], 规整后为空的评论标记 bool[len(texts)])
+    """
+    a, b = hash_functions(num_perm, seed)
+    normalized = [normalize_text(text) for text in texts]
+    empty = np.array([not text for text in normalized], dtype=bool)
+    codes = []
+    for text in normalized:
+        # 不足一个shingle的短评论补0，整条评论作为一个shingle
+        points = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+        if len(points) < shingle:
+            points = np.pad(points, (0, shingle - len(points)))
+        codes.append(points)
+    lengths = np.array([len(points) for points in codes], dtype=np.int64)
+    codes = np.concatenate(codes).astype(np.uint64)
+
+    # 所有位置的shingle哈希（多项式滚动哈希，uint64溢出即取模），再去掉跨越两条评论的位置
+    windows = len(codes) - shingle + 1
+    hashes = np.zeros(windows, dtype=np.uint64)
+    for j in range(shingle):
+        hashes = hashes * np.uint64(1_000_003) + codes[j:j + windows]
+    counts = lengths - shingle + 1
+    offsets = np.cumsum(counts) - counts
+    starts = np.cumsum(lengths) - lengths
+    positions = np.repeat(starts - offsets, counts) + np.arange(counts.sum())
+    hashes = hashes[positions]
+    hashes ^= hashes >> np.uint64(31)
+    hashes *= np.uint64(0x9E3779B97F4A7C15)
+
+    signatures = np.empty((len(texts), num_perm), dtype=np.uint32)
+    step = 16  # 每次计算16个哈希函数，限制中间矩阵的大小
+    for p in range(0, num_perm, step):
+        values = (hashes[:, None] * a[None, p:p + step] + b[None, p:p + step]) >> np.uint64(32)
+        signatures[:, p:p + step] = np.minimum.reduceat(values, offsets, axis=0)
+    return signatures, empty
+
+
+def lsh_params(threshold, num_perm=NUM_PERM):
+    """
+    选择LSH的分段数和每段行数（分段数×行数<=num_perm），
+    使相似度低于阈值的误报概率与高于阈值的漏报概率之和最小
+    """
+    grid = np.linspace(0, 1, 1001)
+    below, above = grid <= threshold, grid >= threshold
+    best, best_error = (1, num_perm), float("inf")
+    for bands in range(1, num_perm + 1):
+        rows = num_perm // bands
+        candidate = 1 - (1 - grid ** rows) ** bands  # 相似度为s的两条评论成为候选对的概率
+        error = candidate[below].mean() * threshold + (1 - candidate[above]).mean() * (1 - threshold)
+        if error < best_error:
+            best, best_error = (bands, rows), error
+    return best
+
+
+def lsh_edges(signatures, skip, threshold, bands, rows):
+    """
+    LSH分段：某一段签名完全相同的评论成为候选，与同桶中行号最小的评论比较签名，
+    相似度达到阈值的连一条边
+
+    Returns:
+        (边的起点数组, 边的终点数组)
+    """
+    index = np.flatnonzero(~skip)
+    weights = np.random.default_rng(0).integers(1, 2 ** 63, rows, dtype=np.uint64) | np.uint64(1)
+    sources, targets = [], []
+    for band in range(bands):
+        part = signatures[index, band * rows:(band + 1) * rows].astype(np.uint64)
+        keys = (part * weights).sum(axis=1)  # 段内签名的64位键
+        order = np.argsort(keys, kind="stable")  # 稳定排序：同桶内行号递增，第一条即行号最小
+        sorted_keys = keys[order]
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = sorted_keys[1:] != sorted_keys[:-1]
+        leaders = index[order[np.maximum.accumulate(np.where(first, np.arange(len(order)), 0))]]
+        members = index[order]
+        leaders, members = leaders[~first], members[~first]
+        similarity = (signatures[leaders] == signatures[members]).mean(axis=1)
+        matched = similarity >= threshold
+        sources.append(leaders[matched])
+        targets.append(members[matched])
+    if not sources:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return np.concatenate(sources), np.concatenate(targets)
+
+
+def connected_labels(n, sources, targets) -> np.ndarray:
+    """连通分量：每行的标签为所在分量中最小的行号（向量化的最小标签传播加指针跳跃）"""
+    labels = np.arange(n)
+    while True:
+        lowest = np.minimum(labels[sources], labels[targets])
+        updated = labels.copy()
+        np.minimum.at(updated, sources, lowest)
+        np.minimum.at(updated, targets, lowest)
+        updated = updated[updated]
+        if np.array_equal(updated, labels):
+            return labels
+        labels = updated
+
+
+def near_duplicate_groups(input_path, column=COMMENT_COLUMN, threshold=NEAR_DUP_THRESHOLD,
+                          shingle=SHINGLE_SIZE, num_perm=NUM_PERM, workers=None,
+                          chunk_rows=CHUNK_ROWS, fmt=None) -> np.ndarray:
+    """
+    找出近似重复的评论
+
+    Returns:
+        每行的组号 int64[行数]：同组评论的组号相同，按组内第一条评论的先后从1编号；不属于任何组为0
+    """
+    signatures, empty = [], []
+    workers = workers or os.cpu_count() or 1
+
+    def batches():
+        for chunk in read_chunks(input_path, chunk_rows, columns=[column], fmt=fmt):
+            texts = chunk[column].tolist()
+            for i in range(0, len(texts), SIGNATURE_BATCH):
+                yield texts[i:i + SIGNATURE_BATCH]
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # 在途的批次不超过进程数的两倍，边读边收结果，评论文本不会全部堆在进程池的队列里
+        remaining = batches()
+        pending = deque(executor.submit(minhash_signatures, texts, shingle, num_perm)
+                        for _, texts in zip(range(workers * 2), remaining))
+        while pending:
+            batch_signatures, batch_empty = pending.popleft().result()
+            signatures.append(batch_signatures)
+            empty.append(batch_empty)
+            texts = next(remaining, None)
+            if texts is not None:
+                pending.append(executor.submit(minhash_signatures, texts, shingle, num_perm))
+    if not signatures:
+        return np.zeros(0, dtype=np.int64)
+    signatures = np.concatenate(signatures)
+    empty = np.concatenate(empty)
+
+    bands, rows = lsh_params(threshold, num_perm)
+    sources, targets = lsh_edges(signatures, empty, threshold, bands, rows)
+    labels = connected_labels(len(signatures), sources, targets)
+    in_group = np.zeros(len(labels), dtype=bool)
+    in_group[sources] = True
+    in_group[targets] = True
+    groups = np.zeros(len(labels), dtype=np.int64)
+    # 标签是组内最小的行号，按标签排序编号即按组内第一条评论的先后编号
+    _, numbers = np.unique(labels[in_group], return_inverse=True)
+    groups[in_group] = numbers + 1
+    return groups
+
+
+def mark_near_duplicates(input_path, output_path, groups, drop=False, chunk_rows=CHUNK_ROWS, fmt=None):
+    """
+    写出带"近似重复组"列的数据，drop为True时每组只保留第一条
+
+    Returns:
+        写出的行数
+    """
+    seen = np.zeros(groups.max() + 1 if len(groups) else 1, dtype=bool)
+    writer = open_writer(output_path, fmt)
+    offset = 0
+    columns = []
+    for chunk in read_chunks(input_path, chunk_rows, fmt=fmt):
+        chunk_groups = groups[offset:offset + len(chunk)]
+        offset += len(chunk)
+        chunk[NEAR_DUP_COLUMN] = pd.array(np.where(chunk_groups > 0, chunk_groups, None), dtype="Int64")
+        columns = chunk.columns
+        if drop:
+            # 每组第一次出现的一行：组号第一次出现的位置，且之前的块中没有出现过
+            first = ~pd.Series(chunk_groups).duplicated().to_numpy() & ~seen[chunk_groups]
+            seen[chunk_groups] = True
+            chunk = chunk[(chunk_groups == 0) | first]
+        writer.write(chunk)
+    writer.finish(columns)
+    return writer.rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="按评论内容去重（保留第一次出现的评论），流式处理大文件")
+    parser.add_argument("--input", default=FILE_PATH, help="评论CSV，或目录/通配符（合并多个景点的评论文件）")
+    parser.add_argument("--output", default=SAVE_PATH, help="去重后的文件")
+    parser.add_argument("--format", choices=["csv", "parquet"], default=None,
+                        help="输出格式，默认按输出文件扩展名（.parquet为parquet）")
+    parser.add_argument("--column", default=COMMENT_COLUMN, help="按哪一列去重")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help="每次读入的行数")
+    parser.add_argument("--external", action="store_true", help="基于磁盘去重（不重复的评论多到内存放不下时）")
+    parser.add_argument("--buckets", type=int, default=EXTERNAL_BUCKETS, help="外部去重的分桶数")
+    parser.add_argument("--tmp-dir", default=None, help="外部去重的临时目录，默认为系统临时目录")
+    parser.add_argument("--near-dup", action="store_true", help="精确去重后再找出近似重复的评论，输出组号列")
+    parser.add_argument("--drop-near-dup", action="store_true", help="近似重复的评论每组只保留第一条")
+    parser.add_argument("--threshold", type=float, default=NEAR_DUP_THRESHOLD, help="近似重复的相似度阈值（0~1）")
+    parser.add_argument("--shingle", type=int, default=SHINGLE_SIZE, help="字符shingle的长度")
+    parser.add_argument("--num-perm", type=int, default=NUM_PERM, help="MinHash签名长度")
+    parser.add_argument("--workers", type=int, default=None, help="解析文件和计算签名的进程数，默认为CPU核数")
+    args = parser.parse_args()
 
-# 注意：你的文件是.csv格式，需要用read_csv读取（之前写成了read_excel，这里一并修正）
-df = pd.read_csv(file_path)
+    start = time.perf_counter()
+    if args.external:
+        total, kept = dedupe_external(args.input, args.output, args.column, args.chunk_rows,
+                                      args.buckets, args.tmp_dir, args.workers, args.format)
+    else:
+        total, kept = dedupe_stream(args.input, args.output, args.column, args.chunk_rows,
+                                    args.workers, args.format)
+    print(f"去重完成！原数据共{total}条，去重后剩{kept}条，"
+          f"耗时{time.perf_counter() - start:.2f}秒，已保存到：{args.output}")
 
-# 按评论列去重
-df_cleaned = df.drop_duplicates(subset=[comment_column], keep="first")
+    if args.near_dup or args.drop_near_dup:
+        start = time.perf_counter()
+        groups = near_duplicate_groups(args.output, args.column, args.threshold, args.shingle,
+                                       args.num_perm, args.workers, args.chunk_rows, args.format)
+        base, ext = os.path.splitext(args.output)
+        tmp_path = f"{base}.tmp{ext}"
+        written = mark_near_duplicates(args.output, tmp_path, groups, args.drop_near_dup, args.chunk_rows,
+                                       args.format)
+        os.replace(tmp_path, args.output)
+        grouped = int((groups > 0).sum())
+        print(f"近似去重完成！{grouped}条评论属于{int(groups.max()) if grouped else 0}个近似重复组，"
+              f"写出{written}条，耗时{time.perf_counter() - start:.2f}秒")
 
-# 保存为csv格式（用to_csv，之前写成了to_excel，一并修正）
-df_cleaned.to_csv(save_path, index=False, encoding="utf-8-sig")  # 加encoding避免中文乱码
 
-print(f"去重完成！原数据共{len(df)}条，去重后剩{len(df_cleaned)}条，已保存到：{save_path}")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
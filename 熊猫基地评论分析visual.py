@@ -13,6 +13,7 @@ import re
 from datetime import datetime
 import os
 import warnings
+from 携程数据规整 import load_reviews
 warnings.filterwarnings('ignore')
 
 # ====== 1. 中文字体配置 ======
@@ -46,9 +47,17 @@ def get_label(chinese, english):
     return chinese if chinese_ok else english
 
 # ====== 2. 数据读取和预处理 ======
+# 以下分析用到的列；只读取这些列，用户头像、图片链接等宽字符串列不进内存
+ANALYSIS_COLUMNS = [
+    '评论内容', '发布时间', '发布地点', '用户等级',
+    '总评分', '景色评分', '趣味评分', '性价比评分',
+    '点赞数', '图片数量',
+]
+
 try:
     file_path = 'C:/Users/lenovo/Desktop/携程评论-熊猫基地/全部评论清洗后.csv'
-    df = pd.read_csv(file_path, encoding='utf-8')
+    # CSV文件或爬虫parquet存储的数据集目录；类型规整结果按文件哈希缓存，评分为Int8、计数为Int16/Int32、低基数列为category
+    df = load_reviews(file_path, columns=ANALYSIS_COLUMNS)
     print(f"数据读取成功！形状：{df.shape}")
 except Exception as e:
     print(f"文件读取失败：{e}")
@@ -98,11 +107,14 @@ def extract_chinese_keywords(text, topK=10):
 df['comment_length'] = df['评论内容'].str.len()
 df['word_count'] = df['评论内容'].str.split().str.len()
 
+# 评分、计数读入时为可空整数（Int8/Int16/Int32，缺失值为pd.NA），df保持这些紧凑类型；
+# matplotlib/seaborn会把含pd.NA的数组当作object处理，只在作图处把用到的列转为float（缺失值为NaN）
+
 # ====== 5. 时间分析 ======
 print("正在进行时间分析...")
 
 try:
-    df['发布时间'] = pd.to_datetime(df['发布时间'])
+    # 发布时间在读取时已规整为datetime
     df['year'] = df['发布时间'].dt.year
     df['month'] = df['发布时间'].dt.month
     df['year_month'] = df['发布时间'].dt.to_period('M')
@@ -198,13 +210,13 @@ print("图表3: 用户等级分析 完成")
 fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(15, 6))
 
 # 评论长度分布
-ax1.hist(df['comment_length'], bins=50, color='orange', alpha=0.7, edgecolor='black')
+ax1.hist(df['comment_length'].dropna().astype(float), bins=50, color='orange', alpha=0.7, edgecolor='black')
 ax1.set_xlabel(get_label('评论长度（字符数）', 'Comment Length (Characters)'))
 ax1.set_ylabel(get_label('频率', 'Frequency'))
 ax1.set_title(get_label('评论长度分布', 'Comment Length Distribution'))
 
 # 评论长度与情感关系
-ax2.scatter(df['comment_length'], df['sentiment'], alpha=0.5, color='purple', s=20)
+ax2.scatter(df['comment_length'].astype(float), df['sentiment'], alpha=0.5, color='purple', s=20)
 ax2.set_xlabel(get_label('评论长度（字符数）', 'Comment Length (Characters)'))
 ax2.set_ylabel(get_label('情感分数', 'Sentiment Score'))
 ax2.set_title(get_label('评论长度与情感关系', 'Comment Length vs Sentiment'))
@@ -220,13 +232,14 @@ fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(15, 6))
 
 # 图片数量分布
 image_counts = df['图片数量'].value_counts().sort_index()
-ax1.bar(image_counts.index, image_counts.values, color='brown', alpha=0.7)
+ax1.bar(image_counts.index.astype(float), image_counts.values, color='brown', alpha=0.7)
 ax1.set_xlabel(get_label('图片数量', 'Number of Images'))
 ax1.set_ylabel(get_label('评论数量', 'Comment Count'))
 ax1.set_title(get_label('评论附带图片数量分布', 'Image Count Distribution'))
 
 # 图片数量与评分关系
-sns.boxplot(data=df[df['图片数量'] <= 10], x='图片数量', y='总评分', ax=ax2, palette='viridis')
+sns.boxplot(data=df.loc[df['图片数量'] <= 10, ['图片数量', '总评分']].astype(float),
+            x='图片数量', y='总评分', ax=ax2, palette='viridis')
 ax2.set_xlabel(get_label('图片数量', 'Number of Images'))
 ax2.set_ylabel(get_label('总评分', 'Overall Rating'))
 ax2.set_title(get_label('图片数量与评分关系', 'Images vs Rating'))
@@ -301,7 +314,7 @@ rating_columns = ['总评分', '景色评分', '趣味评分', '性价比评分'
 colors = ['blue', 'green', 'orange', 'red']
 
 for i, col in enumerate(rating_columns):
-    axes[i].scatter(df[col], df['sentiment'], alpha=0.5, color=colors[i], s=20)
+    axes[i].scatter(df[col].astype(float), df['sentiment'], alpha=0.5, color=colors[i], s=20)
     axes[i].set_xlabel(get_label(f'{col}分', f'{col} Rating'))
     axes[i].set_ylabel(get_label('情感分数', 'Sentiment Score'))
     axes[i].set_title(get_label(f'{col}与情感关系', f'{col} vs Sentiment'))
@@ -329,7 +342,7 @@ ax1.set_title(get_label('情感强度分布', 'Sentiment Strength Distribution')
 ax1.tick_params(axis='x', rotation=45)
 
 # 情感强度与评论长度关系
-ax2.scatter(df['sentiment_strength'], df['comment_length'], alpha=0.5, color='teal', s=20)
+ax2.scatter(df['sentiment_strength'], df['comment_length'].astype(float), alpha=0.5, color='teal', s=20)
 ax2.set_xlabel(get_label('情感强度', 'Sentiment Strength'))
 ax2.set_ylabel(get_label('评论长度', 'Comment Length'))
 ax2.set_title(get_label('情感强度与评论长度关系', 'Sentiment Strength vs Comment Length'))
@@ -354,7 +367,7 @@ print("图表10: 相关性热力图 完成")
 fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(15, 6))
 
 # 点赞数分布（对数尺度）
-ax1.hist(df['点赞数'] + 1, bins=50, color='gold', alpha=0.7, edgecolor='black', log=True)
+ax1.hist(df['点赞数'].dropna().astype(float) + 1, bins=50, color='gold', alpha=0.7, edgecolor='black', log=True)
 ax1.set_xlabel(get_label('点赞数+1（对数尺度）', 'Likes + 1 (Log Scale)'))
 ax1.set_ylabel(get_label('频率', 'Frequency'))
 ax1.set_title(get_label('点赞数分布', 'Likes Distribution'))
@@ -383,7 +396,7 @@ fig, axes = plt.subplots(2, 2, figsize=(15, 10))
 # 各情感类别的评分分布
 for i, sentiment_type in enumerate(df['sentiment_category'].unique()):
     sentiment_data = df[df['sentiment_category'] == sentiment_type]
-    axes[0, 0].hist(sentiment_data['总评分'], bins=10, alpha=0.6, 
+    axes[0, 0].hist(sentiment_data['总评分'].dropna().astype(float), bins=10, alpha=0.6, 
                    label=get_label(sentiment_type, sentiment_type), density=True)
 axes[0, 0].set_xlabel(get_label('总评分', 'Overall Rating'))
 axes[0, 0].set_ylabel(get_label('密度', 'Density'))
@@ -391,7 +404,8 @@ axes[0, 0].set_title(get_label('各情感类别评分分布', 'Rating Distributi
 axes[0, 0].legend()
 
 # 各情感类别的评论长度
-sns.boxplot(data=df, x='sentiment_category', y='comment_length', ax=axes[0, 1], palette='Set3')
+sns.boxplot(data=df[['sentiment_category']].assign(comment_length=df['comment_length'].astype(float)),
+            x='sentiment_category', y='comment_length', ax=axes[0, 1], palette='Set3')
 axes[0, 1].set_xlabel(get_label('情感类别', 'Sentiment Category'))
 axes[0, 1].set_ylabel(get_label('评论长度', 'Comment Length'))
 axes[0, 1].set_title(get_label('各情感类别评论长度', 'Comment Length by Sentiment'))
@@ -405,7 +419,8 @@ axes[1, 0].set_title(get_label('各情感类别用户等级分布', 'User Level
 axes[1, 0].legend(title=get_label('用户等级', 'User Level'))
 
 # 各情感类别的图片数量
-sns.boxplot(data=df[df['图片数量'] <= 10], x='sentiment_category', y='图片数量', ax=axes[1, 1], palette='Set2')
+sns.boxplot(data=df.loc[df['图片数量'] <= 10, ['sentiment_category']].assign(图片数量=df['图片数量'].astype(float)),
+            x='sentiment_category', y='图片数量', ax=axes[1, 1], palette='Set2')
 axes[1, 1].set_xlabel(get_label('情感类别', 'Sentiment Category'))
 axes[1, 1].set_ylabel(get_label('图片数量', 'Number of Images'))
 axes[1, 1].set_title(get_label('各情感类别图片数量', 'Image Count by Sentiment'))
@@ -0,0 +1,296 @@
+"""
+评论爬取的共享任务队列（SQLite）
+
+多个爬虫进程（或共享存储上的多台机器）共用一个队列数据库，从中领取 (景点ID, 页码) 任务：
+- lease：在一个写事务中领取若干待爬或租约已过期的任务，租约期内其他进程领不到
+- ack：任务的数据落盘后确认完成；nack：失败后放回队列，失败次数达到上限后标记为失败
+- renew：爬取期间定期续约（LeaseKeeper），进程崩溃后租约过期，任务被其他进程重新领取
+- 推断出某景点的末页后，末页之后尚未完成的任务标记为跳过，任何进程都不会再领取
+
+注意：SQLite依赖文件锁，网络文件系统（NFS/SMB）上的锁不一定可靠，多台机器共享时
+宜使用本地磁盘所在机器上的进程，或换用支持锁的共享存储；WAL模式要求所有进程在同一台机器上，
+跨机器共享时传入journal_mode='DELETE'。
+"""
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger('携程爬虫.队列')
+
+
+def default_worker_id():
+    """工作进程标识：主机名-进程号"""
+    return f'{socket.gethostname()}-{os.getpid()}'
+
+
+class WorkQueue:
+    """
+    基于SQLite的 (景点ID, 页码) 任务队列
+
+    任务状态：pending（待爬）、leased（已领取）、done、failed（失败次数达到上限）、skipped（末页之后）
+
+    Args:
+        db_path: 队列数据库文件，各进程使用同一个文件
+        max_attempts: 每个任务最多被领取的次数（含租约过期被收回的次数），超过后标记为失败
+        retry_delay: 任务失败放回队列后，至少等待多少秒才能再次被领取
+        journal_mode: 'WAL'（同一台机器上的多进程）或 'DELETE'（跨机器共享文件）
+    """
+
+    def __init__(self, db_path: str = '评论任务队列.db', max_attempts: int = 3,
+                 retry_delay: float = 30.0, journal_mode: str = 'WAL'):
+        self.db_path = db_path
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self._lock = threading.Lock()
+        # isolation_level=None：事务由 BEGIN IMMEDIATE 显式控制，领取任务时立即拿到写锁
+        self.conn = sqlite3.connect(db_path, timeout=60, check_same_thread=False, isolation_level=None)
+        self.conn.execute(f'PRAGMA journal_mode={journal_mode}')
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS tasks (
+                poi_id INTEGER NOT NULL,
+                page INTEGER NOT NULL,
+                priority INTEGER NOT NULL DEFAULT 0,
+                status TEXT NOT NULL DEFAULT 'pending',
+                worker TEXT,
+                lease_until REAL NOT NULL DEFAULT 0,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                reason TEXT,
+                updated_at TEXT NOT NULL DEFAULT (datetime('now', 'localtime')),
+                PRIMARY KEY (poi_id, page)
+            );
+            CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks (status, lease_until);
+            CREATE TABLE IF NOT EXISTS last_page (
+                poi_id INTEGER PRIMARY KEY,
+                page INTEGER NOT NULL
+            );
+        ''')
+        # 旧版本创建的队列没有priority列，补上后由下次enqueue按计划写入
+        columns = {row[1] for row in self.conn.execute('PRAGMA table_info(tasks)')}
+        if 'priority' not in columns:
+            self.conn.execute('ALTER TABLE tasks ADD COLUMN priority INTEGER NOT NULL DEFAULT 0')
+
+    def _transaction(self, func, *args):
+        """在一个立即加写锁的事务中执行func(conn, *args)"""
+        with self._lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                result = func(self.conn, *args)
+            except BaseException:
+                self.conn.execute('ROLLBACK')
+                raise
+            self.conn.execute('COMMIT')
+            return result
+
+    def enqueue(self, plan):
+        """
+        按计划加入任务，已存在的任务只更新优先级，因此各进程可以用同一计划重复调用
+
+        Args:
+            plan: [(景点ID, 最多爬取页数), ...]，已知末页的景点只加入末页之前的页；
+                  景点在计划中的位置作为优先级，同一页码下排在前面的景点（评论多的）先被领取
+
+        Returns:
+            新加入的任务数
+        """
+        def insert(conn):
+            added = 0
+            for priority, (poi_id, pages) in enumerate(plan):
+                row = conn.execute('SELECT page FROM last_page WHERE poi_id = ?', (poi_id,)).fetchone()
+                last = min(pages, row[0]) if row else pages
+                cursor = conn.executemany(
+                    'INSERT OR IGNORE INTO tasks (poi_id, page, priority) VALUES (?, ?, ?)',
+                    ((poi_id, page, priority) for page in range(1, last + 1))
+                )
+                added += cursor.rowcount
+                conn.execute('UPDATE tasks SET priority = ? WHERE poi_id = ? AND priority != ?',
+                             (priority, poi_id, priority))
+            return added
+        return self._transaction(insert)
+
+    def lease(self, worker: str, limit: int, lease_seconds: float):
+        """
+        领取最多limit个任务：待爬的任务，以及租约已过期（持有进程可能已崩溃）的任务
+
+        按页码、优先级排序，先领各景点靠前的页，尽早从评论总数推断出末页；同一页码按计划顺序领取
+
+        Returns:
+            [(景点ID, 页码), ...]
+        """
+        def take(conn):
+            now = time.time()
+            # 租约多次过期的任务（如每次都让进程崩溃）不再发放
+            conn.execute(
+                '''UPDATE tasks SET status = 'failed', reason = '租约多次过期未完成',
+                       updated_at = datetime('now', 'localtime')
+                   WHERE status = 'leased' AND lease_until <= ? AND attempts >= ?''',
+                (now, self.max_attempts)
+            )
+            rows = conn.execute(
+                '''SELECT poi_id, page FROM tasks
+                   WHERE status IN ('pending', 'leased') AND lease_until <= ?
+                   ORDER BY page, priority, poi_id LIMIT ?''',
+                (now, limit)
+            ).fetchall()
+            conn.executemany(
+                '''UPDATE tasks SET status = 'leased', worker = ?, lease_until = ?, attempts = attempts + 1,
+                       updated_at = datetime('now', 'localtime')
+                   WHERE poi_id = ? AND page = ?''',
+                [(worker, now + lease_seconds, poi_id, page) for poi_id, page in rows]
+            )
+            return [tuple(row) for row in rows]
+        return self._transaction(take)
+
+    def renew(self, worker: str, lease_seconds: float):
+        """延长worker持有的所有租约，返回续约的任务数"""
+        def extend(conn):
+            return conn.execute(
+                "UPDATE tasks SET lease_until = ? WHERE status = 'leased' AND worker = ?",
+                (time.time() + lease_seconds, worker)
+            ).rowcount
+        return self._transaction(extend)
+
+    def ack(self, worker: str, poi_id, page) -> bool:
+        """
+        确认任务完成（数据已落盘），只有仍由worker持有的任务才标记为完成
+
+        Returns:
+            任务是否仍由worker持有；租约过期后被其他进程领走、已被标记为跳过或失败时返回False，
+            任务状态不变，由当前持有者确认。此时这一页的数据可能被写了两次：sqlite存储按评论ID upsert，
+            CSV/parquet存储会留下重复行（新领取的进程只能按领取时已落盘的评论ID去重），由清洗按评论ID去重
+        """
+        def finish(conn):
+            return conn.execute(
+                '''UPDATE tasks SET status = 'done', lease_until = 0, reason = NULL,
+                       updated_at = datetime('now', 'localtime')
+                   WHERE poi_id = ? AND page = ? AND status = 'leased' AND worker = ?''',
+                (poi_id, page, worker)
+            ).rowcount > 0
+        return self._transaction(finish)
+
+    def nack(self, worker: str, poi_id, page, reason: str):
+        """任务失败：未达到失败次数上限时放回队列（retry_delay秒后可再领取），否则标记为失败"""
+        def release(conn):
+            conn.execute(
+                '''UPDATE tasks SET
+                       status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                       worker = NULL, lease_until = ?, reason = ?,
+                       updated_at = datetime('now', 'localtime')
+                   WHERE poi_id = ? AND page = ? AND status = 'leased' AND worker = ?''',
+                (self.max_attempts, time.time() + self.retry_delay, reason or '未知原因',
+                 poi_id, page, worker)
+            )
+        self._transaction(release)
+
+    def get_last_page(self, poi_id):
+        """获取景点的末页页码，尚未推断出时返回None"""
+        with self._lock:
+            row = self.conn.execute('SELECT page FROM last_page WHERE poi_id = ?', (poi_id,)).fetchone()
+        return row[0] if row else None
+
+    def set_last_page(self, poi_id, page):
+        """保存景点的末页页码，末页之后尚未完成的任务标记为跳过"""
+        def update(conn):
+            conn.execute(
+                '''INSERT INTO last_page (poi_id, page) VALUES (?, ?)
+                   ON CONFLICT(poi_id) DO UPDATE SET page = MIN(page, excluded.page)''',
+                (poi_id, page)
+            )
+            conn.execute(
+                '''UPDATE tasks SET status = 'skipped', lease_until = 0,
+                       updated_at = datetime('now', 'localtime')
+                   WHERE poi_id = ? AND page > ? AND status IN ('pending', 'leased', 'failed')''',
+                (poi_id, page)
+            )
+        self._transaction(update)
+
+    def counts(self):
+        """各状态的任务数 {状态: 数量}"""
+        with self._lock:
+            rows = self.conn.execute('SELECT status, COUNT(*) FROM tasks GROUP BY status').fetchall()
+        return dict(rows)
+
+    def unfinished(self, exclude_worker=None):
+        """待爬和已被领取的任务数，exclude_worker不计入该进程自己持有的任务"""
+        with self._lock:
+            row = self.conn.execute(
+                '''SELECT COUNT(*) FROM tasks WHERE status = 'pending'
+                   OR (status = 'leased' AND worker IS NOT ?)''',
+                (exclude_worker,)
+            ).fetchone()
+        return row[0]
+
+    def failed(self):
+        """失败的任务 [(景点ID, 页码, 失败原因, 领取次数), ...]"""
+        with self._lock:
+            return self.conn.execute(
+                "SELECT poi_id, page, reason, attempts FROM tasks WHERE status = 'failed' ORDER BY poi_id, page"
+            ).fetchall()
+
+    def requeue_failed(self):
+        """失败的任务重置为待爬（清零领取次数），返回重置的任务数"""
+        def reset(conn):
+            return conn.execute(
+                '''UPDATE tasks SET status = 'pending', attempts = 0, worker = NULL, lease_until = 0
+                   WHERE status = 'failed' '''
+            ).rowcount
+        return self._transaction(reset)
+
+    def worker_state(self, worker: str):
+        """供爬取流程使用的状态接口（与CrawlState同名的方法），见 QueueTaskState"""
+        return QueueTaskState(self, worker)
+
+    def close(self):
+        self.conn.close()
+
+
+class QueueTaskState:
+    """
+    把队列包装成爬取流程使用的状态接口
+
+    页落盘 -> ack，页失败 -> nack，末页页码存入队列（所有进程共享）
+    """
+
+    def __init__(self, queue: WorkQueue, worker: str):
+        self.queue = queue
+        self.worker = worker
+
+    def mark_page_done(self, poi_id, page, rows):
+        self.queue.ack(self.worker, poi_id, page)
+
+    def add_dead_letter(self, poi_id, page, reason):
+        self.queue.nack(self.worker, poi_id, page, reason)
+
+    def get_last_page(self, poi_id):
+        return self.queue.get_last_page(poi_id)
+
+    def set_last_page(self, poi_id, page):
+        self.queue.set_last_page(poi_id, page)
+
+
+class LeaseKeeper:
+    """后台线程每隔 lease_seconds/3 秒为worker续约一次，爬取期间租约不会过期"""
+
+    def __init__(self, queue: WorkQueue, worker: str, lease_seconds: float):
+        self.queue = queue
+        self.worker = worker
+        self.lease_seconds = lease_seconds
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='lease-keeper', daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.lease_seconds / 3):
+            try:
+                self.queue.renew(self.worker, self.lease_seconds)
+            except sqlite3.Error as e:
+                logger.warning(f'续约失败: {e}', extra={'worker': self.worker})
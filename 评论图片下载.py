@@ -0,0 +1,253 @@
+"""
+评论图片下载：按图片表（评论爬虫输出的 评论图片.csv / review_images表 / images目录）并发下载
+评论图片和用户头像，按内容哈希存储
+
+- 内容寻址：文件存为 {store}/objects/{sha256前2位}/{sha256}{扩展名}，内容相同的图片只存一份
+- 索引：{store}/index.db 记录 链接 -> (sha256, 大小, 状态, 失败原因)。已成功的链接不再请求，
+  中断后重新运行即断点续传，失败的链接在重新运行时重试；图片表中重复出现的链接只下载一次
+- 多线程共用一个连接池，受自己的限速（--rate）约束，与爬虫的接口限速互不影响
+
+用法：python 评论图片下载.py --source 评论图片.csv --store 评论图片库 --rate 5 --workers 8
+      python 评论图片下载.py --source 携程数据.db --kind 评论图片
+"""
+import argparse
+import csv
+import datetime
+import hashlib
+import logging
+import mimetypes
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Iterable, List, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from 携程爬虫监控 import RateLimiter, metrics, setup_logging
+
+logger = logging.getLogger('携程爬虫.图片')
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp')
+HEADERS = {
+    'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/142.0.0.0 Safari/537.36',
+    'referer': 'https://you.ctrip.com/',
+}
+
+
+def load_image_urls(source: str, kinds: Optional[List[str]] = None) -> List[str]:
+    """
+    从图片表读取链接（按出现顺序去重）
+
+    Args:
+        source: 图片表CSV、sqlite数据库（review_images表）或parquet数据集目录（含images子目录）
+        kinds: 只取这些类型（'评论图片'、'用户头像'），None为全部
+    """
+    if os.path.isdir(source):
+        import pyarrow.parquet as pq
+        table = pq.read_table(os.path.join(source, 'images'), columns=['类型', '链接'])
+        rows = zip(table.column('类型').to_pylist(), table.column('链接').to_pylist())
+    elif source.endswith('.db'):
+        conn = sqlite3.connect(source)
+        try:
+            rows = conn.execute('SELECT "类型", "链接" FROM review_images').fetchall()
+        finally:
+            conn.close()
+    else:
+        with open(source, 'r', encoding='utf-8-sig', newline='') as f:
+            rows = [(row.get('类型', ''), row.get('链接', '')) for row in csv.DictReader(f)]
+    wanted = set(kinds) if kinds else None
+    urls = dict.fromkeys(url for kind, url in rows if url and (wanted is None or kind in wanted))
+    return list(urls)
+
+
+class ImageStore:
+    """内容寻址的图片存储和链接索引，线程安全"""
+
+    def __init__(self, root: str = '评论图片库'):
+        self.root = root
+        os.makedirs(os.path.join(root, 'objects'), exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(os.path.join(root, 'index.db'), check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS images (
+                url TEXT PRIMARY KEY,
+                sha256 TEXT,
+                size INTEGER,
+                path TEXT,
+                status TEXT NOT NULL,
+                error TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                fetched_at TEXT NOT NULL
+            )
+        ''')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_images_sha256 ON images (sha256)')
+        self.conn.commit()
+
+    def done_urls(self) -> set:
+        """已下载成功的链接"""
+        with self._lock:
+            return {url for (url,) in self.conn.execute("SELECT url FROM images WHERE status = 'ok'")}
+
+    def path_for(self, url: str) -> Optional[str]:
+        """链接对应的本地文件（相对于store目录），未下载时返回None"""
+        with self._lock:
+            row = self.conn.execute("SELECT path FROM images WHERE url = ? AND status = 'ok'", (url,)).fetchone()
+        return row[0] if row else None
+
+    @staticmethod
+    def extension(url: str, content_type: str = '') -> str:
+        suffix = os.path.splitext(urlsplit(url).path)[1].lower()
+        if suffix in IMAGE_EXTENSIONS:
+            return suffix
+        guessed = mimetypes.guess_extension(content_type.split(';')[0].strip()) if content_type else None
+        return guessed or '.bin'
+
+    def save(self, url: str, content: bytes, content_type: str = '') -> bool:
+        """
+        保存一张图片并记入索引
+
+        Returns:
+            是否写入了新文件；内容与已有文件相同时只记录链接，返回False
+        """
+        sha256 = hashlib.sha256(content).hexdigest()
+        relative = os.path.join('objects', sha256[:2], sha256 + self.extension(url, content_type))
+        path = os.path.join(self.root, relative)
+        created = False
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # 先写临时文件再改名，中断时不会留下半个文件
+            tmp_path = f'{path}.{threading.get_ident()}.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+            created = True
+        self._record(url, 'ok', sha256=sha256, size=len(content), path=relative)
+        return created
+
+    def record_failure(self, url: str, error: str):
+        self._record(url, 'failed', error=error)
+
+    def _record(self, url, status, sha256=None, size=None, path=None, error=None):
+        with self._lock:
+            self.conn.execute(
+                '''INSERT INTO images (url, sha256, size, path, status, error, attempts, fetched_at)
+                   VALUES (?, ?, ?, ?, ?, ?, 1, ?)
+                   ON CONFLICT(url) DO UPDATE SET
+                       sha256 = excluded.sha256, size = excluded.size, path = excluded.path,
+                       status = excluded.status, error = excluded.error,
+                       attempts = attempts + 1, fetched_at = excluded.fetched_at''',
+                (url, sha256, size, path, status, error,
+                 datetime.datetime.now().isoformat(timespec='seconds'))
+            )
+            self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+def fetch_image(session: requests.Session, limiter: RateLimiter, store: ImageStore, url: str,
+                retries: int = 3, timeout: float = 20) -> str:
+    """
+    下载一张图片
+
+    Returns:
+        'new'（写入新文件）、'duplicate'（内容与已有文件相同）或 'failed'
+    """
+    error = ''
+    for attempt in range(retries):
+        limiter.acquire()
+        started = time.monotonic()
+        status = 'error'
+        try:
+            response = session.get(url, timeout=timeout)
+            status = response.status_code
+            if response.status_code in (429, 500, 502, 503, 504):
+                error = f'HTTP {response.status_code}'
+                retry_after = response.headers.get('Retry-After', '')
+                delay = float(retry_after) if retry_after.isdigit() else 2 ** attempt
+            elif response.status_code != 200:
+                error = f'HTTP {response.status_code}'
+                break  # 404等不会因重试而成功
+            else:
+                return 'new' if store.save(url, response.content, response.headers.get('Content-Type', '')) \
+                    else 'duplicate'
+        except requests.exceptions.RequestException as e:
+            error = f'网络错误：{e}'
+            delay = 2 ** attempt
+        finally:
+            metrics.observe_request('image', status, time.monotonic() - started)
+        # 还有下一次尝试时才退避等待
+        if attempt < retries - 1:
+            metrics.inc('retries')
+            metrics.inc('backoff_seconds', delay)
+            time.sleep(delay)
+    store.record_failure(url, error)
+    logger.warning(f'图片下载失败：{url}，{error}', extra={'url': url})
+    return 'failed'
+
+
+def download_images(urls: Iterable[str], store: ImageStore, workers: int = 8,
+                    rate: Optional[float] = 5.0, retries: int = 3) -> Counter:
+    """
+    并发下载图片，已下载成功的链接直接跳过
+
+    Returns:
+        Counter：new（新文件）、duplicate（内容重复，只记链接）、failed、skipped（此前已下载）
+    """
+    urls = list(dict.fromkeys(urls))
+    done = store.done_urls()
+    pending = [url for url in urls if url not in done]
+    result = Counter(skipped=len(urls) - len(pending))
+    if not pending:
+        return result
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update(HEADERS)
+    limiter = RateLimiter(rate)
+
+    logger.info(f'共{len(urls)}个链接，已下载{result["skipped"]}个，本次下载{len(pending)}个')
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(fetch_image, session, limiter, store, url, retries) for url in pending]
+        for finished, future in enumerate(as_completed(futures), 1):
+            outcome = future.result()
+            result[outcome] += 1
+            metrics.inc(f'images_{outcome}')
+            if finished % 500 == 0:
+                logger.info(f'已处理{finished}/{len(pending)}个链接', extra=dict(result))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='按图片表下载评论图片（内容寻址存储，可断点续传）')
+    parser.add_argument('--source', default='评论图片.csv', help='图片表：CSV、sqlite数据库或parquet数据集目录')
+    parser.add_argument('--store', default='评论图片库', help='图片存储目录')
+    parser.add_argument('--kind', choices=['评论图片', '用户头像'], nargs='*', help='只下载这些类型，默认全部')
+    parser.add_argument('--workers', type=int, default=8, help='并发下载线程数')
+    parser.add_argument('--rate', type=float, default=5.0, help='每秒最多请求数，0为不限速')
+    parser.add_argument('--retries', type=int, default=3, help='每张图片最多尝试次数')
+    args = parser.parse_args()
+
+    setup_logging('INFO')
+    urls = load_image_urls(args.source, args.kind)
+    store = ImageStore(args.store)
+    start = time.perf_counter()
+    try:
+        result = download_images(urls, store, args.workers, args.rate or None, args.retries)
+    finally:
+        store.close()
+    print(f'下载完成！新文件{result["new"]}个，内容重复{result["duplicate"]}个，'
+          f'失败{result["failed"]}个，此前已下载{result["skipped"]}个，'
+          f'耗时{time.perf_counter() - start:.2f}秒，存储目录：{args.store}')
+
+
+if __name__ == '__main__':
+    main()
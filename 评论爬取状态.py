@@ -0,0 +1,175 @@
+import sqlite3
+from threading import Lock
+
+
+class CrawlState:
+    """
+    评论爬虫的持久化状态（SQLite）
+
+    - high_water: 每个景点已爬到的最新评论（评论ID、发布时间），用于增量爬取
+    - page_done: 已写入磁盘的页（断点续爬日志），一次完整爬取结束后清空
+    - dead_letter: 爬取失败的页及失败原因（死信队列），重跑成功后移除
+    - last_page: 从评论总数或无数据页推断出的末页页码，之后的页不再请求，与断点日志一起清空
+    """
+
+    def __init__(self, db_path: str = '评论爬取状态.db'):
+        self.db_path = db_path
+        self._lock = Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS high_water (
+                poi_id INTEGER PRIMARY KEY,
+                comment_id INTEGER NOT NULL,
+                publish_time TEXT NOT NULL,
+                updated_at TEXT NOT NULL DEFAULT (datetime('now', 'localtime'))
+            );
+            CREATE TABLE IF NOT EXISTS page_done (
+                poi_id INTEGER NOT NULL,
+                page INTEGER NOT NULL,
+                rows INTEGER NOT NULL,
+                done_at TEXT NOT NULL DEFAULT (datetime('now', 'localtime')),
+                PRIMARY KEY (poi_id, page)
+            );
+            CREATE TABLE IF NOT EXISTS dead_letter (
+                poi_id INTEGER NOT NULL,
+                page INTEGER NOT NULL,
+                reason TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 1,
+                failed_at TEXT NOT NULL DEFAULT (datetime('now', 'localtime')),
+                PRIMARY KEY (poi_id, page)
+            );
+            CREATE TABLE IF NOT EXISTS last_page (
+                poi_id INTEGER PRIMARY KEY,
+                page INTEGER NOT NULL,
+                updated_at TEXT NOT NULL DEFAULT (datetime('now', 'localtime'))
+            );
+        ''')
+        self.conn.commit()
+
+    def get_mark(self, poi_id):
+        """
+        获取景点的高水位标记
+
+        Returns:
+            (发布时间, 评论ID)，从未爬取过返回None
+        """
+        with self._lock:
+            row = self.conn.execute(
+                'SELECT publish_time, comment_id FROM high_water WHERE poi_id = ?', (poi_id,)
+            ).fetchone()
+        return tuple(row) if row else None
+
+    def set_mark(self, poi_id, mark):
+        """保存景点的高水位标记 mark=(发布时间, 评论ID)"""
+        publish_time, comment_id = mark
+        with self._lock:
+            self.conn.execute(
+                '''INSERT INTO high_water (poi_id, comment_id, publish_time) VALUES (?, ?, ?)
+                   ON CONFLICT(poi_id) DO UPDATE SET
+                       comment_id = excluded.comment_id,
+                       publish_time = excluded.publish_time,
+                       updated_at = datetime('now', 'localtime')''',
+                (poi_id, comment_id, publish_time)
+            )
+            self.conn.commit()
+
+    def mark_page_done(self, poi_id, page, rows):
+        """记录一页已完成（该页评论已写入磁盘后调用），无数据的末尾页rows为0，同时移出死信队列"""
+        with self._lock:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO page_done (poi_id, page, rows) VALUES (?, ?, ?)',
+                (poi_id, page, rows)
+            )
+            self.conn.execute(
+                'DELETE FROM dead_letter WHERE poi_id = ? AND page = ?', (poi_id, page)
+            )
+            self.conn.commit()
+
+    def completed_pages(self, poi_id):
+        """获取景点已完成的页码集合"""
+        with self._lock:
+            rows = self.conn.execute(
+                'SELECT page FROM page_done WHERE poi_id = ?', (poi_id,)
+            ).fetchall()
+        return {page for (page,) in rows}
+
+    def pois_in_progress(self):
+        """有未结束断点记录的景点ID集合"""
+        with self._lock:
+            rows = self.conn.execute('SELECT DISTINCT poi_id FROM page_done').fetchall()
+        return {poi_id for (poi_id,) in rows}
+
+    def clear_pages(self, poi_id):
+        """清空景点的断点记录、死信队列和末页页码"""
+        with self._lock:
+            self.conn.execute('DELETE FROM page_done WHERE poi_id = ?', (poi_id,))
+            self.conn.execute('DELETE FROM dead_letter WHERE poi_id = ?', (poi_id,))
+            self.conn.execute('DELETE FROM last_page WHERE poi_id = ?', (poi_id,))
+            self.conn.commit()
+
+    def get_last_page(self, poi_id):
+        """获取景点的末页页码，尚未推断出时返回None"""
+        with self._lock:
+            row = self.conn.execute(
+                'SELECT page FROM last_page WHERE poi_id = ?', (poi_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def set_last_page(self, poi_id, page):
+        """保存景点的末页页码，同时移出死信队列中末页之后的页（它们已无需重跑）"""
+        with self._lock:
+            self.conn.execute(
+                '''INSERT INTO last_page (poi_id, page) VALUES (?, ?)
+                   ON CONFLICT(poi_id) DO UPDATE SET
+                       page = excluded.page,
+                       updated_at = datetime('now', 'localtime')''',
+                (poi_id, page)
+            )
+            self.conn.execute(
+                'DELETE FROM dead_letter WHERE poi_id = ? AND page > ?', (poi_id, page)
+            )
+            self.conn.commit()
+
+    def add_dead_letter(self, poi_id, page, reason):
+        """失败页放入死信队列，已在队列中时累加失败次数"""
+        with self._lock:
+            self.conn.execute(
+                '''INSERT INTO dead_letter (poi_id, page, reason) VALUES (?, ?, ?)
+                   ON CONFLICT(poi_id, page) DO UPDATE SET
+                       reason = excluded.reason,
+                       attempts = attempts + 1,
+                       failed_at = datetime('now', 'localtime')''',
+                (poi_id, page, reason or '未知原因')
+            )
+            self.conn.commit()
+
+    def dead_letters(self, poi_ids=None):
+        """
+        获取死信队列中的失败页
+
+        Returns:
+            [(景点ID, 页码, 失败原因, 失败次数), ...]，poi_ids为None时返回全部
+        """
+        with self._lock:
+            rows = self.conn.execute(
+                'SELECT poi_id, page, reason, attempts FROM dead_letter ORDER BY poi_id, page'
+            ).fetchall()
+        if poi_ids is not None:
+            poi_ids = set(poi_ids)
+            rows = [row for row in rows if row[0] in poi_ids]
+        return rows
+
+    def close(self):
+        self.conn.close()
+
+
+def comment_mark(comment):
+    """
+    评论的排序键 (发布时间, 评论ID)，发布时间格式为 %Y-%m-%d %H:%M:%S，可直接按字符串比较
+
+    comment可以是评论字典或评论爬虫的CommentRecord
+    """
+    if isinstance(comment, dict):
+        return (comment.get('发布时间', ''), int(comment.get('评论ID') or 0))
+    return (comment.发布时间, int(comment.评论ID or 0))